@@ -0,0 +1,32 @@
+"""unique user_id on profiles and user_analytics for atomic points upserts
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the oldest row per user before enforcing uniqueness
+    for table in ("user_analytics", "profiles"):
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN ("
+            f"SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM {table} GROUP BY user_id) AS keep"
+            ")"
+        )
+        op.create_unique_constraint(f"uq_{table}_user_id", table, ["user_id"])
+
+
+def downgrade() -> None:
+    for table in ("user_analytics", "profiles"):
+        op.drop_constraint(f"uq_{table}_user_id", table, type_="unique")
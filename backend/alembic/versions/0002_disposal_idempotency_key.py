@@ -0,0 +1,26 @@
+"""idempotency key on disposals for the unified disposal commit
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("disposals", sa.Column("idempotency_key", sa.String(64), nullable=True))
+    op.create_unique_constraint("uq_disposals_user_idempotency_key", "disposals", ["user_id", "idempotency_key"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_disposals_user_idempotency_key", "disposals", type_="unique")
+    op.drop_column("disposals", "idempotency_key")
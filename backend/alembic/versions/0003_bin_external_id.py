@@ -0,0 +1,26 @@
+"""external id on bins for bulk import upserts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("bins", sa.Column("external_id", sa.String(64), nullable=True))
+    op.create_unique_constraint("uq_bins_external_id", "bins", ["external_id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_bins_external_id", "bins", type_="unique")
+    op.drop_column("bins", "external_id")
@@ -0,0 +1,49 @@
+"""bin fill-level telemetry: raw readings, hourly rollups and last reading time on bins
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("bins", sa.Column("last_telemetry_at", sa.DateTime(), nullable=True))
+
+    op.create_table(
+        "bin_telemetry",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("bin_id", sa.Integer(), sa.ForeignKey("bins.id"), nullable=False),
+        sa.Column("fill_pct", sa.Float(), nullable=False),
+        sa.Column("recorded_at", sa.DateTime(), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_bin_telemetry_bin_recorded", "bin_telemetry", ["bin_id", "recorded_at"])
+
+    op.create_table(
+        "bin_telemetry_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("bin_id", sa.Integer(), sa.ForeignKey("bins.id"), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=True),
+        sa.Column("fill_sum", sa.Float(), nullable=True),
+        sa.Column("fill_min", sa.Float(), nullable=True),
+        sa.Column("fill_max", sa.Float(), nullable=True),
+        sa.UniqueConstraint("bin_id", "bucket_start", name="uq_bin_telemetry_rollups_bin_bucket"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bin_telemetry_rollups")
+    op.drop_index("ix_bin_telemetry_bin_recorded", table_name="bin_telemetry")
+    op.drop_table("bin_telemetry")
+    op.drop_column("bins", "last_telemetry_at")
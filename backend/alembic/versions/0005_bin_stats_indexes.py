@@ -0,0 +1,26 @@
+"""indexes for bin type/status counts and region scoped stats
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_bins_type_status", "bins", ["type", "status"])
+    op.create_index("ix_bins_latitude_longitude", "bins", ["latitude", "longitude"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bins_latitude_longitude", table_name="bins")
+    op.drop_index("ix_bins_type_status", table_name="bins")
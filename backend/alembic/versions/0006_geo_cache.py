@@ -0,0 +1,35 @@
+"""persistent cache for geocoding and place searches
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "geo_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("query", sa.String(500), nullable=False),
+        sa.Column("value", sa.Text(), nullable=True),
+        sa.Column("hits", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_geo_cache_expires_at", "geo_cache", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_geo_cache_expires_at", table_name="geo_cache")
+    op.drop_table("geo_cache")
@@ -0,0 +1,26 @@
+"""server-side admin flag on users
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-20 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nobody is admin after the upgrade; grant it explicitly with
+    # UPDATE users SET is_admin = TRUE WHERE email = '...'
+    op.add_column("users", sa.Column("is_admin", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "is_admin")
@@ -0,0 +1,35 @@
+"""one telemetry reading per bin and sensor timestamp
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-20 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the first stored copy of each retransmitted reading before enforcing uniqueness.
+    # Rollups already counted the duplicates; rebuild them from bin_telemetry if that matters.
+    op.execute(
+        "DELETE FROM bin_telemetry WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM bin_telemetry GROUP BY bin_id, recorded_at) AS keep"
+        ")"
+    )
+    # The unique key also serves as the (bin_id, recorded_at) index; create it before
+    # dropping the old one, which MySQL needs for the bin_id foreign key
+    op.create_unique_constraint("uq_bin_telemetry_bin_recorded", "bin_telemetry", ["bin_id", "recorded_at"])
+    op.drop_index("ix_bin_telemetry_bin_recorded", table_name="bin_telemetry")
+
+
+def downgrade() -> None:
+    op.create_index("ix_bin_telemetry_bin_recorded", "bin_telemetry", ["bin_id", "recorded_at"])
+    op.drop_constraint("uq_bin_telemetry_bin_recorded", "bin_telemetry", type_="unique")
@@ -0,0 +1,113 @@
+"""
+Benchmark disposal ingestion: one commit per event (what POST /api/disposals/
+does) against the write-behind DisposalBuffer.
+
+Runs against a throwaway SQLite file by default; pass --database-url to point
+it at a MySQL scratch database (it drops and recreates the schema).
+
+Usage (from the backend directory):
+    python -m benchmarks.disposal_ingest_bench --events 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, User, Disposal
+from services.disposal_buffer import DisposalBuffer
+
+def reset_schema(url: str):
+    sync_engine = build_engine(url, "bench_disposals_sync")
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": 1, "email": "bench@example.com", "hashed_password": "x", "full_name": "Bench"})
+    sync_engine.dispose()
+
+async def count_disposals(engine) -> int:
+    async with AsyncSessionLocal(bind=engine) as db:
+        return await db.scalar(select(func.count(Disposal.id)))
+
+async def bench_per_row(url: str, events: int, concurrency: int) -> dict:
+    reset_schema(url)
+    engine = build_engine(to_async_url(url), "bench_disposals", is_async=True)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(i: int):
+        async with semaphore, AsyncSessionLocal(bind=engine) as db:
+            disposal = Disposal(user_id=1, waste_type="plastic", points_earned=5, created_at=datetime.utcnow())
+            db.add(disposal)
+            await db.commit()
+            await db.refresh(disposal)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[create(i) for i in range(events)])
+    elapsed = time.perf_counter() - start
+    stored = await count_disposals(engine)
+    await engine.dispose()
+    return {"events_per_sec": round(events / elapsed, 1), "seconds": round(elapsed, 3), "rows_stored": stored}
+
+async def bench_buffered(url: str, events: int, flush_ms: int, batch_rows: int) -> dict:
+    reset_schema(url)
+    engine = build_engine(to_async_url(url), "bench_disposals", is_async=True)
+    spill_path = os.path.join(tempfile.mkdtemp(), "spill.ndjson")
+    buffer = DisposalBuffer(
+        lambda: AsyncSessionLocal(bind=engine),
+        spill_path=spill_path,
+        max_size=events,
+        flush_ms=flush_ms,
+        batch_rows=batch_rows,
+    )
+    await buffer.start()
+
+    start = time.perf_counter()
+    for i in range(events):
+        buffer.enqueue(1, "plastic", points_earned=5)
+        if i % batch_rows == 0:
+            # Yield like a request handler would, so the flusher can run
+            await asyncio.sleep(0)
+    acked = time.perf_counter() - start
+    await buffer.stop()
+    elapsed = time.perf_counter() - start
+
+    stored = await count_disposals(engine)
+    await engine.dispose()
+    return {
+        "events_per_sec": round(events / elapsed, 1),
+        "ack_events_per_sec": round(events / acked, 1),
+        "seconds": round(elapsed, 3),
+        "rows_stored": stored,
+        "flush": buffer.metrics()["flush_latency_ms"],
+    }
+
+def run(events: int = 5000, concurrency: int = 20, flush_ms: int = 200, batch_rows: int = 500,
+        database_url: str = None) -> dict:
+    url = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    per_row = asyncio.run(bench_per_row(url, events, concurrency))
+    buffered = asyncio.run(bench_buffered(url, events, flush_ms, batch_rows))
+    return {
+        "events": events,
+        "per_row_commit": per_row,
+        "write_behind": buffered,
+        "speedup": round(buffered["events_per_sec"] / per_row["events_per_sec"], 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Disposal ingestion benchmark")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--flush-ms", type=int, default=200)
+    parser.add_argument("--batch-rows", type=int, default=500)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.events, args.concurrency, args.flush_ms, args.batch_rows, args.database_url), indent=2))
+
+if __name__ == "__main__":
+    main()
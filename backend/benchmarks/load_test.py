@@ -0,0 +1,254 @@
+"""
+Load test of the main API endpoints, in process, on a seeded synthetic dataset.
+
+Concurrent clients send a weighted mix of requests (bins near a point, nearby
+bins with external places, leaderboard, dashboard, detection history, disposals
+and waste detection) straight to the ASGI app, so results measure the app and
+its database rather than a network or server setup. The LLM and SerpAPI are
+replaced by fakes with fixed latencies; rate limiting and query budgets are off.
+Coordinates and images vary per request so caches see realistic hit rates.
+
+Runs against a throwaway SQLite file by default; pass --database-url to point
+it at a MySQL scratch database (it drops and recreates the schema).
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --concurrency 20 --requests 2000
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+# (name, weight); see build_request for what each one sends
+ENDPOINT_MIX = [
+    ("GET /api/bins/", 4),
+    ("GET /api/location/nearby-bins", 3),
+    ("GET /api/analytics/leaderboard", 2),
+    ("GET /api/analytics/dashboard", 1),
+    ("GET /api/waste/history", 1),
+    ("POST /api/disposals/", 2),
+    ("POST /api/waste/detect", 1),
+]
+
+class FakeLLM:
+    """Stands in for the OpenAI client: waits latency seconds, then reports two items"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        # Called through asyncio.to_thread like the real (blocking) client
+        time.sleep(self.latency)
+        content = json.dumps([
+            {"item": "Plastic Bottle", "confidence": 0.92, "disposal_method": "Recycling", "bin_type": "recycling"},
+            {"item": "Banana Peel", "confidence": 0.81, "disposal_method": "Compost", "bin_type": "organic"},
+        ])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def fake_serpapi(latency: float):
+    """Replacement for LocationService._search returning a page of places around the query point"""
+    async def search(params: dict) -> dict:
+        await asyncio.sleep(latency)
+        lat, lng = (float(value) for value in params.get("ll", "@0,0").lstrip("@").split(",")[:2])
+        return {"local_results": [
+            {
+                "place_id": f"bench_{lat:.3f}_{lng:.3f}_{i}",
+                "title": f"Recycling Point {i}",
+                "address": f"{i} Bench Road",
+                "gps_coordinates": {"latitude": lat + i * 0.002, "longitude": lng - i * 0.002},
+                "rating": 4.0,
+            }
+            for i in range(5)
+        ]}
+    return search
+
+def make_images(count: int, seed: int) -> list:
+    """Distinct small JPEGs, base64 encoded; reused across requests like repeat uploads"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), tuple(rng.randrange(256) for _ in range(3))).save(buffer, format="JPEG")
+        images.append(base64.b64encode(buffer.getvalue()).decode())
+    return images
+
+def build_request(name: str, rng: random.Random, centres: list, images: list) -> dict:
+    lat, lng = rng.choice(centres)
+    lat, lng = round(lat + rng.uniform(-0.1, 0.1), 4), round(lng + rng.uniform(-0.1, 0.1), 4)
+    if name == "GET /api/bins/":
+        return {"params": {"lat": lat, "lng": lng, "radius": 5}}
+    if name == "GET /api/location/nearby-bins":
+        return {"params": {"latitude": lat, "longitude": lng, "radius_km": 5}}
+    if name == "GET /api/analytics/leaderboard":
+        return {"params": {"period": rng.choice(["all", "week", "month"])}}
+    if name == "POST /api/disposals/":
+        return {"json": {"waste_type": rng.choice(["general", "recycling", "organic"]), "points_earned": rng.randint(5, 20)}}
+    if name == "POST /api/waste/detect":
+        return {"json": {"image_data": rng.choice(images), "location_lat": lat, "location_lng": lng}}
+    return {}
+
+def summarize(samples: list, errors: int, elapsed: float) -> dict:
+    samples = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return round(samples[max(math.ceil(len(samples) * p) - 1, 0)] * 1000, 2) if samples else 0
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(statistics.median(samples) * 1000, 2) if samples else 0,
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(samples[-1] * 1000, 2) if samples else 0,
+    }
+
+async def generate_load(app, user_ids: list, concurrency: int, total: int, duration: float, seed: int,
+                        images: list, centres: list, skip: tuple) -> dict:
+    import httpx
+    from utils.auth import create_access_token
+
+    tokens = {user_id: create_access_token({"sub": str(user_id)}) for user_id in user_ids}
+    mix = [(name, weight) for name, weight in ENDPOINT_MIX if not any(pattern in name for pattern in skip)]
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    first_errors = {}
+    sent = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    if not names:
+        raise ValueError("Every endpoint was skipped")
+
+    async def worker(client: httpx.AsyncClient, worker_id: int):
+        nonlocal sent
+        rng = random.Random(seed * 1000 + worker_id)
+        while (deadline is None and sent < total) or (deadline is not None and time.perf_counter() < deadline):
+            sent += 1
+            name = rng.choices(names, weights)[0]
+            method, path = name.split(" ", 1)
+            headers = {"Authorization": f"Bearer {tokens[rng.choice(user_ids)]}"}
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, **build_request(name, rng, centres, images))
+                error = f"{response.status_code} {response.text[:200]}" if response.status_code >= 400 else None
+            except Exception as e:
+                error = repr(e)[:200]
+            latencies[name].append(time.perf_counter() - start)
+            if error is not None:
+                errors[name] += 1
+                first_errors.setdefault(name, error)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client, i) for i in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    all_samples = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "seconds": round(elapsed, 3),
+        "total": summarize(all_samples, sum(errors.values()), elapsed),
+        "endpoints": {name: summarize(latencies[name], errors[name], elapsed) for name in names if latencies[name]},
+        "first_errors": first_errors,
+    }
+
+async def drive(app, user_ids: list, concurrency: int, total: int, duration: float, seed: int,
+                llm_latency: float, serpapi_latency: float, images: list, centres: list, skip: tuple) -> dict:
+    from routers import waste_detection
+    from services.location_service import location_service
+
+    waste_detection.client = FakeLLM(llm_latency)
+    location_service.serpapi_key = "bench"
+    location_service._search = fake_serpapi(serpapi_latency)
+
+    await app.router.startup()
+    try:
+        return await generate_load(app, user_ids, concurrency, total, duration, seed, images, centres, skip)
+    finally:
+        await app.router.shutdown()
+
+def run(concurrency: int = 20, requests: int = 2000, duration: float = 0, users: int = 1000, bins: int = 2000,
+        disposals: int = 50000, detections: int = 10000, llm_latency_ms: float = 800, serpapi_latency_ms: float = 300,
+        images: int = 50, seed: int = 42, database_url: str = None, skip: tuple = ()) -> dict:
+    workdir = tempfile.mkdtemp()
+    url = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # The app reads its configuration at import time, so set it before importing anything from it
+    os.environ["DATABASE_URL"] = url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.pop("READ_DATABASE_URLS", None)
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["QUERY_BUDGET_MODE"] = "off"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from database import engine
+    from models import Base
+    from seed_data import create_synthetic_data, CITY_CENTRES
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    dataset = create_synthetic_data(engine, users, bins, disposals, detections, seed)
+    if engine.dialect.name == "sqlite":
+        # Rollback-journal SQLite locks readers out during every write; WAL (kept in the file) does not
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    # Detection uploads are written under ./uploads; keep them out of the source tree
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from main import app
+
+        user_ids = list(range(1, users + 1))
+        results = asyncio.run(drive(
+            app, user_ids, concurrency, requests, duration, seed,
+            llm_latency_ms / 1000, serpapi_latency_ms / 1000, make_images(images, seed), CITY_CENTRES, tuple(skip),
+        ))
+    finally:
+        os.chdir(cwd)
+
+    return {
+        "dialect": url.split(":", 1)[0],
+        "dataset": {**dataset, "seed": seed},
+        "concurrency": concurrency,
+        "llm_latency_ms": llm_latency_ms,
+        "serpapi_latency_ms": serpapi_latency_ms,
+        "skipped": list(skip),
+        **results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test of the main endpoints")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="Run for this many seconds instead")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bins", type=int, default=2000)
+    parser.add_argument("--disposals", type=int, default=50000)
+    parser.add_argument("--detections", type=int, default=10000)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--serpapi-latency-ms", type=float, default=300)
+    parser.add_argument("--images", type=int, default=50, help="Distinct images sent to /detect")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip", default="", help="Comma-separated endpoints to leave out of the mix, e.g. detect,dashboard")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.concurrency, args.requests, args.duration, args.users, args.bins, args.disposals,
+                         args.detections, args.llm_latency_ms, args.serpapi_latency_ms, args.images, args.seed,
+                         args.database_url, [pattern for pattern in args.skip.split(",") if pattern]), indent=2))
+
+if __name__ == "__main__":
+    main()
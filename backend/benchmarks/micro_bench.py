@@ -0,0 +1,149 @@
+"""
+Micro-benchmarks for the hot helpers behind the API, on a seeded synthetic dataset:
+  - distance maths (bins.calculate_distance against geohash.haversine_km)
+  - leaderboard snapshots (all-time and per-period aggregation)
+  - the dashboard aggregations for one user (weekly stats, environmental
+    impact, achievements, monthly comparison)
+  - rate limiting (in-memory limiter checks and route policy matching)
+
+Runs against a throwaway SQLite file by default; pass --database-url to point
+it at a MySQL scratch database (it drops and recreates the schema).
+
+Usage (from the backend directory):
+    python -m benchmarks.micro_bench --users 1000 --disposals 50000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from database import build_engine, to_async_url, AsyncSessionLocal, ReplicaRouter
+from models import Base, Disposal
+from routers import analytics
+from routers.bins import calculate_distance
+from seed_data import create_synthetic_data
+from utils.geohash import haversine_km
+from utils.rate_limiter import InMemoryRateLimiter
+from utils.rate_limit_middleware import RateLimitMiddleware
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[max(math.ceil(len(samples) * 0.95) - 1, 0)] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+def seed(url: str, users: int, bins: int, disposals: int, detections: int, seed: int) -> dict:
+    sync_engine = build_engine(url, "bench_micro_sync")
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    counts = create_synthetic_data(sync_engine, users, bins, disposals, detections, seed)
+    sync_engine.dispose()
+    return counts
+
+def bench_distance(points: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    pairs = [(rng.uniform(8, 30), rng.uniform(70, 88), rng.uniform(8, 30), rng.uniform(70, 88)) for _ in range(points)]
+    results = {}
+    for name, distance in (("calculate_distance", calculate_distance), ("haversine_km", haversine_km)):
+        start = time.perf_counter()
+        for pair in pairs:
+            distance(*pair)
+        elapsed = time.perf_counter() - start
+        results[name] = {"calls_per_sec": round(points / elapsed), "ns_per_call": round(elapsed / points * 1e9)}
+    return results
+
+async def time_async(repeat: int, func, *args) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+async def bench_leaderboard(repeat: int) -> dict:
+    return {period: await time_async(repeat, analytics.load_leaderboard, period) for period in ("all", "week", "month")}
+
+async def bench_dashboard(engine, repeat: int) -> dict:
+    async with AsyncSessionLocal(bind=engine) as db:
+        # The most active user has the most rows to aggregate
+        user_id = (await db.execute(
+            select(Disposal.user_id).group_by(Disposal.user_id).order_by(func.count(Disposal.id).desc()).limit(1)
+        )).scalar() or 1
+        return {
+            "user_id": user_id,
+            "weekly_stats": await time_async(repeat, analytics.calculate_weekly_stats, user_id, db),
+            "environmental_impact": await time_async(repeat, analytics.calculate_total_environmental_impact, user_id, db),
+            "achievements": await time_async(repeat, analytics.calculate_achievements, user_id, db),
+            "monthly_comparison": await time_async(repeat, analytics.calculate_monthly_comparison, user_id, db),
+        }
+
+async def bench_database(url: str, repeat: int) -> dict:
+    engine = build_engine(to_async_url(url), "bench_micro", is_async=True)
+    original_router = analytics.read_router
+    analytics.read_router = ReplicaRouter(engine, [])
+    try:
+        return {"leaderboard": await bench_leaderboard(repeat), "dashboard": await bench_dashboard(engine, repeat)}
+    finally:
+        analytics.read_router = original_router
+        await engine.dispose()
+
+def bench_rate_limit(checks: int, keys: int) -> dict:
+    limiter = InMemoryRateLimiter()
+    start = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(f"bench:{i % keys}", 1_000_000, 60)
+    hit_elapsed = time.perf_counter() - start
+
+    middleware = RateLimitMiddleware(None, enabled=True)
+    paths = [("POST", "/api/waste/detect"), ("POST", "/api/location/geocode"), ("GET", "/api/bins/"), ("GET", "/api/analytics/leaderboard")]
+    start = time.perf_counter()
+    for i in range(checks):
+        middleware.match(*paths[i % len(paths)])
+    match_elapsed = time.perf_counter() - start
+
+    return {
+        "keys": keys,
+        "hit": {"checks_per_sec": round(checks / hit_elapsed), "us_per_check": round(hit_elapsed / checks * 1e6, 2)},
+        "match": {"checks_per_sec": round(checks / match_elapsed), "us_per_check": round(match_elapsed / checks * 1e6, 2)},
+    }
+
+def run(users: int = 1000, bins: int = 2000, disposals: int = 50000, detections: int = 10000, repeat: int = 20,
+        points: int = 100000, checks: int = 100000, seed_value: int = 42, database_url: str = None) -> dict:
+    url = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    dataset = seed(url, users, bins, disposals, detections, seed_value)
+    return {
+        "dialect": url.split(":", 1)[0],
+        "dataset": {**dataset, "seed": seed_value},
+        "distance": bench_distance(points, seed_value),
+        **asyncio.run(bench_database(url, repeat)),
+        "rate_limit": bench_rate_limit(checks, keys=min(users, checks) or 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks on a synthetic dataset")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bins", type=int, default=2000)
+    parser.add_argument("--disposals", type=int, default=50000)
+    parser.add_argument("--detections", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.users, args.bins, args.disposals, args.detections, args.repeat,
+                         args.points, args.checks, args.seed, args.database_url), indent=2))
+
+if __name__ == "__main__":
+    main()
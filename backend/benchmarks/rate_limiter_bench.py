@@ -0,0 +1,99 @@
+"""
+Benchmark the Redis rate limiters against a local Redis stand-in.
+
+Compares the legacy pipelined RedisRateLimiter with the Lua-scripted
+AsyncRedisRateLimiter (sliding log and GCRA) on:
+  - sequential latency per check
+  - correctness under concurrency (how many requests get through a limit)
+
+Requires fakeredis with Lua support:
+    pip install "fakeredis[lua]"
+
+Usage (from the backend directory):
+    python -m benchmarks.rate_limiter_bench --checks 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import fakeredis.aioredis
+
+from utils.rate_limiter import RedisRateLimiter, AsyncRedisRateLimiter
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "ops_per_sec": round(len(samples) / sum(samples), 1) if samples else 0,
+        "p50_us": round(statistics.median(samples) * 1e6, 1),
+        "p99_us": round(samples[max(math.ceil(len(samples) * 0.99) - 1, 0)] * 1e6, 1),
+    }
+
+def bench_pipeline(checks: int, concurrency: int, limit: int) -> dict:
+    limiter = RedisRateLimiter(client=fakeredis.FakeRedis(decode_responses=True))
+
+    samples = []
+    for i in range(checks):
+        start = time.perf_counter()
+        limiter.is_rate_limited(f"bench:seq:{i % 100}", 1_000_000, 60)
+        samples.append(time.perf_counter() - start)
+
+    # Simulate several workers racing for the same key
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(
+            lambda _: limiter.is_rate_limited("bench:race", limit, 60),
+            range(concurrency),
+        ))
+    stored = limiter.redis_client.zcard("bench:race")
+
+    return {
+        **summarize(samples),
+        "allowed_under_race": results.count(False),
+        "members_stored": stored,
+    }
+
+async def bench_script(algorithm: str, checks: int, concurrency: int, limit: int) -> dict:
+    limiter = AsyncRedisRateLimiter(
+        algorithm=algorithm,
+        client=fakeredis.aioredis.FakeRedis(decode_responses=True),
+    )
+
+    samples = []
+    for i in range(checks):
+        start = time.perf_counter()
+        await limiter.hit(f"bench:seq:{i % 100}", 1_000_000, 60)
+        samples.append(time.perf_counter() - start)
+
+    results = await asyncio.gather(*[
+        limiter.hit("bench:race", limit, 60) for _ in range(concurrency)
+    ])
+
+    return {
+        **summarize(samples),
+        "allowed_under_race": sum(1 for r in results if r.allowed),
+    }
+
+def run(checks: int = 5000, concurrency: int = 200, limit: int = 100) -> dict:
+    return {
+        "limit": limit,
+        "concurrency": concurrency,
+        "pipeline": bench_pipeline(checks, concurrency, limit),
+        "lua_sliding_log": asyncio.run(bench_script("sliding_log", checks, concurrency, limit)),
+        "lua_gcra": asyncio.run(bench_script("gcra", checks, concurrency, limit)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter benchmark")
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.checks, args.concurrency, args.limit), indent=2))
+
+if __name__ == "__main__":
+    main()
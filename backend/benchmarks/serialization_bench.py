@@ -0,0 +1,114 @@
+"""
+Benchmark response serialization: FastAPI's default path (jsonable_encoder on
+ORM objects or dicts, then stdlib json via JSONResponse) against response
+models serialized by pydantic-core and rendered with ORJSONResponse.
+
+Payloads mirror GET /api/waste/history and GET /api/analytics/leaderboard;
+no database or server is involved.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization_bench --rows 500 --rounds 200
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from models import WasteDetection
+from schemas import WasteDetectionHistory, Leaderboard
+
+def make_history(rows: int) -> List[WasteDetection]:
+    now = datetime.utcnow()
+    return [
+        WasteDetection(
+            id=i,
+            user_id=1,
+            image_path=f"uploads/detection_1_{i}.jpg",
+            detected_items=[
+                {"item": "Plastic Bottle", "confidence": 0.92, "disposal_method": "Recycling", "bin_type": "recycling"},
+                {"item": "Banana Peel", "confidence": 0.81, "disposal_method": "Compost", "bin_type": "organic"},
+            ],
+            confidence_scores={"Plastic Bottle": 0.92, "Banana Peel": 0.81},
+            disposal_recommendations=["Recycling", "Compost"],
+            location_lat=19.076 + i * 1e-4,
+            location_lng=72.877,
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(rows)
+    ]
+
+def make_leaderboard(rows: int) -> dict:
+    return {
+        "leaderboard": [
+            {
+                "rank": i + 1,
+                "user_name": f"User {i}",
+                "avatar_url": None if i % 3 else f"https://cdn.example.com/avatars/{i}.png",
+                "recycling_score": 10_000 - i,
+                "total_scans": 500 - i % 500,
+                "is_current_user": i == 7,
+            }
+            for i in range(rows)
+        ],
+        "current_user_rank": 8,
+        "total_users": rows,
+    }
+
+def timed(fn: Callable[[], bytes], rounds: int) -> dict:
+    fn()  # warm up
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "bytes": len(body),
+    }
+
+def compare(name: str, default: Callable[[], bytes], fast: Callable[[], bytes], rounds: int) -> dict:
+    assert json.loads(default()) == json.loads(fast()), f"{name}: payloads differ"
+    result = {"default": timed(default, rounds), "orjson_response_model": timed(fast, rounds)}
+    result["speedup"] = round(result["default"]["p50_ms"] / result["orjson_response_model"]["p50_ms"], 2)
+    return result
+
+def run(rows: int = 500, rounds: int = 200) -> dict:
+    history = make_history(rows)
+    history_adapter = TypeAdapter(List[WasteDetectionHistory])
+    leaderboard = make_leaderboard(rows)
+
+    return {
+        "rows": rows,
+        "history": compare(
+            "history",
+            lambda: JSONResponse(jsonable_encoder(history)).body,
+            lambda: ORJSONResponse(history_adapter.dump_python(
+                history_adapter.validate_python(history, from_attributes=True), mode="json"
+            )).body,
+            rounds,
+        ),
+        "leaderboard": compare(
+            "leaderboard",
+            lambda: JSONResponse(jsonable_encoder(leaderboard)).body,
+            lambda: ORJSONResponse(Leaderboard.model_validate(leaderboard).model_dump(mode="json")).body,
+            rounds,
+        ),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization benchmark")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows, args.rounds), indent=2))
+
+if __name__ == "__main__":
+    main()
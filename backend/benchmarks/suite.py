@@ -0,0 +1,135 @@
+"""
+Run the micro-benchmarks and the load test on the same synthetic dataset and
+save their results, with the commit and environment they ran on, to one JSON
+file. Pass --compare with an earlier file to see what changed between commits.
+
+Each benchmark runs in its own process: the load test configures the app
+through environment variables that are read at import time.
+
+Usage (from the backend directory):
+    python -m benchmarks.suite --output bench-main.json
+    python -m benchmarks.suite --output bench-branch.json --compare bench-main.json
+    python -m benchmarks.suite --results bench-branch.json --compare bench-main.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, Optional
+
+# Changes smaller than this (in percent) are reported as unchanged
+NOISE_PERCENT = 10
+
+def git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(module: str, args: list) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{module}", *args],
+        stdout=subprocess.PIPE, check=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+def run(scale: Dict[str, int], seed: int, database_url: Optional[str], load_args: list) -> dict:
+    common = [f"--{name}={value}" for name, value in scale.items()] + [f"--seed={seed}"]
+    if database_url:
+        common.append(f"--database-url={database_url}")
+    return {
+        "meta": {
+            "commit": git("rev-parse", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dialect": (database_url or "sqlite").split(":", 1)[0],
+            "scale": scale,
+            "seed": seed,
+        },
+        "micro": run_benchmark("micro_bench", common),
+        "load": run_benchmark("load_test", common + load_args),
+    }
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+def higher_is_better(path: str) -> Optional[bool]:
+    """Direction of a metric from its name; None for counts and settings"""
+    name = path.rsplit(".", 1)[-1]
+    if name.endswith(("_ms", "_us")) or name.startswith("ns_") or name in ("seconds", "errors"):
+        return False
+    if name == "rps" or "_per_sec" in name:
+        return True
+    return None
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Metrics that moved by more than NOISE_PERCENT, split into improved and regressed"""
+    before = flatten({"micro": baseline["micro"], "load": baseline["load"]})
+    after = flatten({"micro": current["micro"], "load": current["load"]})
+    improved, regressed = {}, {}
+    for path, new in after.items():
+        direction = higher_is_better(path)
+        old = before.get(path)
+        if direction is None or old is None or old == new:
+            continue
+        change = (new - old) / old * 100 if old else float("inf")
+        if abs(change) < NOISE_PERCENT:
+            continue
+        entry = {"before": old, "after": new, "change_percent": round(change, 1)}
+        (improved if (change > 0) == direction else regressed)[path] = entry
+    return {
+        "baseline": baseline["meta"].get("commit"),
+        "current": current["meta"].get("commit"),
+        "improved": improved,
+        "regressed": regressed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite with comparable JSON results")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bins", type=int, default=2000)
+    parser.add_argument("--disposals", type=int, default=50000)
+    parser.add_argument("--detections", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--skip", default="", help="Endpoints to leave out of the load test mix")
+    parser.add_argument("--output", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results of an earlier run to compare against")
+    parser.add_argument("--results", help="Compare this earlier results file instead of running the benchmarks")
+    args = parser.parse_args()
+
+    scale = {"users": args.users, "bins": args.bins, "disposals": args.disposals, "detections": args.detections}
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        load_args = [f"--concurrency={args.concurrency}", f"--requests={args.requests}", f"--skip={args.skip}"]
+        results = run(scale, args.seed, args.database_url, load_args)
+    if args.output and not args.results:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("scale") != results["meta"]["scale"] or baseline["meta"].get("dialect") != results["meta"]["dialect"]:
+            print("⚠️ Baseline ran on a different dataset or database; differences are not comparable", file=sys.stderr)
+        print(json.dumps(compare(results, baseline), indent=2))
+    elif not args.output:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,36 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 import uvicorn
+import asyncio
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
-from database import get_db, engine
+# Before the project imports: several modules read their settings at import time
+load_dotenv()
+
+from database import get_db, engine, dispose_engines, AsyncSessionLocal
 from models import Base
 from routers import auth, bins, analytics, feedback, location
-from routers import waste_detection, profiles, disposals
+from routers import waste_detection, profiles, disposals, instrumentation
 from utils.auth import verify_token
+from utils.rate_limit_middleware import RateLimitMiddleware
+from utils.compression_middleware import CompressionMiddleware
+from utils.metrics_middleware import MetricsMiddleware
+from utils.metrics import registry, scrape_authorized, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.logging_config import configure_logging
+from utils.query_budget import QueryBudgetMiddleware, QUERY_BUDGET_MODE
+from utils.profiler import ProfilerMiddleware, PROFILER_ENABLED
+from services.disposal_buffer import disposal_buffer, DISPOSAL_BUFFER_ENABLED
+from services.telemetry_service import retention_loop
+from services.bin_events import bin_events
+from services.location_service import location_service
+from services.geo_cache import geo_cache
 
-load_dotenv()
+configure_logging()
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -20,9 +38,16 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Smart EcoBin API",
     description="Python backend for Smart EcoBin waste management system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Compression (innermost, so it sees the final body and headers of every route)
+app.add_middleware(CompressionMiddleware)
+
+# Rate limiting (added before CORS so 429 responses still carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -40,8 +65,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Per-route statement budgets in development/test (inside metrics, which counts the statements)
+if QUERY_BUDGET_MODE != "off":
+    app.add_middleware(QueryBudgetMiddleware)
+
+# Opt-in stack sampling of selected requests (profiles are keyed by request id)
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+# Metrics and request ids (outermost, so timings include rate limiting and sizes are as sent)
+app.add_middleware(MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
 
@@ -54,6 +91,24 @@ app.include_router(location.router, prefix="/api/location", tags=["location"])
 app.include_router(waste_detection.router, prefix="/api/waste", tags=["waste"])
 app.include_router(profiles.router, prefix="/api/profiles", tags=["profiles"])
 app.include_router(disposals.router, prefix="/api/disposals", tags=["disposals"])
+app.include_router(instrumentation.router, prefix="/api/instrumentation", tags=["instrumentation"])
+
+@app.on_event("startup")
+async def startup():
+    await bin_events.start()
+    if DISPOSAL_BUFFER_ENABLED:
+        await disposal_buffer.start()
+    app.state.telemetry_retention = asyncio.create_task(retention_loop(AsyncSessionLocal))
+    await geo_cache.warm()
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.telemetry_retention.cancel()
+    if disposal_buffer.running:
+        await disposal_buffer.stop()
+    await bin_events.stop()
+    await location_service.close()
+    await dispose_engines()
 
 @app.get("/")
 async def root():
@@ -67,6 +122,13 @@ async def health_check():
 async def health_check_api():
     return {"status": "healthy", "service": "smart-ecobin-api"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint; each worker process reports its own metrics"""
+    if not scrape_authorized(authorization):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, ForeignKey, JSON, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,6 +13,8 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(255))
     is_active = Column(Boolean, default=True)
+    # Granted server-side only (seed script or SQL); never settable through the API
+    is_admin = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -41,8 +43,13 @@ class WasteDetection(Base):
 
 class Bin(Base):
     __tablename__ = "bins"
+    __table_args__ = (
+        Index("ix_bins_type_status", "type", "status"),
+        Index("ix_bins_latitude_longitude", "latitude", "longitude"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    external_id = Column(String(64), unique=True)  # ID in the owning municipality's system, used by bulk import
     name = Column(String(255), nullable=False)
     type = Column(String(50), nullable=False)  # general, recycling, organic, hazardous
     latitude = Column(Float, nullable=False)
@@ -51,8 +58,38 @@ class Bin(Base):
     capacity = Column(Integer, default=100)  # Percentage
     status = Column(String(50), default="available")  # available, nearly_full, full, maintenance
     last_updated = Column(DateTime, default=datetime.utcnow)
+    last_telemetry_at = Column(DateTime)  # Sensor timestamp of the reading capacity/status came from
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class BinTelemetry(Base):
+    """Append-only raw fill-level readings from bin sensors"""
+    __tablename__ = "bin_telemetry"
+    __table_args__ = (
+        # One reading per sensor timestamp; retransmitted readings are ignored on insert
+        UniqueConstraint("bin_id", "recorded_at", name="uq_bin_telemetry_bin_recorded"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    bin_id = Column(Integer, ForeignKey("bins.id"), nullable=False)
+    fill_pct = Column(Float, nullable=False)
+    recorded_at = Column(DateTime, nullable=False)  # Sensor timestamp (UTC)
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+class BinTelemetryRollup(Base):
+    """Hourly downsampled fill levels, kept after raw readings are pruned"""
+    __tablename__ = "bin_telemetry_rollups"
+    __table_args__ = (
+        UniqueConstraint("bin_id", "bucket_start", name="uq_bin_telemetry_rollups_bin_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    bin_id = Column(Integer, ForeignKey("bins.id"), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    samples = Column(Integer, default=0)
+    fill_sum = Column(Float, default=0)  # fill_sum / samples is the bucket average
+    fill_min = Column(Float)
+    fill_max = Column(Float)
+
 class Feedback(Base):
     __tablename__ = "feedback"
     
@@ -72,7 +109,7 @@ class UserAnalytics(Base):
     __tablename__ = "user_analytics"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True)
     total_scans = Column(Integer, default=0)
     total_items_disposed = Column(Integer, default=0)
     co2_saved = Column(Float, default=0.0)  # kg of CO2 saved
@@ -105,7 +142,7 @@ class Profile(Base):
     __tablename__ = "profiles"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
     full_name = Column(String(255))
     email = Column(String(255))
     avatar_url = Column(String(500))
@@ -119,6 +156,9 @@ class Profile(Base):
 
 class Disposal(Base):
     __tablename__ = "disposals"
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_disposals_user_idempotency_key"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
@@ -126,6 +166,22 @@ class Disposal(Base):
     waste_type = Column(String(100), nullable=False)
     points_earned = Column(Integer, default=0)
     weight = Column(Float)
+    idempotency_key = Column(String(64))  # Client-supplied key making retried submissions safe
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="disposals")
+
+class GeoCacheEntry(Base):
+    """Persistent tier of the geocoding and place-search cache"""
+    __tablename__ = "geo_cache"
+    __table_args__ = (
+        Index("ix_geo_cache_expires_at", "expires_at"),
+    )
+    
+    key = Column(String(64), primary_key=True)  # SHA-256 of kind and normalized query
+    kind = Column(String(20), nullable=False)  # geocode, places
+    query = Column(String(500), nullable=False)  # Normalized address or quantized search
+    value = Column(Text)  # JSON; NULL caches a lookup that found nothing
+    hits = Column(Integer, default=0)  # Times fetched or read from this tier, used to pick entries to warm
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
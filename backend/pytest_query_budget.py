@@ -0,0 +1,56 @@
+"""
+pytest plugin asserting how many SQL statements a test runs, so N+1 regressions
+fail in CI instead of showing up as slow endpoints in production.
+
+Budget a whole test with a marker:
+
+    @pytest.mark.query_budget(3, max_repeats=1)
+    def test_leaderboard(client): ...
+
+or a single call with the fixture:
+
+    def test_leaderboard(client, assert_max_queries):
+        with assert_max_queries(3, max_repeats=1):
+            client.get("/api/analytics/leaderboard")
+
+Statements are counted on every engine and thread (including the TestClient's
+event loop thread). Failures list each statement shape with its count.
+Enabled from conftest.py with `pytest_plugins = ["pytest_query_budget"]`.
+"""
+from contextlib import contextmanager
+from typing import Optional
+
+import pytest
+
+from utils.query_budget import QueryLog
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries, max_repeats=None): fail the test if it runs more SQL statements",
+    )
+
+def _verify(log: QueryLog, max_queries: Optional[int], max_repeats: Optional[int]):
+    problems = log.check(max_queries, max_repeats)
+    if problems:
+        pytest.fail("Query budget exceeded: " + "; ".join(problems) + "\nStatements:\n" + log.report(), pytrace=False)
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        return (yield)
+    max_queries = marker.args[0] if marker.args else marker.kwargs.get("max_queries")
+    with QueryLog() as log:
+        result = yield
+    _verify(log, max_queries, marker.kwargs.get("max_repeats"))
+    return result
+
+@pytest.fixture
+def assert_max_queries():
+    @contextmanager
+    def budget(max_queries: Optional[int] = None, max_repeats: Optional[int] = None):
+        with QueryLog() as log:
+            yield log
+        _verify(log, max_queries, max_repeats)
+    return budget
@@ -1,67 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+from bisect import bisect_right
 
-from database import get_db
+from database import get_async_db, get_read_db, read_router, AsyncSessionLocal
 from models import User, WasteDetection, Profile as ProfileModel, UserAnalytics as UserAnalyticsModel, Feedback
-from schemas import UserAnalytics
+from schemas import UserAnalytics, Leaderboard
 from utils.auth import verify_token
+from utils.single_flight import SingleFlight
 
 router = APIRouter()
 security = HTTPBearer()
 
+leaderboard_flights = SingleFlight("leaderboard")
+
 @router.get("/dashboard", response_model=Dict[str, Any])
 async def get_dashboard_analytics(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = verify_token(credentials.credentials)
     
     # Get or create user analytics
-    user_analytics = db.query(UserAnalyticsModel).filter(
+    user_analytics = await db.scalar(select(UserAnalyticsModel).where(
         UserAnalyticsModel.user_id == user_id
-    ).first()
+    ).limit(1))
     
     if not user_analytics:
-        user_analytics = create_user_analytics(user_id, db)
+        user_analytics = await create_user_analytics(user_id, db)
     
     # Calculate recent activity
     last_30_days = datetime.utcnow() - timedelta(days=30)
-    recent_scans = db.query(WasteDetection).filter(
+    recent_scans = await db.scalar(select(func.count(WasteDetection.id)).where(
         WasteDetection.user_id == user_id,
         WasteDetection.created_at >= last_30_days
-    ).count()
+    ))
     
     # Calculate weekly stats
-    weekly_stats = calculate_weekly_stats(user_id, db)
+    weekly_stats = await calculate_weekly_stats(user_id, db)
     
     # Calculate environmental impact
-    environmental_impact = calculate_total_environmental_impact(user_id, db)
+    environmental_impact = await calculate_total_environmental_impact(user_id, db)
     
     # Get achievements
-    achievements = calculate_achievements(user_id, db)
+    achievements = await calculate_achievements(user_id, db)
     
     return {
         "total_scans": user_analytics.total_scans,
         "recent_scans": recent_scans,
-        "recycling_score": user_analytics.recycling_score,
+        "recycling_score": user_analytics.points_earned or 0,
         "environmental_impact": environmental_impact,
         "weekly_stats": weekly_stats,
         "achievements": achievements,
-        "monthly_comparison": calculate_monthly_comparison(user_id, db)
+        "monthly_comparison": await calculate_monthly_comparison(user_id, db)
     }
 
 @router.get("/environmental-impact")
 async def get_environmental_impact(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     user_id = verify_token(credentials.credentials)
     
-    impact = calculate_total_environmental_impact(user_id, db)
+    impact = await calculate_total_environmental_impact(user_id, db)
     
     # Add detailed breakdown
     impact["breakdown"] = {
@@ -80,147 +84,161 @@ async def get_environmental_impact(
     
     return impact
 
-@router.get("/leaderboard")
+@router.get("/leaderboard", response_model=Leaderboard, response_model_exclude_unset=True)
 async def get_leaderboard(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
     period: str = Query("all", regex="^(all|week|month)$")
 ):
     user_id = verify_token(credentials.credentials)
     
-    # Period-based leaderboard using Disposals aggregation for week/month
-    from models import Disposal
-    now = datetime.utcnow()
-    start_date = None
-    if period == "week":
-        start_date = now - timedelta(days=7)
-    elif period == "month":
-        start_date = now - timedelta(days=30)
+    # Concurrent requests for the same period share one computation
+    snapshot = await leaderboard_flights.do(period, lambda: load_leaderboard(period))
+    
+    leaderboard = []
+    for i, entry in enumerate(snapshot["top"]):
+        row = {"rank": i + 1, **entry, "is_current_user": int(entry["user_id"]) == int(user_id)}
+        del row["user_id"]
+        leaderboard.append(row)
+    
+    # Current user's rank (standard competition ranking)
+    try:
+        uid_int = int(user_id)
+    except Exception:
+        uid_int = user_id
+    current_pts = snapshot["points"].get(uid_int, 0)
+    scores = snapshot["scores"]
+    current_user_rank = len(scores) - bisect_right(scores, current_pts) + 1
+    
+    if period != "all":
+        return {"leaderboard": leaderboard, "current_user_rank": current_user_rank}
+    return {"leaderboard": leaderboard, "current_user_rank": current_user_rank, "total_users": len(snapshot["points"])}
 
-    if start_date is not None:
-        # Aggregate points by user within period
-        rows = (
-            db.query(Disposal.user_id, func.coalesce(func.sum(Disposal.points_earned), 0).label("pts"), func.count(Disposal.id).label("scans"))
-              .filter(Disposal.created_at >= start_date)
-              .group_by(Disposal.user_id)
-              .order_by(func.sum(Disposal.points_earned).desc())
-              .limit(10)
-              .all()
-        )
-        leaderboard = []
-        for i, r in enumerate(rows):
-            prof = db.query(ProfileModel).filter(ProfileModel.user_id == r.user_id).first()
-            usr = db.query(User).filter(User.id == r.user_id).first()
-            leaderboard.append({
-                "rank": i + 1,
-                "user_name": (prof.full_name if prof and prof.full_name else (usr.email if usr else "Anonymous")),
-                "avatar_url": (prof.avatar_url if prof else None),
-                "recycling_score": int(r.pts or 0),
-                "total_scans": int(r.scans or 0),
-                "is_current_user": r.user_id == user_id
-            })
-        # Current user rank in this period
-        your_pts = 0
-        if user_id:
-            your_row = (
-                db.query(func.coalesce(func.sum(Disposal.points_earned), 0))
-                  .filter(Disposal.user_id == user_id, Disposal.created_at >= start_date)
-                  .scalar()
-            )
-            your_pts = int(your_row or 0)
-        higher = (
-            db.query(Disposal.user_id)
-              .filter(Disposal.created_at >= start_date)
-              .group_by(Disposal.user_id)
-              .having(func.sum(Disposal.points_earned) > your_pts)
-              .count()
-        )
-        return {"leaderboard": leaderboard, "current_user_rank": higher + 1}
+async def load_leaderboard(period: str) -> Dict[str, Any]:
+    """
+    Everything in the leaderboard that does not depend on who is asking: the top 10
+    and every user's points. Opens its own session because it is shared by callers.
+    """
+    async with AsyncSessionLocal(bind=await read_router.pick()) as db:
+        # Period-based leaderboard using Disposals aggregation for week/month
+        from models import Disposal
+        now = datetime.utcnow()
+        start_date = None
+        if period == "week":
+            start_date = now - timedelta(days=7)
+        elif period == "month":
+            start_date = now - timedelta(days=30)
 
-    # All-time leaderboard using a merge of Analytics (points_earned) and Profiles (points)
-    analytics_rows = db.query(UserAnalyticsModel).order_by(UserAnalyticsModel.points_earned.desc()).all()
-    profile_rows = db.query(ProfileModel).order_by(ProfileModel.points.desc()).all()
+        if start_date is not None:
+            # Aggregate points by user within period
+            rows = (await db.execute(
+                select(Disposal.user_id, func.coalesce(func.sum(Disposal.points_earned), 0).label("pts"), func.count(Disposal.id).label("scans"))
+                  .where(Disposal.created_at >= start_date)
+                  .group_by(Disposal.user_id)
+                  .order_by(func.sum(Disposal.points_earned).desc())
+            )).all()
+            top_rows = rows[:10]
+            profiles, users = await load_people(db, [r.user_id for r in top_rows])
+            top = []
+            for r in top_rows:
+                prof = profiles.get(r.user_id)
+                usr = users.get(r.user_id)
+                top.append({
+                    "user_id": r.user_id,
+                    "user_name": (prof.full_name if prof and prof.full_name else (usr.email if usr else "Anonymous")),
+                    "avatar_url": (prof.avatar_url if prof else None),
+                    "recycling_score": int(r.pts or 0),
+                    "total_scans": int(r.scans or 0),
+                })
+            points = {r.user_id: int(r.pts or 0) for r in rows}
+            return {"top": top, "points": points, "scores": sorted(points.values())}
 
-    # Build a combined dict of user_id -> points using analytics first, then profile points if analytics missing
-    combined: dict[int, int] = {}
-    # Start with analytics points
-    for a in analytics_rows:
-        combined[a.user_id] = int(a.points_earned or 0)
-    # Merge profile points taking the larger value so it matches Dashboard totals
-    for p in profile_rows:
-        prof_pts = int(p.points or 0)
-        prev = combined.get(p.user_id, 0)
-        combined[p.user_id] = max(prev, prof_pts)
+        # All-time leaderboard using a merge of Analytics (points_earned) and Profiles (points)
+        analytics_rows = (await db.execute(select(UserAnalyticsModel).order_by(UserAnalyticsModel.points_earned.desc()))).scalars().all()
+        profile_rows = (await db.execute(select(ProfileModel).order_by(ProfileModel.points.desc()))).scalars().all()
 
-    # Sort by points desc
-    sorted_all = sorted(combined.items(), key=lambda x: x[1], reverse=True)
-    # Top 10 for display
-    sorted_users = sorted_all[:10]
+        # Build a combined dict of user_id -> points using analytics first, then profile points if analytics missing
+        combined: dict[int, int] = {}
+        # Start with analytics points
+        for a in analytics_rows:
+            combined[a.user_id] = int(a.points_earned or 0)
+        # Merge profile points taking the larger value so it matches Dashboard totals
+        for p in profile_rows:
+            prof_pts = int(p.points or 0)
+            prev = combined.get(p.user_id, 0)
+            combined[p.user_id] = max(prev, prof_pts)
 
-    leaderboard = []
-    for i, (uid, pts) in enumerate(sorted_users):
-        usr = db.query(User).filter(User.id == uid).first()
-        prof = db.query(ProfileModel).filter(ProfileModel.user_id == uid).first()
-        # total_scans from analytics when present
-        arow = next((a for a in analytics_rows if a.user_id == uid), None)
-        leaderboard.append({
-            "rank": i + 1,
-            "user_name": (prof.full_name if prof and prof.full_name else (usr.full_name if usr and usr.full_name else (usr.email if usr else "Anonymous"))),
-            "avatar_url": (prof.avatar_url if prof else None),
-            "recycling_score": int(pts or 0),
-            "total_scans": int(arow.total_scans) if arow else 0,
-            "is_current_user": int(uid) == int(user_id)
-        })
+        # Sort by points desc
+        sorted_all = sorted(combined.items(), key=lambda x: x[1], reverse=True)
+        # Top 10 for display
+        sorted_users = sorted_all[:10]
 
-    # Compute current user's rank across combined set (standard competition ranking)
-    try:
-        uid_int = int(user_id)
-    except Exception:
-        uid_int = user_id
-    current_pts = combined.get(uid_int, 0)
-    current_user_rank = sum(1 for _, v in combined.items() if v > current_pts) + 1
+        profiles = {p.user_id: p for p in profile_rows}
+        analytics_by_user = {a.user_id: a for a in analytics_rows}
+        _, users = await load_people(db, [uid for uid, _ in sorted_users], with_profiles=False)
 
-    return {"leaderboard": leaderboard, "current_user_rank": current_user_rank, "total_users": len(combined)}
+        top = []
+        for uid, pts in sorted_users:
+            usr = users.get(uid)
+            prof = profiles.get(uid)
+            # total_scans from analytics when present
+            arow = analytics_by_user.get(uid)
+            top.append({
+                "user_id": uid,
+                "user_name": (prof.full_name if prof and prof.full_name else (usr.full_name if usr and usr.full_name else (usr.email if usr else "Anonymous"))),
+                "avatar_url": (prof.avatar_url if prof else None),
+                "recycling_score": int(pts or 0),
+                "total_scans": int(arow.total_scans) if arow else 0,
+            })
+
+        return {"top": top, "points": combined, "scores": sorted(combined.values())}
+
+async def load_people(db: AsyncSession, user_ids: List[int], with_profiles: bool = True) -> Tuple[Dict[int, ProfileModel], Dict[int, User]]:
+    """Profiles and users for the given ids, keyed by user id, in one query each"""
+    if not user_ids:
+        return {}, {}
+    profiles = {}
+    if with_profiles:
+        profiles = {p.user_id: p for p in (await db.execute(
+            select(ProfileModel).where(ProfileModel.user_id.in_(user_ids))
+        )).scalars()}
+    users = {u.id: u for u in (await db.execute(select(User).where(User.id.in_(user_ids)))).scalars()}
+    return profiles, users
 
-def create_user_analytics(user_id: int, db: Session) -> UserAnalyticsModel:
+async def create_user_analytics(user_id: int, db: AsyncSession) -> UserAnalyticsModel:
     """Create initial analytics record for user"""
     user_analytics = UserAnalyticsModel(
         user_id=user_id,
         total_scans=0,
-        total_items_detected=0,
-        recycling_score=0.0,
-        environmental_impact={},
-        monthly_stats={},
-        achievements=[]
+        total_items_disposed=0,
+        points_earned=0,
+        badges=[]
     )
     db.add(user_analytics)
-    db.commit()
-    db.refresh(user_analytics)
+    await db.commit()
+    await db.refresh(user_analytics)
     return user_analytics
 
-def calculate_weekly_stats(user_id: int, db: Session) -> Dict[str, Any]:
+async def calculate_weekly_stats(user_id: int, db: AsyncSession) -> Dict[str, Any]:
     """Calculate weekly statistics for user"""
-    last_7_days = datetime.utcnow() - timedelta(days=7)
+    now = datetime.utcnow()
+    last_7_days = now - timedelta(days=7)
     
-    weekly_scans = db.query(WasteDetection).filter(
-        WasteDetection.user_id == user_id,
-        WasteDetection.created_at >= last_7_days
-    ).count()
+    # Scans per calendar day over the window, in one query
+    scan_day = func.date(WasteDetection.created_at)
+    rows = (await db.execute(
+        select(scan_day, func.count(WasteDetection.id))
+        .where(WasteDetection.user_id == user_id, WasteDetection.created_at >= last_7_days)
+        .group_by(scan_day)
+    )).all()
+    # DATE() comes back as a string on SQLite and as a date on MySQL
+    scans_by_day = {str(day): count for day, count in rows}
+    weekly_scans = sum(scans_by_day.values())
     
     # Calculate daily breakdown
     daily_stats = {}
     for i in range(7):
-        day = datetime.utcnow() - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        daily_scans = db.query(WasteDetection).filter(
-            WasteDetection.user_id == user_id,
-            WasteDetection.created_at >= day_start,
-            WasteDetection.created_at < day_end
-        ).count()
-        
-        daily_stats[day.strftime("%Y-%m-%d")] = daily_scans
+        day = (now - timedelta(days=i)).strftime("%Y-%m-%d")
+        daily_stats[day] = scans_by_day.get(day, 0)
     
     return {
         "total_weekly_scans": weekly_scans,
@@ -228,11 +246,11 @@ def calculate_weekly_stats(user_id: int, db: Session) -> Dict[str, Any]:
         "average_daily": weekly_scans / 7
     }
 
-def calculate_total_environmental_impact(user_id: int, db: Session) -> Dict[str, Any]:
+async def calculate_total_environmental_impact(user_id: int, db: AsyncSession) -> Dict[str, Any]:
     """Calculate total environmental impact for user"""
-    detections = db.query(WasteDetection).filter(
+    detections = (await db.execute(select(WasteDetection).where(
         WasteDetection.user_id == user_id
-    ).all()
+    ))).scalars().all()
     
     total_impact = {
         "co2_saved": 0,
@@ -267,18 +285,18 @@ def calculate_total_environmental_impact(user_id: int, db: Session) -> Dict[str,
     
     return total_impact
 
-def calculate_achievements(user_id: int, db: Session) -> list:
+async def calculate_achievements(user_id: int, db: AsyncSession) -> list:
     """Calculate user achievements"""
     achievements = []
     
     # Get user stats
-    total_scans = db.query(WasteDetection).filter(
+    total_scans = await db.scalar(select(func.count(WasteDetection.id)).where(
         WasteDetection.user_id == user_id
-    ).count()
+    ))
     
-    user_analytics = db.query(UserAnalyticsModel).filter(
+    user_analytics = await db.scalar(select(UserAnalyticsModel).where(
         UserAnalyticsModel.user_id == user_id
-    ).first()
+    ).limit(1))
     
     # Scan-based achievements
     if total_scans >= 1:
@@ -291,15 +309,16 @@ def calculate_achievements(user_id: int, db: Session) -> list:
         achievements.append("Eco Champion")
     
     # Recycling-based achievements
-    if user_analytics and user_analytics.recycling_score >= 100:
+    recycling_score = (user_analytics.points_earned or 0) if user_analytics else 0
+    if recycling_score >= 100:
         achievements.append("Recycling Hero")
-    if user_analytics and user_analytics.recycling_score >= 500:
+    if recycling_score >= 500:
         achievements.append("Green Guardian")
     
     # Feedback achievements
-    feedback_count = db.query(Feedback).filter(
+    feedback_count = await db.scalar(select(func.count(Feedback.id)).where(
         Feedback.user_id == user_id
-    ).count()
+    ))
     
     if feedback_count >= 1:
         achievements.append("Community Contributor")
@@ -308,21 +327,21 @@ def calculate_achievements(user_id: int, db: Session) -> list:
     
     return achievements
 
-def calculate_monthly_comparison(user_id: int, db: Session) -> Dict[str, Any]:
+async def calculate_monthly_comparison(user_id: int, db: AsyncSession) -> Dict[str, Any]:
     """Calculate monthly comparison statistics"""
     current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
     
-    current_month_scans = db.query(WasteDetection).filter(
+    current_month_scans = await db.scalar(select(func.count(WasteDetection.id)).where(
         WasteDetection.user_id == user_id,
         WasteDetection.created_at >= current_month_start
-    ).count()
+    ))
     
-    last_month_scans = db.query(WasteDetection).filter(
+    last_month_scans = await db.scalar(select(func.count(WasteDetection.id)).where(
         WasteDetection.user_id == user_id,
         WasteDetection.created_at >= last_month_start,
         WasteDetection.created_at < current_month_start
-    ).count()
+    ))
     
     change_percentage = 0
     if last_month_scans > 0:
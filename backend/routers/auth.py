@@ -93,7 +93,7 @@ async def login(user_credentials: UserLogin, request: Request, db: Session = Dep
         
         if not user or not verify_password(user_credentials.password, user.hashed_password):
             # Record failed attempt
-            record_failed_login(sanitized_email)
+            await record_failed_login(sanitized_email)
             
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -110,10 +110,10 @@ async def login(user_credentials: UserLogin, request: Request, db: Session = Dep
         
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": str(user.id), "email": user.email}, 
-            expires_delta=access_token_expires
-        )
+        claims = {"sub": str(user.id), "email": user.email}
+        if user.is_admin:
+            claims["admin"] = True
+        access_token = create_access_token(data=claims, expires_delta=access_token_expires)
         
         logging.info(f"User logged in: {sanitized_email}")
         return {"access_token": access_token, "token_type": "bearer"}
@@ -1,43 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import math
+import json
+import asyncio
+import logging
 
-from database import get_db
+from database import get_async_db, get_read_db, read_router, AsyncSessionLocal
 from models import Bin as BinModel
-from schemas import BinCreate, Bin as BinSchema, BinUpdate
-from utils.auth import verify_token
+from schemas import BinCreate, Bin as BinSchema, BinUpdate, TelemetryBatch
+from services.telemetry_service import ingest_readings, ConcurrentIngest
+from services.bin_events import bin_events, bin_event, Region
+from services.bin_stats import bin_stats, count_by_type_status, format_stats
+from services.bin_tiles import bin_tiles
+from services.bin_transfer import import_bins, parse_csv, parse_ndjson, export_csv, export_ndjson
+from utils.auth import verify_token, verify_admin_token, is_device_token
+from utils.response_cache import response_cache, cached_json
+from utils.payload import parse_fields, shape
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 security = HTTPBearer()
 
+# Server-side TTLs (seconds) of cached GET responses; writes invalidate them sooner
+BIN_LIST_CACHE_TTL = 60
+BIN_DETAIL_CACHE_TTL = 300
+BIN_STATS_CACHE_TTL = 30
+
+# Redis invalidations still in flight; the loop only keeps weak references to tasks
+_background: set = set()
+
+def invalidate_cached_bins(events: List[dict]):
+    """Bin event listener: drop cached responses that may include the changed bins"""
+    tags = ["bins", *(f"bin:{event['id']}" for event in events)]
+    response_cache.invalidate_local(*tags)
+    if response_cache.redis_available:
+        _keep_in_background(asyncio.get_running_loop().create_task(response_cache.invalidate(*tags)))
+
+bin_events.add_listener(invalidate_cached_bins)
+
+def _keep_in_background(task: asyncio.Task):
+    _background.add(task)
+
+    def finished(task: asyncio.Task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background cache invalidation failed: {task.exception()!r}")
+
+    task.add_done_callback(finished)
+
 @router.get("/", response_model=List[BinSchema])
 async def get_bins(
+    request: Request,
     lat: Optional[float] = None,
     lng: Optional[float] = None,
     radius: Optional[float] = 5.0,  # km
     bin_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    layout: str = Query("rows", regex="^(rows|columns)$"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(BinModel)
-    
-    # Filter by bin type if specified
-    if bin_type:
-        query = query.filter(BinModel.type == bin_type)
-    
-    bins = query.all()
-    
-    # Filter by location if coordinates provided
+    selected = parse_fields(fields, BinSchema)
+
+    # Location queries are answered from geohash cell candidates, not the response cache
     if lat is not None and lng is not None:
-        filtered_bins = []
-        for bin in bins:
-            distance = calculate_distance(lat, lng, bin.latitude, bin.longitude)
-            if distance <= radius:
-                filtered_bins.append(bin)
-        return filtered_bins
-    
-    return bins
+        candidates = await bin_tiles.candidates(db, Region.around(lat, lng, radius), bin_type)
+        bins = [bin for bin in candidates if calculate_distance(lat, lng, bin.latitude, bin.longitude) <= radius]
+        if selected is None and layout == "rows":
+            return bins
+        return ORJSONResponse(shape(bins, BinSchema, selected, layout))
+
+    async def produce():
+        query = select(BinModel)
+        
+        # Filter by bin type if specified
+        if bin_type:
+            query = query.where(BinModel.type == bin_type)
+        
+        bins = (await db.execute(query)).scalars().all()
+        return shape([BinSchema.model_validate(bin) for bin in bins], BinSchema, selected, layout)
+
+    return await cached_json(request, "bins:list", produce, ttl=BIN_LIST_CACHE_TTL, tags=["bins"])
 
 @router.get("/nearby", response_model=List[BinSchema])
 async def get_nearby_bins(
@@ -45,9 +92,12 @@ async def get_nearby_bins(
     lng: float,
     radius: float = 2.0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    layout: str = Query("rows", regex="^(rows|columns)$"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    bins = db.query(BinModel).all()
+    selected = parse_fields(fields, BinSchema)
+    bins = await bin_tiles.candidates(db, Region.around(lat, lng, radius))
     
     # Calculate distances and sort by proximity
     bins_with_distance = []
@@ -60,23 +110,134 @@ async def get_nearby_bins(
     bins_with_distance.sort(key=lambda x: x[1])
     nearby_bins = [bin[0] for bin in bins_with_distance[:limit]]
     
+    if selected is not None or layout == "columns":
+        return ORJSONResponse(shape(nearby_bins, BinSchema, selected, layout))
     return nearby_bins
 
-@router.get("/{bin_id}", response_model=BinSchema)
-async def get_bin(bin_id: int, db: Session = Depends(get_db)):
-    bin = db.query(BinModel).filter(BinModel.id == bin_id).first()
-    if not bin:
+@router.get("/events")
+async def subscribe_bin_events(
+    request: Request,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius: float = 5.0,  # km
+    min_lat: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    min_lng: Optional[float] = None,
+    max_lng: Optional[float] = None,
+):
+    """
+    Server-Sent Events stream of status/capacity changes for bins in a region,
+    given as a center and radius or as a bounding box. Each `bin` event carries
+    the bin id and its new capacity and status; a `resync` event means the client
+    fell behind and should refetch.
+    """
+    region = parse_region(lat, lng, radius, min_lat, max_lat, min_lng, max_lng)
+    if region is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Bin not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass lat/lng (and radius) or min_lat/max_lat/min_lng/max_lng"
         )
-    return bin
+
+    try:
+        subscription = bin_events.subscribe(region)
+    except OverflowError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many subscribers")
+
+    async def stream():
+        with subscription:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: bin\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/import")
+async def bulk_import_bins(
+    request: Request,
+    format: Optional[str] = Query(None, regex="^(csv|ndjson)$"),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream a CSV (with header row) or NDJSON body of bins and upsert them on external_id.
+    The format comes from ?format= or the Content-Type. Invalid rows are skipped and
+    reported by line number; valid rows are committed in chunks.
+    """
+    verify_admin_token(credentials.credentials)
+
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson" if "ndjson" in content_type else None
+    if format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+        )
+
+    parse = parse_csv if format == "csv" else parse_ndjson
+    try:
+        return await import_bins(db, parse(request.stream()))
+    finally:
+        # Chunks are committed as they go, so an import that fails part way may
+        # already have changed bins
+        bin_stats.invalidate()
+        bin_tiles.clear()
+        await response_cache.invalidate("bins", "bin-details")
+
+@router.get("/export")
+async def bulk_export_bins(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Stream every bin as CSV or NDJSON, reading the table page by page
+    """
+    verify_admin_token(credentials.credentials)
+
+    async def stream():
+        async with AsyncSessionLocal(bind=await read_router.pick()) as db:
+            async for chunk in (export_csv(db) if format == "csv" else export_ndjson(db)):
+                yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=bins.{format}"},
+    )
+
+@router.get("/{bin_id}", response_model=BinSchema)
+async def get_bin(bin_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def produce():
+        bin = await db.get(BinModel, bin_id)
+        if not bin:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Bin not found"
+            )
+        return BinSchema.model_validate(bin)
+
+    return await cached_json(
+        request, f"bins:detail:{bin_id}", produce,
+        ttl=BIN_DETAIL_CACHE_TTL, tags=[f"bin:{bin_id}", "bin-details"],
+    )
 
 @router.post("/", response_model=BinSchema)
 async def create_bin(
     bin_data: BinCreate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verify admin access (you might want to add role-based access control)
     user_id = verify_token(credentials.credentials)
@@ -91,8 +252,11 @@ async def create_bin(
     
     db_bin = BinModel(**bin_data.dict())
     db.add(db_bin)
-    db.commit()
-    db.refresh(db_bin)
+    await db.commit()
+    await db.refresh(db_bin)
+    await bin_events.publish([bin_event(
+        db_bin.id, db_bin.type, db_bin.latitude, db_bin.longitude, db_bin.capacity, db_bin.status, db_bin.last_updated
+    )])
     
     return db_bin
 
@@ -101,57 +265,100 @@ async def update_bin(
     bin_id: int,
     bin_update: BinUpdate,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verify admin access
     user_id = verify_token(credentials.credentials)
     
-    bin = db.query(BinModel).filter(BinModel.id == bin_id).first()
+    bin = await db.get(BinModel, bin_id)
     if not bin:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Bin not found"
         )
     
+    previous_status = bin.status
+    previous_type = bin.type
+    previous_location = (bin.latitude, bin.longitude)
     # Update bin fields
     update_data = bin_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(bin, field, value)
     
-    db.commit()
-    db.refresh(bin)
+    await db.commit()
+    await db.refresh(bin)
+    await bin_events.publish([bin_event(
+        bin.id, bin.type, bin.latitude, bin.longitude, bin.capacity, bin.status, bin.last_updated,
+        previous_status=previous_status,
+        previous_type=previous_type if previous_type != bin.type else None,
+    )])
+    # Events only carry the new position, so a moved bin also drops its old cell here
+    if previous_location != (bin.latitude, bin.longitude):
+        bin_tiles.invalidate_points([previous_location])
     
     return bin
 
+@router.post("/telemetry")
+async def ingest_bin_telemetry(
+    payload: TelemetryBatch,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Batched fill-level readings from bin sensors, sent with a device token from
+    TELEMETRY_DEVICE_TOKENS or an admin token. Each bin's capacity and status
+    follow its newest reading; repeated readings are dropped.
+    """
+    if not is_device_token(credentials.credentials):
+        verify_admin_token(credentials.credentials)
+    try:
+        return await ingest_readings(db, payload.readings)
+    except ConcurrentIngest:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Readings in this batch are being stored by another request; retry the batch"
+        )
+
 @router.get("/types/stats")
-async def get_bin_type_stats(db: Session = Depends(get_db)):
-    stats = {}
-    bin_types = ["general", "recycling", "organic", "hazardous"]
-    
-    for bin_type in bin_types:
-        total = db.query(BinModel).filter(BinModel.type == bin_type).count()
-        available = db.query(BinModel).filter(
-            BinModel.type == bin_type,
-            BinModel.status == "available"
-        ).count()
-        nearly_full = db.query(BinModel).filter(
-            BinModel.type == bin_type,
-            BinModel.status == "nearly_full"
-        ).count()
-        full = db.query(BinModel).filter(
-            BinModel.type == bin_type,
-            BinModel.status == "full"
-        ).count()
-        
-        stats[bin_type] = {
-            "total": total,
-            "available": available,
-            "nearly_full": nearly_full,
-            "full": full,
-            "availability_rate": (available / total * 100) if total > 0 else 0
-        }
-    
-    return stats
+async def get_bin_type_stats(
+    request: Request,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius: float = 5.0,  # km
+    min_lat: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    min_lng: Optional[float] = None,
+    max_lng: Optional[float] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Bin counts per type and status. Fleet-wide stats come from a cached counter
+    matrix; pass lat/lng/radius or a bounding box to count one region instead.
+    """
+    region = parse_region(lat, lng, radius, min_lat, max_lat, min_lng, max_lng)
+
+    async def produce():
+        if region is not None:
+            return format_stats(await count_by_type_status(db, region))
+        return format_stats(await bin_stats.get(db))
+
+    return await cached_json(request, "bins:stats", produce, ttl=BIN_STATS_CACHE_TTL, tags=["bins"])
+
+def parse_region(
+    lat: Optional[float],
+    lng: Optional[float],
+    radius: float,
+    min_lat: Optional[float],
+    max_lat: Optional[float],
+    min_lng: Optional[float],
+    max_lng: Optional[float],
+) -> Optional[Region]:
+    """Region from a bounding box or a center and radius (km); None if neither was given"""
+    if None not in (min_lat, max_lat, min_lng, max_lng):
+        return Region(min_lat, max_lat, min_lng, max_lng)
+    if lat is not None and lng is not None:
+        return Region.around(lat, lng, radius)
+    return None
 
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate distance between two points using Haversine formula"""
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+from typing import Optional
 
-from database import get_db
+from database import get_async_db
 from models import Disposal
+from schemas import DisposalCommit, DisposalBatch
+from services.disposal_buffer import disposal_buffer, BufferFull
+from services.disposal_service import commit_disposal, get_profile_totals, unknown_bin_ids, existing_idempotency_keys
 from utils.auth import verify_token
 
 router = APIRouter()
@@ -14,7 +20,7 @@ security = HTTPBearer()
 async def create_disposal(
     payload: dict,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = verify_token(credentials.credentials)
     waste_type = payload.get("waste_type")
@@ -32,22 +38,118 @@ async def create_disposal(
         created_at=datetime.utcnow(),
     )
     db.add(disposal)
-    db.commit()
-    db.refresh(disposal)
+    await db.commit()
+    await db.refresh(disposal)
     return disposal
 
+@router.post("/commit")
+async def commit_disposal_with_points(
+    payload: DisposalCommit,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=64),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Record a disposal and award its points in one transaction.
+    Send an Idempotency-Key header so client retries never double-count.
+    """
+    user_id = verify_token(credentials.credentials)
+    if not payload.waste_type:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="waste_type is required")
+    if await unknown_bin_ids(db, [payload.bin_id]):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown bin_id {payload.bin_id}")
+
+    disposal, replayed = await commit_disposal(
+        db,
+        user_id,
+        waste_type=payload.waste_type,
+        points_earned=payload.points_earned,
+        bin_id=payload.bin_id,
+        weight=payload.weight,
+        idempotency_key=idempotency_key,
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+
+    return {
+        "disposal": disposal,
+        "profile": await get_profile_totals(db, user_id),
+        "replayed": replayed,
+    }
+
+@router.post("/batch")
+async def ingest_disposals(
+    payload: DisposalBatch,
+    response: Response,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Bulk ingestion for bin hardware and kiosks.
+    With DISPOSAL_BUFFER_ENABLED the events are acknowledged (202) once spilled
+    to disk and written to the database in the background; otherwise they are
+    inserted right away with a single multi-row INSERT (201).
+    """
+    user_id = verify_token(credentials.credentials)
+    if any(not event.waste_type for event in payload.events):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="waste_type is required")
+    keys = [event.idempotency_key for event in payload.events if event.idempotency_key]
+    if len(keys) != len(set(keys)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch repeats an idempotency_key")
+    # Validated before acknowledging: a buffered event the database rejects is only dead-lettered later
+    unknown = await unknown_bin_ids(db, [event.bin_id for event in payload.events])
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown bin_id {unknown}")
+
+    if disposal_buffer.running:
+        try:
+            keys = disposal_buffer.enqueue_many(user_id, [event.dict() for event in payload.events])
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except BufferFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Disposal buffer is full, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"accepted": len(keys), "idempotency_keys": keys, "buffered": True}
+
+    now = datetime.utcnow()
+    try:
+        await db.execute(insert(Disposal).values([
+            {
+                "user_id": user_id,
+                "bin_id": event.bin_id,
+                "waste_type": event.waste_type,
+                "points_earned": event.points_earned,
+                "weight": event.weight,
+                "idempotency_key": event.idempotency_key,
+                "created_at": now,
+            }
+            for event in payload.events
+        ]))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # Only a reused key is a conflict; anything else (e.g. a bin deleted meanwhile) is a bad batch
+        used = await existing_idempotency_keys(db, user_id, keys)
+        if used:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"idempotency_key already used: {used}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch violates a database constraint")
+    response.status_code = status.HTTP_201_CREATED
+    return {"accepted": len(payload.events), "buffered": False}
+
 @router.get("/recent")
 async def recent_disposals(
     limit: int = 5,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = verify_token(credentials.credentials)
-    items = (
-        db.query(Disposal)
-        .filter(Disposal.user_id == user_id)
+    items = (await db.execute(
+        select(Disposal)
+        .where(Disposal.user_id == user_id)
         .order_by(Disposal.created_at.desc())
         .limit(limit)
-        .all()
-    )
+    )).scalars().all()
     return items
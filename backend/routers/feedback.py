@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -71,23 +72,24 @@ async def get_feedback_stats(
 ):
     user_id = verify_token(credentials.credentials)
     
-    # Get feedback statistics for the user
-    total_feedback = db.query(FeedbackModel).filter(FeedbackModel.user_id == user_id).count()
+    # Counts and rating totals per type for the user, in one query
+    rows = db.query(
+        FeedbackModel.type,
+        func.count(FeedbackModel.id),
+        func.sum(FeedbackModel.rating),
+        func.count(FeedbackModel.rating)
+    ).filter(FeedbackModel.user_id == user_id).group_by(FeedbackModel.type).all()
     
-    feedback_by_type = {}
-    for feedback_type in ["general", "feature", "bug", "appreciation"]:
-        count = db.query(FeedbackModel).filter(
-            FeedbackModel.user_id == user_id,
-            FeedbackModel.type == feedback_type
-        ).count()
-        feedback_by_type[feedback_type] = count
+    total_feedback = sum(count for _, count, _, _ in rows)
     
-    avg_rating = db.query(FeedbackModel).filter(
-        FeedbackModel.user_id == user_id,
-        FeedbackModel.rating.isnot(None)
-    ).with_entities(FeedbackModel.rating).all()
+    feedback_by_type = {feedback_type: 0 for feedback_type in ["general", "feature", "bug", "appreciation"]}
+    for feedback_type, count, _, _ in rows:
+        if feedback_type in feedback_by_type:
+            feedback_by_type[feedback_type] = count
     
-    average_rating = sum([r[0] for r in avg_rating]) / len(avg_rating) if avg_rating else 0
+    rating_sum = sum(total or 0 for _, _, total, _ in rows)
+    rating_count = sum(rated for _, _, _, rated in rows)
+    average_rating = rating_sum / rating_count if rating_count else 0
     
     return {
         "total_feedback": total_feedback,
@@ -0,0 +1,119 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from database import pool_metrics, read_router
+from services.disposal_buffer import disposal_buffer
+from services.bin_tiles import bin_tiles
+from services.geo_cache import geo_cache
+from services.detection_cache import detection_cache
+from utils import single_flight
+from utils.response_cache import response_cache
+from utils.auth import verify_admin_token
+from utils.profiler import profile_store
+
+router = APIRouter()
+security = HTTPBearer()
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Connection pool state and checkout telemetry for every engine.
+    Does not touch the database, so it stays responsive during pool starvation.
+    """
+    verify_admin_token(credentials.credentials)
+    return {"pools": [metrics.snapshot() for metrics in pool_metrics.values()]}
+
+@router.get("/replicas")
+async def get_replica_status(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Health and replication lag of each read replica as last observed by the read router
+    """
+    verify_admin_token(credentials.credentials)
+    return {"max_lag_seconds": read_router.max_lag, "replicas": read_router.status()}
+
+@router.get("/disposal-buffer")
+async def get_disposal_buffer_metrics(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Queue depth and flush latency of the disposal write-behind buffer
+    """
+    verify_admin_token(credentials.credentials)
+    return disposal_buffer.metrics()
+
+@router.get("/response-cache")
+async def get_response_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Hit, miss and 304 counts of the response cache in this worker
+    """
+    verify_admin_token(credentials.credentials)
+    return response_cache.stats()
+
+@router.get("/bin-tiles")
+async def get_bin_tile_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Geohash cell cache usage for nearby-bin queries in this worker
+    """
+    verify_admin_token(credentials.credentials)
+    return bin_tiles.stats()
+
+@router.get("/geo-cache")
+async def get_geo_cache_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Geocoding and place-search cache usage in this worker
+    """
+    verify_admin_token(credentials.credentials)
+    return geo_cache.stats()
+
+@router.get("/coalescing")
+async def get_coalescing_stats(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Per single-flight group in this worker: computations run, callers that shared
+    one already in flight, and computations running now. Also the detection cache.
+    """
+    verify_admin_token(credentials.credentials)
+    return {
+        "single_flight": single_flight.stats(),
+        "detection_cache": detection_cache.stats(),
+    }
+
+@router.get("/profiles")
+async def list_profiles(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Recent request profiles in this worker, newest first
+    """
+    verify_admin_token(credentials.credentials)
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("speedscope", regex="^(speedscope|collapsed)$"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    One request profile as speedscope JSON (open it at https://www.speedscope.app)
+    or as collapsed stacks for flamegraph.pl
+    """
+    verify_admin_token(credentials.credentials)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.speedscope()
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
 import logging
 from pydantic import BaseModel, Field
 
-from database import get_db
+from database import get_db, get_read_db
 from services.location_service import location_service
+from services.federated_search import nearby_bins
 from routers.auth import get_current_user
 from models import User
+from utils.auth import verify_token
+from utils.response_cache import cached_json
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
+security = HTTPBearer()
 
 class LocationRequest(BaseModel):
     latitude: float = Field(..., ge=-90, le=90, description="Latitude coordinate")
@@ -35,6 +41,48 @@ class BinLocation(BaseModel):
     hours: str
     website: str
 
+class NearbyBin(BaseModel):
+    id: str
+    source: str  # local (our bins table) or external (SerpAPI)
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    distance: float
+    type: str
+    status: Optional[str] = None  # Only known for local bins
+    capacity: Optional[int] = None
+    rating: Optional[float] = None
+    phone: str = ""
+    hours: str = ""
+    website: str = ""
+
+class NearbyBinsResponse(BaseModel):
+    bins: List[NearbyBin]
+    count: int
+    sources: Dict[str, int]
+    external_status: str  # ok, skipped, timeout, error or unavailable
+    partial: bool
+
+@router.get("/nearby-bins", response_model=NearbyBinsResponse)
+async def get_nearby_bins(
+    latitude: float = Query(..., ge=-90, le=90, description="Latitude coordinate"),
+    longitude: float = Query(..., ge=-180, le=180, description="Longitude coordinate"),
+    radius_km: float = Query(default=5, gt=0, le=50, description="Search radius in kilometers"),
+    bin_type: Optional[str] = Query(default=None, description="Type of bin to search for"),
+    limit: int = Query(default=20, ge=1, le=100),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Our bins and external places near a point, deduplicated and ranked by
+    distance and availability. External results are dropped when local coverage
+    is good enough, and left out (partial=true) if the provider misses the deadline.
+    Authenticated from the token alone, so no sync session is held across the search.
+    """
+    verify_token(credentials.credentials)
+    return await nearby_bins(db, latitude, longitude, radius_km, bin_type, limit)
+
 @router.post("/search-nearby-bins", response_model=List[BinLocation])
 async def search_nearby_bins(
     location_request: LocationRequest,
@@ -129,11 +177,15 @@ async def geocode_address(
 
 @router.get("/bin-types")
 async def get_bin_types(
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get available bin types for search
     """
+    return await cached_json(request, "location:bin-types", list_bin_types, ttl=86400, max_age=3600, private=True)
+
+async def list_bin_types():
     return {
         "bin_types": [
             {"value": "recycling", "label": "Recycling Bins"},
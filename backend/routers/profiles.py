@@ -1,61 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
-from models import User, Profile, UserAnalytics as UserAnalyticsModel
+from database import get_async_db
+from models import Profile
+from schemas import Profile as ProfileSchema
+from services.profile_service import get_or_create_profile, add_points as credit_points
 from utils.auth import verify_token
 
 router = APIRouter()
 security = HTTPBearer()
 
 
-def get_or_create_profile(user_id: int, db: Session) -> Profile:
-    profile = db.query(Profile).filter(Profile.user_id == user_id).first()
-    if not profile:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        profile = Profile(
-            user_id=user_id,
-            full_name=user.full_name,
-            email=user.email,
-            points=0,
-            total_disposals=0,
-            bins_used=0,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        )
-        db.add(profile)
-        db.commit()
-        db.refresh(profile)
-    return profile
-
-@router.get("/me")
+@router.get("/me", response_model=ProfileSchema)
 async def get_my_profile(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = verify_token(credentials.credentials)
-    profile = get_or_create_profile(user_id, db)
-    return jsonable_encoder(profile)
+    profile = await get_or_create_profile(user_id, db)
+    return profile
 
-@router.post("/ensure")
+@router.post("/ensure", response_model=ProfileSchema)
 async def ensure_profile(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_id = verify_token(credentials.credentials)
-    profile = get_or_create_profile(user_id, db)
-    return jsonable_encoder(profile)
+    profile = await get_or_create_profile(user_id, db)
+    return profile
 
 @router.post("/points/add")
 async def add_points(
     payload: dict,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Increment user's points and disposal totals.
     Body: { "points": int, "increment_disposals": bool }
@@ -67,22 +47,8 @@ async def add_points(
     if pts == 0 and not increment_disposals:
         return {"updated": False}
 
-    profile = get_or_create_profile(user_id, db)
-    profile.points = (profile.points or 0) + int(pts)
-    if increment_disposals:
-        profile.total_disposals = (profile.total_disposals or 0) + 1
-    profile.updated_at = datetime.utcnow()
-    db.add(profile)
+    await credit_points(db, user_id, pts, increment_disposals)
+    await db.commit()
 
-    # Update analytics for leaderboard visibility
-    ua = db.query(UserAnalyticsModel).filter(UserAnalyticsModel.user_id == user_id).first()
-    if not ua:
-        ua = UserAnalyticsModel(user_id=user_id, total_scans=0, points_earned=0)
-    if increment_disposals:
-        ua.total_scans = (ua.total_scans or 0) + 1
-    ua.points_earned = (ua.points_earned or 0) + int(pts)
-    ua.updated_at = datetime.utcnow()
-    db.add(ua)
-    db.commit()
-    db.refresh(profile)
-    return jsonable_encoder(profile)
+    profile = await db.scalar(select(Profile).where(Profile.user_id == user_id).limit(1))
+    return ProfileSchema.model_validate(profile)
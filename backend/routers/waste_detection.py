@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 import base64
@@ -6,18 +7,28 @@ import io
 from PIL import Image
 from openai import OpenAI
 import os
-from typing import List
+from typing import List, Optional
 import json
 import re
+import asyncio
+import logging
 
 from database import get_db
 from models import User, WasteDetection
-from schemas import WasteDetectionCreate, WasteDetectionResponse, DetectedItem
+from schemas import WasteDetectionCreate, WasteDetectionResponse, WasteDetectionHistory, DetectedItem
+from services.detection_cache import detection_cache, image_key
 from utils.auth import verify_token
+from utils.single_flight import SingleFlight
+from utils.payload import parse_fields, shape
+from utils.metrics import track_external
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 security = HTTPBearer()
 
+detection_flights = SingleFlight("detection")
+
 # Initialize LLM client preference: OpenRouter first, then OpenAI
 client: OpenAI
 if os.getenv("OPENROUTER_API_KEY"):
@@ -90,22 +101,48 @@ async def detect_waste(
 
 async def analyze_waste_image(image_data: bytes) -> List[DetectedItem]:
     """Analyze waste image using OpenRouter (Gemini Flash) if available, else OpenAI."""
+    # The same photo uploaded again is answered from the detection cache
+    key = image_key(image_data)
+    cached = detection_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        # Convert image to base64 for OpenAI API
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Pick model: when using OpenRouter allow override via OPENROUTER_MODEL
-        # Default to a free vision model on OpenRouter
-        if os.getenv("OPENROUTER_API_KEY"):
-            model_name = os.getenv("OPENROUTER_MODEL", "qwen/qwen2.5-vl-32b-instruct:free")
-        else:
-            model_name = "gpt-4-vision-preview"
-        try:
-            print(f"[waste_detection] Using model={model_name}, api_base={getattr(client, 'base_url', 'openai default')}")
-        except Exception:
-            pass
-
-        response = client.chat.completions.create(
+        # Concurrent uploads of the same photo share one model call
+        return await detection_flights.do(key, lambda: detect_and_cache(key, image_data))
+    except Exception as e:
+        logger.error(f"LLM call failed: {str(e)}")
+        # Fallback to mock detection if LLM fails
+        return unknown_items()
+
+def unknown_items() -> List[DetectedItem]:
+    return [DetectedItem(item="Unknown Item", confidence=0.5, disposal_method="General Waste", bin_type="general")]
+
+async def detect_and_cache(key: str, image_data: bytes) -> List[DetectedItem]:
+    detected_items = await request_waste_analysis(image_data)
+    if not detected_items:
+        # An unparsable reply is not cached, so the next upload asks the model again
+        return unknown_items()
+    detection_cache.set(key, detected_items)
+    return detected_items
+
+async def request_waste_analysis(image_data: bytes) -> List[DetectedItem]:
+    """Send the image to the vision model and parse the items it reports; empty if none could be parsed"""
+    # Convert image to base64 for OpenAI API
+    image_base64 = base64.b64encode(image_data).decode('utf-8')
+    
+    # Pick model: when using OpenRouter allow override via OPENROUTER_MODEL
+    # Default to a free vision model on OpenRouter
+    if os.getenv("OPENROUTER_API_KEY"):
+        model_name = os.getenv("OPENROUTER_MODEL", "qwen/qwen2.5-vl-32b-instruct:free")
+    else:
+        model_name = "gpt-4-vision-preview"
+    logger.info(f"Using model={model_name}, api_base={getattr(client, 'base_url', 'openai default')}")
+
+    # The client is synchronous; run the call in a thread so the event loop keeps serving
+    with track_external("llm"):
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
             model=model_name,
             messages=[
                 {
@@ -132,48 +169,27 @@ async def analyze_waste_image(image_data: bytes) -> List[DetectedItem]:
             temperature=0.2,
         )
 
-        # Attempt to parse JSON from model response
-        content = response.choices[0].message.content if response else ""
-        items_json = None
-        if content:
-            # Extract JSON array
-            match = re.search(r"\[.*\]", content, re.DOTALL)
-            if match:
-                try:
-                    items_json = json.loads(match.group(0))
-                except Exception:
-                    items_json = None
-
-        detected_items: List[DetectedItem] = []
-        if isinstance(items_json, list) and items_json:
-            for item_data in items_json:
-                try:
-                    detected_items.append(DetectedItem(**item_data))
-                except Exception:
-                    continue
-        
-        # Fallback if parsing failed or empty
-        if not detected_items:
-            detected_items = [
-                DetectedItem(item="Unknown Item", confidence=0.5, disposal_method="General Waste", bin_type="general")
-            ]
-        
-        return detected_items
-        
-    except Exception as e:
-        try:
-            print(f"[waste_detection] LLM call failed: {str(e)}")
-        except Exception:
-            pass
-        # Fallback to mock detection if LLM fails
-        return [
-            DetectedItem(
-                item="Unknown Item",
-                confidence=0.5,
-                disposal_method="General Waste",
-                bin_type="general"
-            )
-        ]
+    # Attempt to parse JSON from model response
+    content = response.choices[0].message.content if response else ""
+    items_json = None
+    if content:
+        # Extract JSON array
+        match = re.search(r"\[.*\]", content, re.DOTALL)
+        if match:
+            try:
+                items_json = json.loads(match.group(0))
+            except Exception:
+                items_json = None
+
+    detected_items: List[DetectedItem] = []
+    if isinstance(items_json, list) and items_json:
+        for item_data in items_json:
+            try:
+                detected_items.append(DetectedItem(**item_data))
+            except Exception:
+                continue
+    
+    return detected_items
 
 def calculate_environmental_impact(detected_items: List[DetectedItem]) -> dict:
     """Calculate environmental impact of detected items"""
@@ -212,15 +228,20 @@ def generate_disposal_recommendations(detected_items: List[DetectedItem]) -> Lis
     
     return recommendations
 
-@router.get("/history")
+@router.get("/history", response_model=List[WasteDetectionHistory])
 async def get_detection_history(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     user_id = verify_token(credentials.credentials)
+    selected = parse_fields(fields, WasteDetectionHistory)
     
     detections = db.query(WasteDetection).filter(
         WasteDetection.user_id == user_id
     ).order_by(WasteDetection.created_at.desc()).limit(50).all()
     
+    if selected is not None:
+        history = [WasteDetectionHistory.model_validate(detection) for detection in detections]
+        return ORJSONResponse(shape(history, WasteDetectionHistory, selected))
     return detections
@@ -49,6 +49,20 @@ class WasteDetectionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class WasteDetectionHistory(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    image_path: Optional[str] = None
+    detected_items: Optional[List[Any]] = None
+    confidence_scores: Optional[Dict[str, Any]] = None
+    disposal_recommendations: Optional[List[Any]] = None
+    location_lat: Optional[float] = None
+    location_lng: Optional[float] = None
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Bin Schemas
 class BinBase(BaseModel):
     name: str
@@ -56,6 +70,7 @@ class BinBase(BaseModel):
     latitude: float
     longitude: float
     address: Optional[str] = None
+    external_id: Optional[str] = None
 
 class BinCreate(BinBase):
     pass
@@ -74,6 +89,57 @@ class BinUpdate(BaseModel):
     capacity: Optional[int] = None
     status: Optional[str] = None
 
+# Telemetry Schemas
+class TelemetryReading(BaseModel):
+    bin_id: int
+    fill_pct: float
+    timestamp: datetime
+
+class TelemetryBatch(BaseModel):
+    readings: List[TelemetryReading]
+
+    @validator('readings')
+    def validate_readings(cls, v):
+        if not v:
+            raise ValueError('readings must not be empty')
+        if len(v) > 10000:
+            raise ValueError('At most 10000 readings per batch')
+        return v
+
+# Disposal Schemas
+class DisposalCommit(BaseModel):
+    waste_type: str
+    points_earned: int = 0
+    bin_id: Optional[int] = None
+    weight: Optional[float] = None
+
+    @validator('waste_type')
+    def validate_waste_type(cls, v):
+        # disposals.waste_type is VARCHAR(100)
+        if len(v) > 100:
+            raise ValueError('waste_type must be at most 100 characters')
+        return v
+
+class DisposalEvent(DisposalCommit):
+    idempotency_key: Optional[str] = None
+
+    @validator('idempotency_key')
+    def validate_idempotency_key(cls, v):
+        if v is not None and len(v) > 64:
+            raise ValueError('idempotency_key must be at most 64 characters')
+        return v
+
+class DisposalBatch(BaseModel):
+    events: List[DisposalEvent]
+
+    @validator('events')
+    def validate_events(cls, v):
+        if not v:
+            raise ValueError('events must not be empty')
+        if len(v) > 1000:
+            raise ValueError('At most 1000 events per batch')
+        return v
+
 # Feedback Schemas
 class FeedbackCreate(BaseModel):
     type: str  # general, feature, bug, appreciation
@@ -105,6 +171,35 @@ class UserAnalytics(BaseModel):
     class Config:
         from_attributes = True
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_name: str
+    avatar_url: Optional[str] = None
+    recycling_score: int
+    total_scans: int
+    is_current_user: bool
+
+class Leaderboard(BaseModel):
+    leaderboard: List[LeaderboardEntry]
+    current_user_rank: int
+    total_users: Optional[int] = None  # Only for the all-time leaderboard
+
+# Profile Schemas
+class Profile(BaseModel):
+    id: int
+    user_id: int
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    avatar_url: Optional[str] = None
+    points: Optional[int] = None
+    total_disposals: Optional[int] = None
+    bins_used: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Voice Assistant Schemas
 class VoiceMessage(BaseModel):
     message: str
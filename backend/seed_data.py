@@ -1,13 +1,39 @@
 """
 Seed data script for Smart EcoBin backend
 Run this to populate the database with initial data
+
+Optionally adds a synthetic dataset at a given scale for benchmarks and load tests:
+    python seed_data.py --users 1000 --bins 5000 --disposals 100000 --detections 20000
+Pass --database-url to seed another database (SQLite file or MySQL) and --reset to
+drop and recreate its schema first.
 """
+import argparse
 import asyncio
-from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import Base, Bin, User
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from database import SessionLocal, engine, build_engine
+from models import Base, Bin, User, Profile, UserAnalytics, Disposal, WasteDetection
 from utils.auth import get_password_hash
 
+# Synthetic bins are scattered around these city centres
+CITY_CENTRES = [(19.0760, 72.8777), (28.6139, 77.2090), (12.9716, 77.5946), (13.0827, 80.2707)]
+BIN_TYPES = ["general", "recycling", "organic", "hazardous"]
+BIN_STATUSES = ["available"] * 6 + ["nearly_full"] * 2 + ["full", "maintenance"]
+DETECTABLE_ITEMS = [
+    ("Plastic Bottle", "recycling", "Recycling"),
+    ("Cardboard Box", "recycling", "Recycling"),
+    ("Aluminium Can", "recycling", "Recycling"),
+    ("Glass Jar", "recycling", "Recycling"),
+    ("Banana Peel", "organic", "Compost"),
+    ("Battery", "hazardous", "Hazardous Waste"),
+    ("Chip Packet", "general", "General Waste"),
+]
+SYNTHETIC_DAYS = 60
+BATCH_ROWS = 5000
+
 def create_sample_bins(db: Session):
     """Create sample waste bins across different locations"""
     sample_bins = [
@@ -37,14 +63,15 @@ def create_sample_bins(db: Session):
         {"name": "Delhi Hazardous Center", "type": "hazardous", "latitude": 28.7041, "longitude": 77.1025, "address": "Rohini, Delhi", "capacity": 25, "status": "available"},
     ]
     
-    for bin_data in sample_bins:
-        existing_bin = db.query(Bin).filter(Bin.name == bin_data["name"]).first()
-        if not existing_bin:
-            bin_obj = Bin(**bin_data)
-            db.add(bin_obj)
+    # One lookup for all names and one multi-row insert instead of a query and insert per bin
+    names = [bin_data["name"] for bin_data in sample_bins]
+    existing_names = set(db.scalars(select(Bin.name).where(Bin.name.in_(names))).all())
+    new_bins = [bin_data for bin_data in sample_bins if bin_data["name"] not in existing_names]
+    if new_bins:
+        db.execute(insert(Bin), new_bins)
     
     db.commit()
-    print(f"✅ Created {len(sample_bins)} sample bins")
+    print(f"✅ Created {len(new_bins)} sample bins")
 
 def create_admin_user(db: Session):
     """Create an admin user for testing"""
@@ -56,7 +83,8 @@ def create_admin_user(db: Session):
             email=admin_email,
             hashed_password=get_password_hash("admin123"),
             full_name="Smart EcoBin Admin",
-            is_active=True
+            is_active=True,
+            is_admin=True
         )
         db.add(admin_user)
         db.commit()
@@ -82,21 +110,127 @@ def create_test_user(db: Session):
     else:
         print("ℹ️ Test user already exists")
 
+def insert_batches(db_engine: Engine, table, rows: list):
+    """Multi-row INSERTs of BATCH_ROWS rows, one transaction per batch"""
+    for start in range(0, len(rows), BATCH_ROWS):
+        with db_engine.begin() as conn:
+            conn.execute(table.insert(), rows[start:start + BATCH_ROWS])
+
+def create_synthetic_data(db_engine: Engine, users: int = 0, bins: int = 0, disposals: int = 0, detections: int = 0, seed: int = 42) -> dict:
+    """
+    Add a reproducible synthetic dataset: users (with profiles and analytics for most
+    of them), bins around the sample cities, and disposals and detections spread over
+    the last SYNTHETIC_DAYS days. The same seed and counts give the same data.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def recent() -> datetime:
+        return now - timedelta(seconds=rng.randint(0, SYNTHETIC_DAYS * 86400))
+
+    if users:
+        # Synthetic users never log in (load tests mint their tokens), so skip bcrypt
+        hashed_password = "!synthetic"
+        insert_batches(db_engine, User.__table__, [
+            {"email": f"synthetic{i}@example.com", "hashed_password": hashed_password, "full_name": f"Synthetic User {i}", "is_active": True}
+            for i in range(users)
+        ])
+    with db_engine.connect() as conn:
+        user_ids = list(conn.scalars(select(User.id).where(User.email.like("synthetic%@example.com")).order_by(User.id)))
+    if users:
+        insert_batches(db_engine, Profile.__table__, [
+            {"user_id": user_id, "full_name": f"Synthetic User {user_id}", "points": rng.randint(0, 5000), "total_disposals": rng.randint(0, 300)}
+            for user_id in user_ids if rng.random() < 0.7
+        ])
+        insert_batches(db_engine, UserAnalytics.__table__, [
+            {"user_id": user_id, "points_earned": rng.randint(0, 5000), "total_scans": rng.randint(0, 300), "co2_saved": round(rng.uniform(0, 50), 2)}
+            for user_id in user_ids if rng.random() < 0.8
+        ])
+
+    if bins:
+        bin_rows = []
+        for i in range(bins):
+            lat, lng = rng.choice(CITY_CENTRES)
+            bin_rows.append({
+                "name": f"Synthetic Bin {i}",
+                "type": rng.choice(BIN_TYPES),
+                "latitude": lat + rng.uniform(-0.15, 0.15),
+                "longitude": lng + rng.uniform(-0.15, 0.15),
+                "address": f"{i} Synthetic Street",
+                "capacity": rng.randint(0, 100),
+                "status": rng.choice(BIN_STATUSES),
+            })
+        insert_batches(db_engine, Bin.__table__, bin_rows)
+    with db_engine.connect() as conn:
+        bin_ids = list(conn.scalars(select(Bin.id)))
+
+    if disposals and user_ids:
+        insert_batches(db_engine, Disposal.__table__, [
+            {
+                "user_id": rng.choice(user_ids),
+                "bin_id": rng.choice(bin_ids) if bin_ids else None,
+                "waste_type": rng.choice(BIN_TYPES),
+                "points_earned": rng.randint(5, 20),
+                "weight": round(rng.uniform(0.05, 3), 2),
+                "created_at": recent(),
+            }
+            for _ in range(disposals)
+        ])
+
+    if detections and user_ids:
+        detection_rows = []
+        for _ in range(detections):
+            items = [
+                {"item": name, "confidence": round(rng.uniform(0.5, 0.99), 2), "disposal_method": method, "bin_type": bin_type}
+                for name, bin_type, method in rng.sample(DETECTABLE_ITEMS, rng.randint(1, 3))
+            ]
+            lat, lng = rng.choice(CITY_CENTRES)
+            detection_rows.append({
+                "user_id": rng.choice(user_ids),
+                "image_path": "uploads/synthetic.jpg",
+                "detected_items": items,
+                "confidence_scores": {item["item"]: item["confidence"] for item in items},
+                "disposal_recommendations": [item["disposal_method"] for item in items],
+                "location_lat": lat + rng.uniform(-0.1, 0.1),
+                "location_lng": lng + rng.uniform(-0.1, 0.1),
+                "created_at": recent(),
+            })
+        insert_batches(db_engine, WasteDetection.__table__, detection_rows)
+
+    return {"users": users, "bins": bins, "disposals": disposals if user_ids else 0, "detections": detections if user_ids else 0}
+
 def main():
     """Main seeding function"""
+    parser = argparse.ArgumentParser(description="Seed the Smart EcoBin database")
+    parser.add_argument("--database-url", help="Database to seed (default: DATABASE_URL)")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--users", type=int, default=0, help="Synthetic users to add")
+    parser.add_argument("--bins", type=int, default=0, help="Synthetic bins to add")
+    parser.add_argument("--disposals", type=int, default=0, help="Synthetic disposals to add")
+    parser.add_argument("--detections", type=int, default=0, help="Synthetic waste detections to add")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    args = parser.parse_args()
+
     print("🌱 Seeding Smart EcoBin database...")
     
+    db_engine = build_engine(args.database_url, "seed") if args.database_url else engine
+    if args.reset:
+        Base.metadata.drop_all(bind=db_engine)
+    
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=db_engine)
     
     # Get database session
-    db = SessionLocal()
+    db = sessionmaker(bind=db_engine)() if args.database_url else SessionLocal()
     
     try:
         # Create sample data
         create_admin_user(db)
         create_test_user(db)
         create_sample_bins(db)
+        if args.users or args.bins or args.disposals or args.detections:
+            counts = create_synthetic_data(db_engine, args.users, args.bins, args.disposals, args.detections, args.seed)
+            print(f"✅ Created synthetic data: {counts}")
         
         print("✅ Database seeding completed successfully!")
         print("\nTest Credentials:")
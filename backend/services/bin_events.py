@@ -0,0 +1,166 @@
+import os
+import json
+import math
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Set
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# "memory" fans out within this process only; "redis" relays through Redis pub/sub
+# so that subscribers on every worker see changes written by any worker
+BIN_EVENTS_BACKEND = os.getenv("BIN_EVENTS_BACKEND", "memory")
+BIN_EVENTS_CHANNEL = os.getenv("BIN_EVENTS_CHANNEL", "smart-ecobin:bin-events")
+BIN_EVENTS_MAX_SUBSCRIBERS = int(os.getenv("BIN_EVENTS_MAX_SUBSCRIBERS", 10000))
+# Undelivered events per subscriber before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+
+KM_PER_DEGREE = 111.32
+
+@dataclass(frozen=True)
+class Region:
+    min_lat: float
+    max_lat: float
+    min_lng: float
+    max_lng: float
+
+    @classmethod
+    def around(cls, lat: float, lng: float, radius_km: float) -> "Region":
+        """Bounding box covering a circle of radius_km around a point"""
+        dlat = radius_km / KM_PER_DEGREE
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        return cls(lat - dlat, lat + dlat, lng - dlng, lng + dlng)
+
+    def contains(self, lat: float, lng: float) -> bool:
+        return self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng
+
+class Subscription:
+    def __init__(self, bus: "BinEventBus", region: Region):
+        self.bus = bus
+        self.region = region
+        self.queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind should refetch instead of replaying deltas
+            self.overflowed = True
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc):
+        self.bus.subscribers.discard(self)
+
+class BinEventBus:
+    """
+    Fans bin status/capacity changes out to subscribers interested in the region
+    the bin sits in.
+    """
+    def __init__(self, backend: str = BIN_EVENTS_BACKEND, redis_url: Optional[str] = None,
+                 max_subscribers: int = BIN_EVENTS_MAX_SUBSCRIBERS):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown bin events backend: {backend}")
+        self.backend = backend
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscription] = set()
+        self.listeners: List[Callable[[List[dict]], None]] = []
+        self.published_total = 0
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.backend == "redis":
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+
+    def subscribe(self, region: Region) -> Subscription:
+        if len(self.subscribers) >= self.max_subscribers:
+            raise OverflowError("Too many bin event subscribers")
+        subscription = Subscription(self, region)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def add_listener(self, listener: Callable[[List[dict]], None]):
+        """Call `listener` with every batch of events, regardless of region"""
+        self.listeners.append(listener)
+
+    def dispatch(self, events: List[dict]):
+        """Deliver events to listeners and to the local subscribers whose region contains the bin"""
+        for listener in self.listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                logger.error(f"Bin event listener failed: {e}")
+        for subscription in list(self.subscribers):
+            for event in events:
+                if subscription.region.contains(event["latitude"], event["longitude"]):
+                    subscription.offer(event)
+
+    async def publish(self, events: List[dict]):
+        """
+        Announce bin changes. Each event needs id, latitude, longitude and the changed fields.
+        Call after the change is committed.
+        """
+        if not events:
+            return
+        self.published_total += len(events)
+        if self._redis is not None:
+            try:
+                await self._redis.publish(BIN_EVENTS_CHANNEL, json.dumps(events, default=str))
+                return
+            except Exception as e:
+                logger.warning(f"Redis bin event publish failed, delivering locally only: {e}")
+        self.dispatch(events)
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(BIN_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Bin event subscription to Redis lost, retrying: {e}")
+                await asyncio.sleep(5)
+
+def bin_event(bin_id: int, bin_type: str, latitude: float, longitude: float, capacity: int, status: str,
+              last_updated, previous_status: Optional[str] = None, previous_type: Optional[str] = None) -> dict:
+    """
+    A bin change. previous_status is None for a newly created bin; previous_type
+    is the bin's type before the change, or None when it is unchanged.
+    """
+    return {
+        "id": bin_id,
+        "type": bin_type,
+        "previous_type": previous_type,
+        "previous_status": previous_status,
+        "latitude": latitude,
+        "longitude": longitude,
+        "capacity": capacity,
+        "status": status,
+        "last_updated": last_updated.isoformat() if last_updated else None,
+    }
+
+bin_events = BinEventBus()
@@ -0,0 +1,82 @@
+import os
+import time
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Bin
+from services.bin_events import Region, bin_events
+
+BIN_TYPES = ["general", "recycling", "organic", "hazardous"]
+# The cached matrix is rebuilt from the database this often, which also bounds any
+# drift from writes this worker did not see (bulk imports, other workers without Redis)
+BIN_STATS_REFRESH_SECONDS = float(os.getenv("BIN_STATS_REFRESH_SECONDS", 300))
+
+async def count_by_type_status(db: AsyncSession, region: Optional[Region] = None) -> Counter:
+    """Bin counts keyed by (type, status) from a single GROUP BY"""
+    query = select(Bin.type, Bin.status, func.count(Bin.id)).group_by(Bin.type, Bin.status)
+    if region is not None:
+        query = query.where(
+            Bin.latitude.between(region.min_lat, region.max_lat),
+            Bin.longitude.between(region.min_lng, region.max_lng),
+        )
+    return Counter({(bin_type, status): count for bin_type, status, count in (await db.execute(query)).all()})
+
+def format_stats(counts: Counter) -> Dict[str, dict]:
+    stats = {}
+    for bin_type in BIN_TYPES:
+        total = sum(count for (t, _), count in counts.items() if t == bin_type)
+        available = counts[(bin_type, "available")]
+        stats[bin_type] = {
+            "total": total,
+            "available": available,
+            "nearly_full": counts[(bin_type, "nearly_full")],
+            "full": counts[(bin_type, "full")],
+            "availability_rate": (available / total * 100) if total > 0 else 0
+        }
+    return stats
+
+class BinStatsCache:
+    """
+    Type x status counter matrix for the whole fleet. Loaded with one GROUP BY,
+    then kept current from bin change events and reloaded periodically.
+    """
+    def __init__(self, refresh_seconds: float = BIN_STATS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.counts: Optional[Counter] = None
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        return self.counts is not None and time.monotonic() - self.loaded_at < self.refresh_seconds
+
+    async def get(self, db: AsyncSession) -> Counter:
+        if not self.fresh:
+            async with self._lock:
+                if not self.fresh:
+                    self.counts = await count_by_type_status(db)
+                    self.loaded_at = time.monotonic()
+        return self.counts
+
+    def invalidate(self):
+        self.counts = None
+
+    def apply(self, events: List[dict]):
+        """Move each changed bin from its previous (type, status) cell to the new one"""
+        if self.counts is None:
+            return
+        for event in events:
+            cell: Tuple[str, str] = (event["type"], event["status"])
+            if event.get("previous_status") is not None:
+                previous: Tuple[str, str] = (event.get("previous_type") or event["type"], event["previous_status"])
+                if previous == cell:
+                    continue
+                self.counts[previous] = max(self.counts[previous] - 1, 0)
+            self.counts[cell] += 1
+
+bin_stats = BinStatsCache()
+bin_events.add_listener(bin_stats.apply)
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Bin
+from schemas import Bin as BinSchema
+from services.bin_events import Region, bin_events
+from utils import geohash
+from utils.invalidation import InvalidationClock
+
+# Geohash precision of cached cells (5 = about 4.9 x 4.9 km at the equator)
+BIN_TILE_PRECISION = int(os.getenv("BIN_TILE_PRECISION", 5))
+BIN_TILE_TTL_SECONDS = float(os.getenv("BIN_TILE_TTL_SECONDS", 300))
+BIN_TILE_MAX_CELLS = int(os.getenv("BIN_TILE_MAX_CELLS", 20000))
+# Queries covering more cells than this skip the cache and hit the database directly
+MAX_CELLS_PER_QUERY = 64
+
+class BinTileCache:
+    """
+    Candidate bins per geohash cell. A nearby query is snapped to the cells
+    covering its bounding box, so users in the same area share entries, and the
+    exact distance trim runs on the small candidate set.
+    """
+    def __init__(self, precision: int = BIN_TILE_PRECISION, ttl: float = BIN_TILE_TTL_SECONDS,
+                 max_cells: int = BIN_TILE_MAX_CELLS):
+        self.precision = precision
+        self.ttl = ttl
+        self.max_cells = max_cells
+        self._cells: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.invalidations = InvalidationClock(max_cells)
+        self.cell_hits = 0
+        self.cell_misses = 0
+        self.uncached_queries = 0
+        self.stale_loads = 0
+
+    def _get(self, cell: str) -> Optional[List[BinSchema]]:
+        with self._lock:
+            entry = self._cells.get(cell)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._cells.move_to_end(cell)
+            return entry[1]
+
+    def _put(self, cell: str, bins: List[BinSchema]):
+        with self._lock:
+            self._cells[cell] = (time.monotonic() + self.ttl, bins)
+            self._cells.move_to_end(cell)
+            while len(self._cells) > self.max_cells:
+                self._cells.popitem(last=False)
+
+    async def _load(self, db: AsyncSession, cells: Set[str]) -> Dict[str, List[BinSchema]]:
+        """
+        Fetch the bins of several cells with one bounding-box query. Cells
+        invalidated while the query ran, or just before, are returned but not cached.
+        """
+        started = self.invalidations.now()
+        boxes = [geohash.bounds(cell) for cell in cells]
+        rows = (await db.execute(select(Bin).where(
+            Bin.latitude.between(min(b[0] for b in boxes), max(b[1] for b in boxes)),
+            Bin.longitude.between(min(b[2] for b in boxes), max(b[3] for b in boxes)),
+        ))).scalars().all()
+
+        loaded: Dict[str, List[BinSchema]] = {cell: [] for cell in cells}
+        for row in rows:
+            cell = geohash.encode(row.latitude, row.longitude, self.precision)
+            if cell in loaded:
+                loaded[cell].append(BinSchema.model_validate(row))
+        for cell, bins in loaded.items():
+            if self.invalidations.invalidated_since((cell,), started):
+                self.stale_loads += 1
+            else:
+                self._put(cell, bins)
+        return loaded
+
+    async def candidates(self, db: AsyncSession, region: Region, bin_type: Optional[str] = None) -> List[BinSchema]:
+        """Bins in the cells covering `region`, optionally of one type"""
+        cells = geohash.covering(region.min_lat, region.max_lat, region.min_lng, region.max_lng, self.precision)
+        if len(cells) > MAX_CELLS_PER_QUERY:
+            self.uncached_queries += 1
+            query = select(Bin).where(
+                Bin.latitude.between(region.min_lat, region.max_lat),
+                Bin.longitude.between(region.min_lng, region.max_lng),
+            )
+            if bin_type:
+                query = query.where(Bin.type == bin_type)
+            return [BinSchema.model_validate(row) for row in (await db.execute(query)).scalars().all()]
+
+        found: Dict[str, List[BinSchema]] = {}
+        missing = set()
+        for cell in cells:
+            bins = self._get(cell)
+            if bins is None:
+                missing.add(cell)
+            else:
+                found[cell] = bins
+        self.cell_hits += len(found)
+        self.cell_misses += len(missing)
+        if missing:
+            found.update(await self._load(db, missing))
+
+        return [bin for bins in found.values() for bin in bins if not bin_type or bin.type == bin_type]
+
+    def invalidate_points(self, points):
+        cells = {geohash.encode(lat, lng, self.precision) for lat, lng in points}
+        self.invalidations.invalidate(cells)
+        with self._lock:
+            for cell in cells:
+                self._cells.pop(cell, None)
+
+    def clear(self):
+        self.invalidations.invalidate_all()
+        with self._lock:
+            self._cells.clear()
+
+    def stats(self) -> dict:
+        return {
+            "precision": self.precision,
+            "cells": len(self._cells),
+            "max_cells": self.max_cells,
+            "cell_hits": self.cell_hits,
+            "cell_misses": self.cell_misses,
+            "uncached_queries": self.uncached_queries,
+            "stale_loads": self.stale_loads,
+        }
+
+bin_tiles = BinTileCache()
+bin_events.add_listener(lambda events: bin_tiles.invalidate_points(
+    (event["latitude"], event["longitude"]) for event in events
+))
@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Bin
+from schemas import BinCreate
+from utils.upsert import upsert
+
+# Rows per upsert statement / transaction during import and per page during export
+BIN_TRANSFER_CHUNK_ROWS = int(os.getenv("BIN_TRANSFER_CHUNK_ROWS", 1000))
+# Per-row validation errors returned in an import report (the rest are only counted)
+BIN_IMPORT_MAX_REPORTED_ERRORS = 1000
+
+VALID_BIN_TYPES = ["general", "recycling", "organic", "hazardous"]
+VALID_BIN_STATUSES = ["available", "nearly_full", "full", "maintenance"]
+
+EXPORT_COLUMNS = [
+    "external_id", "name", "type", "latitude", "longitude", "address",
+    "capacity", "status", "last_updated", "created_at",
+]
+UPDATE_COLUMNS = ["name", "type", "latitude", "longitude", "address", "capacity", "status", "last_updated"]
+
+def decode_line(line_no: int, line: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """(text, None) for a UTF-8 line (BOM allowed on the first), else (None, error)"""
+    try:
+        return line.decode("utf-8-sig" if line_no == 1 else "utf-8").rstrip("\r"), None
+    except UnicodeDecodeError as e:
+        return None, f"Line is not valid UTF-8 (byte {e.start + 1})"
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[str], Optional[str]]]:
+    """
+    Split a byte stream into numbered text lines without buffering the whole body.
+    Yields (line, text, error); a line that is not valid UTF-8 only fails itself.
+    """
+    pending = b""
+    line_no = 0
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield (line_no, *decode_line(line_no, line))
+    if pending:
+        line_no += 1
+        yield (line_no, *decode_line(line_no, pending))
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Yield (line, row, error) from a CSV stream with a header row.
+    Records must not contain embedded newlines.
+    """
+    header = None
+    async for line_no, line, error in iter_lines(chunks):
+        if error is not None:
+            yield line_no, None, error
+            continue
+        if not line.strip():
+            continue
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error as e:
+            yield line_no, None, f"Malformed CSV: {e}"
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        if len(values) != len(header):
+            yield line_no, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield line_no, {key: (value if value != "" else None) for key, value in zip(header, values)}, None
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Yield (line, row, error) from a newline-delimited JSON stream
+    """
+    async for line_no, line, error in iter_lines(chunks):
+        if error is not None:
+            yield line_no, None, error
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Each line must be a JSON object"
+            continue
+        yield line_no, row, None
+
+def validate_bin_row(row: dict, now: datetime) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Turn an imported row into a bins row, or explain why it was rejected
+    """
+    external_id = row.get("external_id")
+    if external_id is None or not str(external_id).strip():
+        return None, "external_id is required"
+    external_id = str(external_id).strip()
+    if len(external_id) > 64:
+        return None, "external_id must be at most 64 characters"
+
+    try:
+        bin_data = BinCreate(**{key: row.get(key) for key in ("name", "type", "latitude", "longitude", "address")})
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+    if not bin_data.name.strip() or len(bin_data.name) > 255:
+        return None, "name must be 1-255 characters"
+    if bin_data.address is not None and len(bin_data.address) > 500:
+        return None, "address must be at most 500 characters"
+    if bin_data.type not in VALID_BIN_TYPES:
+        return None, f"Invalid bin type. Must be one of: {VALID_BIN_TYPES}"
+    if not (-90 <= bin_data.latitude <= 90 and -180 <= bin_data.longitude <= 180):
+        return None, "latitude/longitude out of range"
+
+    try:
+        capacity = int(row["capacity"]) if row.get("capacity") is not None else 100
+    except (TypeError, ValueError):
+        return None, "capacity must be an integer"
+    if not 0 <= capacity <= 100:
+        return None, "capacity must be between 0 and 100"
+
+    bin_status = row.get("status") or "available"
+    if bin_status not in VALID_BIN_STATUSES:
+        return None, f"Invalid status. Must be one of: {VALID_BIN_STATUSES}"
+
+    return {
+        "external_id": external_id,
+        "name": bin_data.name,
+        "type": bin_data.type,
+        "latitude": bin_data.latitude,
+        "longitude": bin_data.longitude,
+        "address": bin_data.address,
+        "capacity": capacity,
+        "status": bin_status,
+        "last_updated": now,
+        "created_at": now,
+    }, None
+
+async def upsert_bins(db: AsyncSession, rows: List[dict]):
+    """
+    Insert or update bins keyed on external_id in one statement. Does not commit.
+    """
+    await db.execute(upsert(
+        db.bind.dialect.name,
+        Bin.__table__,
+        rows,
+        index_elements=["external_id"],
+        set_columns=UPDATE_COLUMNS,
+    ))
+
+async def import_bins(
+    db: AsyncSession,
+    rows: AsyncIterator[Tuple[int, Optional[dict], Optional[str]]],
+    chunk_rows: int = BIN_TRANSFER_CHUNK_ROWS,
+) -> dict:
+    """
+    Validate and upsert parsed rows chunk by chunk, committing after each chunk,
+    so memory use stays flat however large the upload is.
+    """
+    report = {"received": 0, "upserted": 0, "rejected": 0, "errors": []}
+    now = datetime.utcnow()
+    chunk: Dict[str, dict] = {}
+
+    async def flush():
+        if chunk:
+            await upsert_bins(db, list(chunk.values()))
+            await db.commit()
+            report["upserted"] += len(chunk)
+            chunk.clear()
+
+    async for line_no, row, error in rows:
+        report["received"] += 1
+        if error is None:
+            bin_row, error = validate_bin_row(row, now)
+        if error is not None:
+            report["rejected"] += 1
+            if len(report["errors"]) < BIN_IMPORT_MAX_REPORTED_ERRORS:
+                report["errors"].append({
+                    "line": line_no,
+                    "external_id": row.get("external_id") if row else None,
+                    "error": error,
+                })
+            continue
+
+        # A later row for the same external_id wins
+        chunk[bin_row["external_id"]] = bin_row
+        if len(chunk) >= chunk_rows:
+            await flush()
+
+    await flush()
+    return report
+
+async def iter_bins(db: AsyncSession, chunk_rows: int = BIN_TRANSFER_CHUNK_ROWS) -> AsyncIterator[Bin]:
+    """
+    Walk the bins table in primary key order with keyset pagination
+    """
+    last_id = 0
+    while True:
+        page = (await db.execute(
+            select(Bin).where(Bin.id > last_id).order_by(Bin.id).limit(chunk_rows)
+        )).scalars().all()
+        if not page:
+            return
+        for bin in page:
+            yield bin
+        last_id = page[-1].id
+        db.expunge_all()
+
+def export_row(bin: Bin) -> dict:
+    row = {column: getattr(bin, column) for column in EXPORT_COLUMNS}
+    for column in ("last_updated", "created_at"):
+        if row[column] is not None:
+            row[column] = row[column].isoformat()
+    return row
+
+async def export_csv(db: AsyncSession) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    count = 0
+    async for bin in iter_bins(db):
+        writer.writerow(export_row(bin))
+        count += 1
+        if count % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+async def export_ndjson(db: AsyncSession) -> AsyncIterator[str]:
+    lines = []
+    async for bin in iter_bins(db):
+        lines.append(json.dumps(export_row(bin)) + "\n")
+        if len(lines) >= 500:
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
@@ -0,0 +1,54 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from schemas import DetectedItem
+
+DETECTION_CACHE_TTL_SECONDS = float(os.getenv("DETECTION_CACHE_TTL_SECONDS", 86400))
+DETECTION_CACHE_MAX_ENTRIES = int(os.getenv("DETECTION_CACHE_MAX_ENTRIES", 1000))
+
+def image_key(image_data: bytes) -> str:
+    return hashlib.sha256(image_data).hexdigest()
+
+class DetectionCache:
+    """
+    Detected items per image, keyed by the SHA-256 of the decoded image bytes,
+    so the same photo uploaded again does not go back to the vision model
+    """
+    def __init__(self, ttl: float = DETECTION_CACHE_TTL_SECONDS, max_entries: int = DETECTION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[DetectedItem]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, items: List[DetectedItem]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, items)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+detection_cache = DetectionCache()
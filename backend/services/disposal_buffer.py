@@ -0,0 +1,395 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from database import AsyncSessionLocal
+from models import Disposal
+from utils.metrics import registry, Counter
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): a worker only replays its own spill file
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DISPOSAL_BUFFER_ENABLED = os.getenv("DISPOSAL_BUFFER_ENABLED", "false").lower() == "true"
+DISPOSAL_BUFFER_MAX_SIZE = int(os.getenv("DISPOSAL_BUFFER_MAX_SIZE", 10000))
+DISPOSAL_BUFFER_FLUSH_MS = int(os.getenv("DISPOSAL_BUFFER_FLUSH_MS", 200))
+DISPOSAL_BUFFER_BATCH_ROWS = int(os.getenv("DISPOSAL_BUFFER_BATCH_ROWS", 500))
+# Each worker spills to its own file next to this path (disposal_buffer.<pid>.ndjson)
+DISPOSAL_BUFFER_SPILL_PATH = os.getenv("DISPOSAL_BUFFER_SPILL_PATH", "disposal_buffer.ndjson")
+# Events the database rejected (constraint or data errors) are moved here instead of being retried
+DISPOSAL_BUFFER_DEAD_LETTER_PATH = os.getenv("DISPOSAL_BUFFER_DEAD_LETTER_PATH", "disposal_buffer.dead.ndjson")
+# fsync every enqueue (survives power loss) instead of once per flush cycle (survives process crashes)
+DISPOSAL_BUFFER_FSYNC = os.getenv("DISPOSAL_BUFFER_FSYNC", "false").lower() == "true"
+
+WASTE_TYPE_MAX_LENGTH = Disposal.__table__.c.waste_type.type.length
+
+dead_letters = registry.register(Counter(
+    "disposal_buffer_dead_letters_total", "Buffered disposals the database rejected, moved to the dead-letter file"
+))
+
+class BufferFull(Exception):
+    pass
+
+def try_lock(path: str):
+    """
+    Open `path` holding an exclusive advisory lock, or return None when another
+    process holds it. The lock is released when the file is closed or the process dies.
+    """
+    handle = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+    return handle
+
+def remove(*paths: str):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def validate_event(waste_type: Optional[str]):
+    """Reject events that could never be inserted, before they are acknowledged"""
+    if not waste_type or not isinstance(waste_type, str):
+        raise ValueError("waste_type is required")
+    if len(waste_type) > WASTE_TYPE_MAX_LENGTH:
+        raise ValueError(f"waste_type must be at most {WASTE_TYPE_MAX_LENGTH} characters")
+
+class DisposalBuffer:
+    """
+    Write-behind buffer for bursty disposal ingestion.
+
+    Events are appended to a local NDJSON spill file and an in-memory queue,
+    then acknowledged. Every worker process has its own spill file (the pid is
+    added to `spill_path`) and holds a lock on it while running. A background task writes them to `disposals` with
+    multi-row INSERTs every `flush_ms` or as soon as `batch_rows` are waiting.
+    After each successful flush the spill file is rewritten with only the
+    events still pending. On start, events left in spill files whose worker is
+    gone (their lock is free) are taken over and replayed.
+
+    Each event carries an idempotency key, so replaying events that were
+    committed just before a crash does not duplicate rows.
+
+    A batch the database rejects with a constraint or data error is split
+    until the offending events are isolated; those are appended to a
+    dead-letter file and dropped, so one bad event never blocks the queue.
+    Other errors (e.g. the database being down) leave the batch pending.
+    """
+    def __init__(
+        self,
+        session_factory,
+        spill_path: str = DISPOSAL_BUFFER_SPILL_PATH,
+        max_size: int = DISPOSAL_BUFFER_MAX_SIZE,
+        flush_ms: int = DISPOSAL_BUFFER_FLUSH_MS,
+        batch_rows: int = DISPOSAL_BUFFER_BATCH_ROWS,
+        fsync: bool = DISPOSAL_BUFFER_FSYNC,
+        dead_letter_path: str = DISPOSAL_BUFFER_DEAD_LETTER_PATH,
+        worker_id: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.spill_base = spill_path
+        # Known in start(), which runs in the worker process (the pid before a fork would be shared)
+        self.worker_id = worker_id
+        self.spill_path: Optional[str] = None
+        self.max_size = max_size
+        self.flush_interval = flush_ms / 1000
+        self.batch_rows = batch_rows
+        self.fsync = fsync
+        self.dead_letter_path = dead_letter_path
+
+        self.pending: Deque[dict] = deque()
+        self._spill = None
+        self._lock_file = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Metrics
+        self.enqueued_total = 0
+        self.rejected_total = 0
+        self.flushed_rows_total = 0
+        self.duplicate_rows_total = 0
+        self.flushes_total = 0
+        self.flush_errors_total = 0
+        self.dead_lettered_total = 0
+        self.flush_latencies_ms: Deque[float] = deque(maxlen=1000)
+        self.max_event_age_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _worker_spill_path(self, worker_id: str) -> str:
+        stem, suffix = os.path.splitext(self.spill_base)
+        return f"{stem}.{worker_id}{suffix}"
+
+    def _orphaned_spill_paths(self) -> List[str]:
+        """Spill files of other workers, and the shared file older versions wrote to"""
+        directory = os.path.dirname(self.spill_base) or "."
+        stem, suffix = os.path.splitext(os.path.basename(self.spill_base))
+        pattern = re.compile(rf"^{re.escape(stem)}\.\w+{re.escape(suffix)}$")
+        paths = [self.spill_base] if os.path.exists(self.spill_base) else []
+        paths += sorted(os.path.join(directory, name) for name in os.listdir(directory) if pattern.match(name))
+        # The default dead-letter file (disposal_buffer.dead.ndjson) matches the pattern too
+        skip = {os.path.abspath(self.spill_path), os.path.abspath(self.dead_letter_path)}
+        return [path for path in paths if os.path.abspath(path) not in skip]
+
+    def _read_spill(self, path: str) -> int:
+        """Queue the events of a spill file; returns how many were read"""
+        count = 0
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self.pending.append(json.loads(line))
+                    count += 1
+                except json.JSONDecodeError as e:
+                    # A line cut short by a crash mid-write
+                    self._dead_letter({"raw": line}, e)
+        return count
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        self.spill_path = self._worker_spill_path(self.worker_id or str(os.getpid()))
+        self._lock_file = try_lock(f"{self.spill_path}.lock")
+        if self._lock_file is None:
+            raise RuntimeError(f"Disposal buffer spill file {self.spill_path} is in use by another process")
+        if os.path.exists(self.spill_path):
+            self._read_spill(self.spill_path)
+
+        adopted = []
+        if fcntl is not None:
+            for path in self._orphaned_spill_paths():
+                lock = try_lock(f"{path}.lock")
+                if lock is None:
+                    # Its worker is still running
+                    continue
+                if os.path.exists(path):
+                    count = self._read_spill(path)
+                    logger.info(f"Taking over {count} buffered disposals from {path}")
+                adopted.append((path, lock))
+
+        # Own the adopted events before their files are removed
+        self._write_spill()
+        for path, lock in adopted:
+            remove(path, f"{path}.lock")
+            lock.close()
+        if self.pending:
+            logger.info(f"Replaying {len(self.pending)} buffered disposals")
+
+        self._spill = open(self.spill_path, "a")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+        if self._lock_file:
+            # Left in place with events still pending (database down) for the next start to replay
+            if not self.pending:
+                remove(self.spill_path, f"{self.spill_path}.lock")
+            self._lock_file.close()
+            self._lock_file = None
+
+    def enqueue(self, user_id: int, waste_type: str, points_earned: int = 0,
+                bin_id: Optional[int] = None, weight: Optional[float] = None,
+                idempotency_key: Optional[str] = None) -> str:
+        """
+        Durably accept one disposal event. Raises BufferFull when the queue is at capacity
+        and ValueError for an event the database would reject. Bin ids must be checked
+        against `bins` by the caller.
+        """
+        validate_event(waste_type)
+        if len(self.pending) >= self.max_size:
+            self.rejected_total += 1
+            raise BufferFull("Disposal buffer is full")
+
+        event = {
+            "user_id": int(user_id),
+            "bin_id": bin_id,
+            "waste_type": waste_type,
+            "points_earned": int(points_earned),
+            "weight": weight,
+            "idempotency_key": idempotency_key or f"buf-{uuid.uuid4().hex}",
+            "created_at": datetime.utcnow().isoformat(),
+            "enqueued_at": time.time(),
+        }
+        self._spill.write(json.dumps(event) + "\n")
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+
+        self.pending.append(event)
+        self.enqueued_total += 1
+        if len(self.pending) >= self.batch_rows:
+            self._wake.set()
+        return event["idempotency_key"]
+
+    def enqueue_many(self, user_id: int, events: List[dict]) -> List[str]:
+        """
+        Accept a whole batch or none of it, so a full buffer never leaves a batch half-acknowledged
+        """
+        for event in events:
+            validate_event(event.get("waste_type"))
+        if len(self.pending) + len(events) > self.max_size:
+            self.rejected_total += len(events)
+            raise BufferFull("Disposal buffer is full")
+        return [self.enqueue(user_id, **event) for event in events]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.flush_errors_total += 1
+                logger.error(f"Disposal buffer flush failed, will retry: {e}")
+                await asyncio.sleep(min(self.flush_interval * 5, 5))
+
+    async def flush(self):
+        """
+        Write all pending events in batches of `batch_rows`, then compact the spill file
+        """
+        async with self._flush_lock:
+            flushed = False
+            while self.pending:
+                batch = [self.pending[i] for i in range(min(self.batch_rows, len(self.pending)))]
+                start = time.perf_counter()
+                await self._write_batch(batch)
+                self.flush_latencies_ms.append((time.perf_counter() - start) * 1000)
+                self.flushes_total += 1
+                self.max_event_age_ms = max(self.max_event_age_ms, (time.time() - batch[0]["enqueued_at"]) * 1000)
+                for _ in batch:
+                    self.pending.popleft()
+                flushed = True
+
+            if flushed:
+                self._compact_spill()
+
+    async def _write_batch(self, batch: List[dict]):
+        """
+        Insert a batch, bisecting it on constraint/data errors so only the
+        events that fail on their own are dead-lettered
+        """
+        try:
+            await self._insert_batch(batch)
+        except (IntegrityError, DataError) as e:
+            if len(batch) == 1:
+                self._dead_letter(batch[0], e)
+                return
+            middle = len(batch) // 2
+            await self._write_batch(batch[:middle])
+            await self._write_batch(batch[middle:])
+
+    def _dead_letter(self, event: dict, error: Exception):
+        logger.error(f"Disposal {event.get('idempotency_key')} rejected by the database, dead-lettered: {error}")
+        with open(self.dead_letter_path, "a") as f:
+            f.write(json.dumps({**event, "error": str(error)[:500], "failed_at": datetime.utcnow().isoformat()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.dead_lettered_total += 1
+        dead_letters.inc()
+
+    async def _insert_batch(self, batch: List[dict]):
+        keys = [event["idempotency_key"] for event in batch]
+        async with self.session_factory() as db:
+            existing = set((await db.execute(
+                select(Disposal.user_id, Disposal.idempotency_key).where(Disposal.idempotency_key.in_(keys))
+            )).all())
+
+            rows: Dict[Tuple[int, str], dict] = {}
+            for event in batch:
+                key = (event["user_id"], event["idempotency_key"])
+                if key in existing or key in rows:
+                    continue
+                rows[key] = {
+                    "user_id": event["user_id"],
+                    "bin_id": event["bin_id"],
+                    "waste_type": event["waste_type"],
+                    "points_earned": event["points_earned"],
+                    "weight": event["weight"],
+                    "idempotency_key": event["idempotency_key"],
+                    "created_at": datetime.fromisoformat(event["created_at"]),
+                }
+
+            if rows:
+                await db.execute(insert(Disposal).values(list(rows.values())))
+                await db.commit()
+            self.flushed_rows_total += len(rows)
+            self.duplicate_rows_total += len(batch) - len(rows)
+
+    def _write_spill(self):
+        """Atomically replace this worker's spill file with the pending events"""
+        tmp_path = f"{self.spill_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for event in self.pending:
+                f.write(json.dumps(event) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spill_path)
+
+    def _compact_spill(self):
+        """Rewrite the spill file so it only holds events not yet committed"""
+        if self._spill is None:
+            return
+        self._spill.close()
+        self._write_spill()
+        self._spill = open(self.spill_path, "a")
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.flush_latencies_ms)
+        return {
+            "enabled": self.running,
+            "pending": len(self.pending),
+            "max_size": self.max_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "batch_rows": self.batch_rows,
+            "enqueued_total": self.enqueued_total,
+            "rejected_total": self.rejected_total,
+            "flushed_rows_total": self.flushed_rows_total,
+            "duplicate_rows_total": self.duplicate_rows_total,
+            "flushes_total": self.flushes_total,
+            "flush_errors_total": self.flush_errors_total,
+            "dead_lettered_total": self.dead_lettered_total,
+            "flush_latency_ms": {
+                "p50": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                "p99": round(latencies[int(len(latencies) * 0.99)], 3) if latencies else 0.0,
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+            "max_event_age_ms": round(self.max_event_age_ms, 3),
+        }
+
+disposal_buffer = DisposalBuffer(AsyncSessionLocal)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Bin, Disposal, Profile
+from services.profile_service import add_points
+
+async def find_by_idempotency_key(db: AsyncSession, user_id: int, idempotency_key: str) -> Optional[Disposal]:
+    return await db.scalar(
+        select(Disposal)
+        .where(Disposal.user_id == user_id, Disposal.idempotency_key == idempotency_key)
+        .limit(1)
+    )
+
+async def unknown_bin_ids(db: AsyncSession, bin_ids: Iterable[Optional[int]]) -> List[int]:
+    """The given bin ids that do not exist, checked in one query"""
+    wanted = {bin_id for bin_id in bin_ids if bin_id is not None}
+    if not wanted:
+        return []
+    found = set((await db.scalars(select(Bin.id).where(Bin.id.in_(wanted)))).all())
+    return sorted(wanted - found)
+
+async def existing_idempotency_keys(db: AsyncSession, user_id: int, keys: Iterable[Optional[str]]) -> List[str]:
+    wanted = {key for key in keys if key}
+    if not wanted:
+        return []
+    return sorted((await db.scalars(
+        select(Disposal.idempotency_key).where(Disposal.user_id == int(user_id), Disposal.idempotency_key.in_(wanted))
+    )).all())
+
+async def commit_disposal(
+    db: AsyncSession,
+    user_id: int,
+    waste_type: str,
+    points_earned: int = 0,
+    bin_id: Optional[int] = None,
+    weight: Optional[float] = None,
+    idempotency_key: Optional[str] = None,
+) -> Tuple[Disposal, bool]:
+    """
+    Record a disposal and credit its points in a single transaction:
+    inserts the Disposal, increments Profile points/total_disposals/bins_used
+    and upserts UserAnalytics, then commits once.
+
+    Returns (disposal, replayed). A repeated idempotency_key returns the
+    originally recorded disposal without crediting anything again.
+    """
+    user_id = int(user_id)
+
+    if idempotency_key:
+        existing = await find_by_idempotency_key(db, user_id, idempotency_key)
+        if existing:
+            return existing, True
+
+    first_use_of_bin = False
+    if bin_id is not None:
+        first_use_of_bin = await db.scalar(
+            select(Disposal.id).where(Disposal.user_id == user_id, Disposal.bin_id == bin_id).limit(1)
+        ) is None
+
+    disposal = Disposal(
+        user_id=user_id,
+        bin_id=bin_id,
+        waste_type=waste_type,
+        points_earned=points_earned,
+        weight=weight,
+        idempotency_key=idempotency_key,
+        created_at=datetime.utcnow(),
+    )
+    db.add(disposal)
+
+    try:
+        # Flush first so a concurrent retry with the same key fails before any points move
+        await db.flush()
+        await add_points(
+            db,
+            user_id,
+            points_earned,
+            increment_disposals=True,
+            bins_used=1 if first_use_of_bin else 0,
+        )
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        if idempotency_key:
+            existing = await find_by_idempotency_key(db, user_id, idempotency_key)
+            if existing:
+                return existing, True
+        raise
+
+    return disposal, False
+
+async def get_profile_totals(db: AsyncSession, user_id: int) -> dict:
+    row = (await db.execute(
+        select(Profile.points, Profile.total_disposals, Profile.bins_used)
+        .where(Profile.user_id == int(user_id))
+        .limit(1)
+    )).first()
+    if row is None:
+        return {"points": 0, "total_disposals": 0, "bins_used": 0}
+    return {"points": row.points, "total_disposals": row.total_disposals, "bins_used": row.bins_used}
@@ -0,0 +1,178 @@
+import os
+import re
+import asyncio
+import logging
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.bin_events import Region
+from services.bin_tiles import bin_tiles
+from services.location_service import location_service
+from utils.geohash import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Total time budget; if SerpAPI has not answered by then, local results are returned alone
+FEDERATED_DEADLINE_MS = int(os.getenv("FEDERATED_DEADLINE_MS", 1500))
+# Usable local bins in range at which the external search is not waited for
+FEDERATED_LOCAL_SUFFICIENT = int(os.getenv("FEDERATED_LOCAL_SUFFICIENT", 5))
+# An external place this close to a local bin with a similar name is the same bin
+FEDERATED_DEDUPE_METERS = float(os.getenv("FEDERATED_DEDUPE_METERS", 75))
+# Closer than this they are the same bin whatever the names say
+SAME_SPOT_METERS = 15
+NAME_SIMILARITY = 0.6
+
+# Ranking is by distance plus a penalty (km) for how likely the bin is to take waste
+STATUS_PENALTY_KM = {"available": 0.0, "nearly_full": 0.3, "full": 5.0}
+EXTERNAL_PENALTY_KM = 0.25  # Availability of external places is unknown
+USABLE_STATUSES = ("available", "nearly_full")
+
+# Searches that outlived their deadline keep running so their results get cached
+_background: set = set()
+
+def _name_key(name: str) -> str:
+    return " ".join(re.findall(r"\w+", name.casefold()))
+
+def similar_names(a: str, b: str) -> bool:
+    a, b = _name_key(a), _name_key(b)
+    return bool(a and b) and (a in b or b in a or SequenceMatcher(None, a, b).ratio() >= NAME_SIMILARITY)
+
+def local_result(bin, distance: float) -> dict:
+    return {
+        "id": f"local:{bin.id}",
+        "source": "local",
+        "name": bin.name,
+        "address": bin.address or "",
+        "latitude": bin.latitude,
+        "longitude": bin.longitude,
+        "distance": distance,
+        "type": bin.type,
+        "status": bin.status,
+        "capacity": bin.capacity,
+        "rating": None,
+        "phone": "",
+        "hours": "",
+        "website": "",
+    }
+
+def external_result(place: dict) -> dict:
+    return {
+        **place,
+        "id": str(place["id"]),
+        "source": "external",
+        "status": None,
+        "capacity": None,
+    }
+
+def merge(local: List[dict], external: List[dict]) -> List[dict]:
+    """
+    Drop external places that duplicate a local bin, copying their contact
+    details onto the local entry, and return the combined list
+    """
+    merged = list(local)
+    for place in external:
+        duplicate = None
+        for item in local:
+            meters = haversine_km(item["latitude"], item["longitude"], place["latitude"], place["longitude"]) * 1000
+            if meters <= SAME_SPOT_METERS or (meters <= FEDERATED_DEDUPE_METERS and similar_names(item["name"], place["name"])):
+                duplicate = item
+                break
+        if duplicate is None:
+            merged.append(place)
+            continue
+        for field in ("address", "phone", "hours", "website", "rating"):
+            if not duplicate[field] and place.get(field):
+                duplicate[field] = place[field]
+    return merged
+
+def rank_key(item: dict):
+    if item["source"] == "external":
+        penalty = EXTERNAL_PENALTY_KM
+    else:
+        penalty = STATUS_PENALTY_KM.get(item["status"], STATUS_PENALTY_KM["full"])
+    return (item["distance"] + penalty, item["distance"])
+
+async def nearby_bins(
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    bin_type: Optional[str] = None,
+    limit: int = 20,
+    deadline_ms: int = FEDERATED_DEADLINE_MS,
+) -> Dict:
+    """
+    Our bins and SerpAPI places near a point in one ranked list.
+
+    The external search starts first and runs while the local candidates are read
+    from the geohash tile cache. If enough usable local bins are in range the
+    external result is not waited for; otherwise it is awaited until the deadline.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_ms / 1000
+
+    external_task = None
+    if location_service.serpapi_configured:
+        external_task = asyncio.create_task(
+            location_service.find_places(latitude, longitude, int(round(radius_km)) or 1, bin_type or "recycling")
+        )
+
+    try:
+        candidates = await bin_tiles.candidates(db, Region.around(latitude, longitude, radius_km), bin_type)
+    except BaseException:
+        if external_task is not None:
+            external_task.cancel()
+        raise
+    local = []
+    for bin in candidates:
+        if bin.status == "maintenance":
+            continue
+        distance = haversine_km(latitude, longitude, bin.latitude, bin.longitude)
+        if distance <= radius_km:
+            local.append(local_result(bin, distance))
+
+    external: List[dict] = []
+    usable = sum(1 for item in local if item["status"] in USABLE_STATUSES)
+    if external_task is None:
+        external_status = "unavailable"
+    elif usable >= FEDERATED_LOCAL_SUFFICIENT and not external_task.done():
+        external_status = "skipped"
+        _keep_in_background(external_task)
+    else:
+        done, _ = await asyncio.wait({external_task}, timeout=max(deadline - loop.time(), 0))
+        if not done:
+            external_status = "timeout"
+            _keep_in_background(external_task)
+        elif external_task.exception() is not None:
+            external_status = "error"
+            logger.error(f"External place search failed: {external_task.exception()!r}")
+        else:
+            external_status = "ok"
+            external = [
+                external_result(place) for place in external_task.result()
+                if place["distance"] <= radius_km
+            ]
+
+    results = sorted(merge(local, external), key=rank_key)[:limit]
+    return {
+        "bins": results,
+        "count": len(results),
+        "sources": {
+            "local": sum(1 for item in results if item["source"] == "local"),
+            "external": sum(1 for item in results if item["source"] == "external"),
+        },
+        "external_status": external_status,
+        "partial": external_status in ("timeout", "error"),
+    }
+
+def _keep_in_background(task: asyncio.Task):
+    _background.add(task)
+
+    def finished(task: asyncio.Task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background place search failed: {task.exception()!r}")
+
+    task.add_done_callback(finished)
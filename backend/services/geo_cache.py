@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import select, update, delete
+
+from database import AsyncSessionLocal
+from models import GeoCacheEntry
+from utils.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+GEO_CACHE_MAX_ENTRIES = int(os.getenv("GEO_CACHE_MAX_ENTRIES", 5000))
+# Store entries in the geo_cache table so they survive restarts and are shared by workers
+GEO_CACHE_PERSIST = os.getenv("GEO_CACHE_PERSIST", "true").lower() == "true"
+GEO_CACHE_GEOCODE_TTL_SECONDS = float(os.getenv("GEO_CACHE_GEOCODE_TTL_SECONDS", 30 * 86400))
+GEO_CACHE_SEARCH_TTL_SECONDS = float(os.getenv("GEO_CACHE_SEARCH_TTL_SECONDS", 86400))
+# Lookups that found nothing are retried sooner
+GEO_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("GEO_CACHE_NEGATIVE_TTL_SECONDS", 3600))
+# Searches are keyed on coordinates rounded to this many decimals (3 is about 110 m)
+GEO_CACHE_COORD_DECIMALS = int(os.getenv("GEO_CACHE_COORD_DECIMALS", 3))
+GEO_CACHE_WARM_ENTRIES = int(os.getenv("GEO_CACHE_WARM_ENTRIES", 1000))
+
+MISS = object()
+
+def normalize_address(address: str) -> str:
+    """Case, punctuation and whitespace insensitive form of an address"""
+    text = unicodedata.normalize("NFKC", address).casefold()
+    text = re.sub(r"[^\w\s,#/-]", " ", text)
+    parts = (" ".join(part.split()) for part in text.split(","))
+    return ", ".join(part for part in parts if part)
+
+def quantize(latitude: float, longitude: float, decimals: int = GEO_CACHE_COORD_DECIMALS):
+    return round(latitude, decimals), round(longitude, decimals)
+
+def search_key(latitude: float, longitude: float, radius_km: int, bin_type: str) -> str:
+    """Key of a place search; callers pass coordinates already quantized"""
+    return f"{latitude:.{GEO_CACHE_COORD_DECIMALS}f},{longitude:.{GEO_CACHE_COORD_DECIMALS}f},{radius_km},{bin_type.strip().lower()}"
+
+class GeoCache:
+    """
+    Two-tier cache for SerpAPI lookups. An in-process LRU answers repeat queries
+    without I/O; the geo_cache table behind it persists entries across restarts
+    and workers. A value of None is a cached miss with a shorter TTL.
+    """
+    def __init__(self, session_factory=None, max_entries: int = GEO_CACHE_MAX_ENTRIES):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.retry_interval = 30  # seconds to skip the database tier after an error
+        self._persist_unavailable_until = 0.0
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @property
+    def persist_available(self) -> bool:
+        return self.session_factory is not None and time.monotonic() >= self._persist_unavailable_until
+
+    def _persist_failed(self, error: Exception):
+        logger.warning(f"Geo cache table unavailable, using local cache only: {error}")
+        self._persist_unavailable_until = time.monotonic() + self.retry_interval
+
+    @staticmethod
+    def _key(kind: str, query: str) -> str:
+        return hashlib.sha256(f"{kind}:{query}".encode()).hexdigest()
+
+    def _get_local(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _set_local(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, kind: str, query: str) -> Any:
+        """Cached value (possibly None for a cached miss), or MISS"""
+        key = self._key(kind, query)
+        value = self._get_local(key)
+        if value is not MISS:
+            self.hits += 1
+            return value
+
+        if self.persist_available:
+            try:
+                async with self.session_factory() as db:
+                    row = (await db.execute(
+                        select(GeoCacheEntry.value, GeoCacheEntry.expires_at)
+                        .where(GeoCacheEntry.key == key, GeoCacheEntry.expires_at > datetime.utcnow())
+                    )).first()
+                    if row is not None:
+                        await db.execute(
+                            update(GeoCacheEntry).where(GeoCacheEntry.key == key)
+                            .values(hits=GeoCacheEntry.hits + 1)
+                        )
+                        await db.commit()
+            except Exception as e:
+                self._persist_failed(e)
+                row = None
+            if row is not None:
+                self.persistent_hits += 1
+                value = json.loads(row.value) if row.value is not None else None
+                self._set_local(key, value, (row.expires_at - datetime.utcnow()).total_seconds())
+                return value
+
+        self.misses += 1
+        return MISS
+
+    async def set(self, kind: str, query: str, value: Any, ttl: float):
+        if value is None or value == []:
+            ttl = min(ttl, GEO_CACHE_NEGATIVE_TTL_SECONDS)
+            value = None
+        key = self._key(kind, query)
+        self._set_local(key, value, ttl)
+
+        if self.persist_available:
+            row = {
+                "key": key,
+                "kind": kind,
+                "query": query[:500],
+                "value": json.dumps(value) if value is not None else None,
+                "hits": 1,
+                "created_at": datetime.utcnow(),
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+            }
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(upsert(
+                        db.bind.dialect.name, GeoCacheEntry.__table__, row,
+                        index_elements=["key"],
+                        set_columns=["value", "created_at", "expires_at"],
+                        increment_columns=["hits"],
+                    ))
+                    await db.commit()
+            except Exception as e:
+                self._persist_failed(e)
+
+    async def warm(self, limit: int = GEO_CACHE_WARM_ENTRIES) -> int:
+        """
+        Drop expired rows, then load the most used unexpired entries into the local
+        tier so the first queries after a restart do not go to SerpAPI
+        """
+        if not self.persist_available:
+            return 0
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as db:
+                await db.execute(delete(GeoCacheEntry).where(GeoCacheEntry.expires_at <= now))
+                await db.commit()
+                rows = (await db.execute(
+                    select(GeoCacheEntry.key, GeoCacheEntry.value, GeoCacheEntry.expires_at)
+                    .where(GeoCacheEntry.expires_at > now)
+                    .order_by(GeoCacheEntry.hits.desc())
+                    .limit(min(limit, self.max_entries))
+                )).all()
+        except Exception as e:
+            self._persist_failed(e)
+            return 0
+        # Least used first, so the most used end up most recently used in the LRU
+        for row in reversed(rows):
+            value = json.loads(row.value) if row.value is not None else None
+            self._set_local(row.key, value, (row.expires_at - now).total_seconds())
+        return len(rows)
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "persistent": self.session_factory is not None,
+        }
+
+geo_cache = GeoCache(AsyncSessionLocal if GEO_CACHE_PERSIST else None)
@@ -1,23 +1,71 @@
 import os
+import asyncio
 import logging
 from typing import List, Dict, Optional, Tuple
 import httpx
 from fastapi import HTTPException
 
-try:
-    from serpapi import GoogleSearch
-    SERPAPI_AVAILABLE = True
-except ImportError:
-    SERPAPI_AVAILABLE = False
-    GoogleSearch = None
+from utils.single_flight import SingleFlight
+from utils.metrics import track_external
+from services.geo_cache import (
+    GeoCache, geo_cache, MISS, normalize_address, quantize, search_key,
+    GEO_CACHE_GEOCODE_TTL_SECONDS, GEO_CACHE_SEARCH_TTL_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+SERPAPI_TIMEOUT_SECONDS = float(os.getenv("SERPAPI_TIMEOUT_SECONDS", 10))
+# Upper bound on SerpAPI requests in flight per worker; extra callers wait for a slot
+SERPAPI_MAX_CONCURRENCY = int(os.getenv("SERPAPI_MAX_CONCURRENCY", 10))
+
 class LocationService:
-    def __init__(self):
+    def __init__(self, base_url: str = SERPAPI_BASE_URL, timeout: float = SERPAPI_TIMEOUT_SECONDS,
+                 max_concurrency: int = SERPAPI_MAX_CONCURRENCY, cache: Optional[GeoCache] = None):
         self.serpapi_key = os.getenv("SERPAPI_KEY")
         if not self.serpapi_key or self.serpapi_key == "your_serpapi_key_here":
             logger.warning("SerpAPI key not configured. Location search will be limited.")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else geo_cache
+        # Concurrent misses for the same search or address share one SerpAPI call
+        self.flights = SingleFlight("serpapi")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def serpapi_configured(self) -> bool:
+        return bool(self.serpapi_key) and self.serpapi_key != "your_serpapi_key_here"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client so every search reuses the same keep-alive connection pool"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _search(self, params: Dict) -> Dict:
+        """One SerpAPI search; raises on timeouts and non-2xx responses"""
+        client = self.client
+        async with self._semaphore:
+            with track_external("serpapi"):
+                response = await client.get("/search.json", params={**params, "api_key": self.serpapi_key})
+                response.raise_for_status()
+        return response.json()
     
     async def search_nearby_bins(
         self, 
@@ -30,84 +78,108 @@ class LocationService:
         Search for nearby recycling bins using SerpAPI Google Maps search
         """
         try:
-            if not SERPAPI_AVAILABLE or not self.serpapi_key or self.serpapi_key == "your_serpapi_key_here":
+            if not self.serpapi_configured:
                 # Return mock data if SerpAPI not available or API key not configured
                 return self._get_mock_bins(latitude, longitude)
             
-            # Construct search query
-            query = f"{bin_type} bins near {latitude},{longitude}"
-            
-            params = {
-                "engine": "google_maps",
-                "q": query,
-                "ll": f"@{latitude},{longitude},{radius_km}km",
-                "type": "search",
-                "api_key": self.serpapi_key
-            }
-            
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            
-            bins = []
-            if "local_results" in results:
-                for result in results["local_results"][:10]:  # Limit to 10 results
-                    bin_info = {
-                        "id": result.get("place_id", f"bin_{len(bins)}"),
-                        "name": result.get("title", "Recycling Bin"),
-                        "address": result.get("address", "Address not available"),
-                        "latitude": result.get("gps_coordinates", {}).get("latitude", latitude),
-                        "longitude": result.get("gps_coordinates", {}).get("longitude", longitude),
-                        "rating": result.get("rating", 0),
-                        "type": bin_type,
-                        "distance": self._calculate_distance(
-                            latitude, longitude,
-                            result.get("gps_coordinates", {}).get("latitude", latitude),
-                            result.get("gps_coordinates", {}).get("longitude", longitude)
-                        ),
-                        "phone": result.get("phone", ""),
-                        "hours": result.get("hours", ""),
-                        "website": result.get("website", "")
-                    }
-                    bins.append(bin_info)
-            
-            # Sort by distance
-            bins.sort(key=lambda x: x["distance"])
-            return bins
+            return await self.find_places(latitude, longitude, radius_km, bin_type)
             
         except Exception as e:
             logger.error(f"Error searching for nearby bins: {str(e)}")
             # Return mock data as fallback
             return self._get_mock_bins(latitude, longitude)
     
+    async def find_places(self, latitude: float, longitude: float, radius_km: int, bin_type: str) -> List[Dict]:
+        """
+        SerpAPI places near a point, nearest first, without the mock fallback:
+        errors propagate to the caller
+        """
+        # Nearby callers share one search around the quantized center
+        center_lat, center_lng = quantize(latitude, longitude)
+        key = search_key(center_lat, center_lng, radius_km, bin_type)
+        places = await self.cache.get("places", key)
+        if places is MISS:
+            places = await self.flights.do(("places", key), lambda: self._fetch_places(key, center_lat, center_lng, radius_km, bin_type))
+        
+        bins = [
+            {**place, "distance": self._calculate_distance(latitude, longitude, place["latitude"], place["longitude"])}
+            for place in places or []
+        ]
+        
+        # Sort by distance
+        bins.sort(key=lambda x: x["distance"])
+        return bins
+    
+    async def _fetch_places(self, key: str, latitude: float, longitude: float, radius_km: int, bin_type: str) -> List[Dict]:
+        places = await self._search_places(latitude, longitude, radius_km, bin_type)
+        await self.cache.set("places", key, places, GEO_CACHE_SEARCH_TTL_SECONDS)
+        return places
+    
+    async def _search_places(self, latitude: float, longitude: float, radius_km: int, bin_type: str) -> List[Dict]:
+        # Construct search query
+        query = f"{bin_type} bins near {latitude},{longitude}"
+        
+        params = {
+            "engine": "google_maps",
+            "q": query,
+            "ll": f"@{latitude},{longitude},{radius_km}km",
+            "type": "search"
+        }
+        
+        results = await self._search(params)
+        
+        places = []
+        for result in results.get("local_results", [])[:10]:  # Limit to 10 results
+            places.append({
+                "id": result.get("place_id", f"bin_{len(places)}"),
+                "name": result.get("title", "Recycling Bin"),
+                "address": result.get("address", "Address not available"),
+                "latitude": result.get("gps_coordinates", {}).get("latitude", latitude),
+                "longitude": result.get("gps_coordinates", {}).get("longitude", longitude),
+                "rating": result.get("rating", 0),
+                "type": bin_type,
+                "phone": result.get("phone", ""),
+                "hours": result.get("hours", ""),
+                "website": result.get("website", "")
+            })
+        return places
+    
     async def get_location_from_address(self, address: str) -> Optional[Tuple[float, float]]:
         """
         Get latitude and longitude from address using SerpAPI
         """
         try:
-            if not SERPAPI_AVAILABLE or not self.serpapi_key or self.serpapi_key == "your_serpapi_key_here":
+            if not self.serpapi_configured:
                 logger.warning("SerpAPI key not configured for geocoding")
                 return None
             
-            params = {
-                "engine": "google_maps",
-                "q": address,
-                "type": "search",
-                "api_key": self.serpapi_key
-            }
-            
-            search = GoogleSearch(params)
-            results = search.get_dict()
+            key = normalize_address(address)
+            coordinates = await self.cache.get("geocode", key)
+            if coordinates is MISS:
+                coordinates = await self.flights.do(("geocode", key), lambda: self._geocode(key, address))
             
-            if "place_results" in results and "gps_coordinates" in results["place_results"]:
-                coords = results["place_results"]["gps_coordinates"]
-                return (coords["latitude"], coords["longitude"])
-            
-            return None
+            return tuple(coordinates) if coordinates else None
             
         except Exception as e:
             logger.error(f"Error geocoding address: {str(e)}")
             return None
     
+    async def _geocode(self, key: str, address: str) -> Optional[List[float]]:
+        params = {
+            "engine": "google_maps",
+            "q": address,
+            "type": "search"
+        }
+        
+        results = await self._search(params)
+        
+        coordinates = None
+        if "place_results" in results and "gps_coordinates" in results["place_results"]:
+            coords = results["place_results"]["gps_coordinates"]
+            coordinates = [coords["latitude"], coords["longitude"]]
+        await self.cache.set("geocode", key, coordinates, GEO_CACHE_GEOCODE_TTL_SECONDS)
+        return coordinates
+    
     def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """
         Calculate distance between two points using Haversine formula
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User, Profile, UserAnalytics
+from utils.upsert import upsert
+
+async def insert_profile(user_id: int, db: AsyncSession):
+    """
+    Create an empty profile for the user unless one exists. Safe against
+    concurrent first requests thanks to the unique key on profiles.user_id.
+    """
+    user = await db.get(User, int(user_id))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    now = datetime.utcnow()
+    await db.execute(upsert(
+        db.bind.dialect.name,
+        Profile.__table__,
+        {
+            "user_id": user.id,
+            "full_name": user.full_name,
+            "email": user.email,
+            "points": 0,
+            "total_disposals": 0,
+            "bins_used": 0,
+            "created_at": now,
+            "updated_at": now,
+        },
+        index_elements=["user_id"],
+        set_columns=["updated_at"],
+    ))
+
+async def get_or_create_profile(user_id: int, db: AsyncSession) -> Profile:
+    profile = await db.scalar(select(Profile).where(Profile.user_id == user_id).limit(1))
+    if not profile:
+        await insert_profile(user_id, db)
+        await db.commit()
+        profile = await db.scalar(select(Profile).where(Profile.user_id == user_id).limit(1))
+    return profile
+
+async def add_points(
+    db: AsyncSession,
+    user_id: int,
+    points: int,
+    increment_disposals: bool = True,
+    bins_used: int = 0,
+):
+    """
+    Atomically credit points (and optionally a disposal / newly used bin) to a user.
+    Issues one UPDATE on profiles and one upsert on user_analytics; increments
+    happen in SQL so concurrent calls never lose updates. The caller commits.
+    """
+    user_id = int(user_id)
+    now = datetime.utcnow()
+    disposals = 1 if increment_disposals else 0
+
+    profile_update = (
+        update(Profile)
+        .where(Profile.user_id == user_id)
+        .values(
+            points=func.coalesce(Profile.points, 0) + points,
+            total_disposals=func.coalesce(Profile.total_disposals, 0) + disposals,
+            bins_used=func.coalesce(Profile.bins_used, 0) + bins_used,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(profile_update)
+    if result.rowcount == 0:
+        # First activity for this user: create the profile, then apply the increment
+        await insert_profile(user_id, db)
+        await db.execute(profile_update)
+
+    # Update analytics for leaderboard visibility
+    await db.execute(upsert(
+        db.bind.dialect.name,
+        UserAnalytics.__table__,
+        {
+            "user_id": user_id,
+            "total_scans": disposals,
+            "points_earned": points,
+            "created_at": now,
+            "updated_at": now,
+        },
+        index_elements=["user_id"],
+        set_columns=["updated_at"],
+        increment_columns=["total_scans", "points_earned"],
+    ))
@@ -0,0 +1,238 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import select, update, delete, bindparam, case, or_, tuple_, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Bin, BinTelemetry, BinTelemetryRollup
+from services.bin_events import bin_events, bin_event
+from schemas import TelemetryReading
+from utils.upsert import upsert, insert_ignore
+
+logger = logging.getLogger(__name__)
+
+# Fill level (percent) at which a bin is reported nearly full / full
+TELEMETRY_NEARLY_FULL_PCT = float(os.getenv("TELEMETRY_NEARLY_FULL_PCT", 75))
+TELEMETRY_FULL_PCT = float(os.getenv("TELEMETRY_FULL_PCT", 95))
+# Raw readings older than this are pruned; hourly rollups are kept
+TELEMETRY_RAW_RETENTION_DAYS = int(os.getenv("TELEMETRY_RAW_RETENTION_DAYS", 7))
+# Sensor clocks running ahead by more than this are rejected
+TELEMETRY_MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Bin ids or readings per lookup query, and readings per INSERT statement
+LOOKUP_CHUNK = 1000
+INSERT_CHUNK = 1000
+# Attempts at a batch whose readings were concurrently stored by another batch
+INGEST_ATTEMPTS = 3
+
+class ConcurrentIngest(Exception):
+    """Another batch stored some of the same readings between the lookup and the insert"""
+
+def derive_status(fill_pct: float) -> str:
+    if fill_pct >= TELEMETRY_FULL_PCT:
+        return "full"
+    if fill_pct >= TELEMETRY_NEARLY_FULL_PCT:
+        return "nearly_full"
+    return "available"
+
+def to_utc_naive(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+# Applied with executemany, one parameter set per bin. The WHERE clause keeps a
+# concurrent batch carrying an older reading from overwriting a newer one, and
+# bins in maintenance keep that status until it is cleared by hand.
+BIN_STATE_UPDATE = (
+    update(Bin.__table__)
+    .where(
+        Bin.__table__.c.id == bindparam("b_id"),
+        or_(Bin.__table__.c.last_telemetry_at.is_(None), Bin.__table__.c.last_telemetry_at < bindparam("b_recorded_at")),
+    )
+    .values(
+        capacity=bindparam("b_capacity"),
+        status=case(
+            (Bin.__table__.c.status == "maintenance", "maintenance"),
+            else_=bindparam("b_status"),
+        ),
+        last_telemetry_at=bindparam("b_recorded_at"),
+        last_updated=bindparam("b_now"),
+    )
+)
+
+async def load_bin_states(db: AsyncSession, bin_ids: List[int]) -> Dict[int, Row]:
+    """Current location, fill state and last applied reading time of each existing bin"""
+    states = {}
+    for i in range(0, len(bin_ids), LOOKUP_CHUNK):
+        rows = (await db.execute(
+            select(Bin.id, Bin.type, Bin.latitude, Bin.longitude, Bin.capacity, Bin.status, Bin.last_telemetry_at)
+            .where(Bin.id.in_(bin_ids[i:i + LOOKUP_CHUNK]))
+        )).all()
+        states.update({row.id: row for row in rows})
+    return states
+
+async def stored_readings(db: AsyncSession, keys: List[Tuple[int, datetime]]) -> Set[Tuple[int, datetime]]:
+    """The (bin_id, recorded_at) pairs among keys that are already in bin_telemetry"""
+    stored = set()
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        rows = (await db.execute(
+            select(BinTelemetry.bin_id, BinTelemetry.recorded_at)
+            .where(tuple_(BinTelemetry.bin_id, BinTelemetry.recorded_at).in_(keys[i:i + LOOKUP_CHUNK]))
+        )).all()
+        stored.update((row.bin_id, row.recorded_at) for row in rows)
+    return stored
+
+async def ingest_readings(db: AsyncSession, readings: List[TelemetryReading]) -> dict:
+    """
+    Apply a batch of sensor readings in one transaction:
+      - readings for unknown bins, out-of-range fill levels or future timestamps are rejected
+      - repeats (same bin and timestamp, in the batch or already stored) are dropped
+      - the rest are inserted into bin_telemetry and folded into the hourly rollups;
+        readings older than the bin's last applied reading are kept there as well
+      - each bin's capacity/status is set from its newest reading with one executemany UPDATE
+    Subscribers are then notified of bins whose capacity or status changed.
+
+    If a concurrent batch stores some of the same readings first, the transaction is
+    rolled back and the batch retried, so rollups only ever count inserted rows.
+    """
+    for attempt in range(1, INGEST_ATTEMPTS + 1):
+        try:
+            report, changes = await _apply_readings(db, readings)
+            break
+        except ConcurrentIngest:
+            await db.rollback()
+            if attempt == INGEST_ATTEMPTS:
+                raise
+            logger.info(f"Telemetry batch raced a concurrent batch, retrying (attempt {attempt})")
+    await bin_events.publish(changes)
+    return report
+
+async def _apply_readings(db: AsyncSession, readings: List[TelemetryReading]) -> Tuple[dict, List[dict]]:
+    now = datetime.utcnow()
+    report = {"received": len(readings), "accepted": 0, "stale": 0, "late": 0, "rejected": 0, "bins_updated": 0, "errors": []}
+
+    candidates: Dict[Tuple[int, datetime], float] = {}
+    for index, reading in enumerate(readings):
+        recorded_at = to_utc_naive(reading.timestamp)
+        if not 0 <= reading.fill_pct <= 100:
+            error = "fill_pct must be between 0 and 100"
+        elif recorded_at > now + TELEMETRY_MAX_CLOCK_SKEW:
+            error = "timestamp is in the future"
+        else:
+            # The same reading sent twice in one batch counts once
+            if (reading.bin_id, recorded_at) in candidates:
+                report["stale"] += 1
+            candidates[(reading.bin_id, recorded_at)] = reading.fill_pct
+            continue
+        report["rejected"] += 1
+        report["errors"].append({"index": index, "bin_id": reading.bin_id, "error": error})
+
+    states = await load_bin_states(db, sorted({bin_id for bin_id, _ in candidates}))
+    known = []
+    for bin_id, recorded_at in sorted(candidates):
+        if bin_id in states:
+            known.append((bin_id, recorded_at))
+        else:
+            report["rejected"] += 1
+            report["errors"].append({"bin_id": bin_id, "error": "Bin not found"})
+    stored = await stored_readings(db, known)
+
+    accepted: List[dict] = []
+    latest: Dict[int, Tuple[datetime, float]] = {}
+    rollups: Dict[Tuple[int, datetime], dict] = {}
+    for bin_id, recorded_at in known:
+        if (bin_id, recorded_at) in stored:
+            report["stale"] += 1
+            continue
+        fill_pct = candidates[(bin_id, recorded_at)]
+        accepted.append({"bin_id": bin_id, "fill_pct": fill_pct, "recorded_at": recorded_at, "received_at": now})
+
+        bucket = rollups.setdefault((bin_id, hour_bucket(recorded_at)), {
+            "bin_id": bin_id,
+            "bucket_start": hour_bucket(recorded_at),
+            "samples": 0,
+            "fill_sum": 0.0,
+            "fill_min": fill_pct,
+            "fill_max": fill_pct,
+        })
+        bucket["samples"] += 1
+        bucket["fill_sum"] += fill_pct
+        bucket["fill_min"] = min(bucket["fill_min"], fill_pct)
+        bucket["fill_max"] = max(bucket["fill_max"], fill_pct)
+
+        last_at = states[bin_id].last_telemetry_at
+        if last_at is not None and recorded_at <= last_at:
+            # Delivered after a newer reading: part of the history, not the bin's current state
+            report["late"] += 1
+            continue
+        latest[bin_id] = (recorded_at, fill_pct)
+
+    changes = []
+    if accepted:
+        inserted = 0
+        for i in range(0, len(accepted), INSERT_CHUNK):
+            result = await db.execute(insert_ignore(
+                db.bind.dialect.name, BinTelemetry.__table__, accepted[i:i + INSERT_CHUNK], ["bin_id", "recorded_at"],
+            ))
+            inserted += result.rowcount
+        if inserted != len(accepted):
+            raise ConcurrentIngest(f"{len(accepted) - inserted} of {len(accepted)} readings were stored concurrently")
+
+        await db.execute(upsert(
+            db.bind.dialect.name,
+            BinTelemetryRollup.__table__,
+            list(rollups.values()),
+            index_elements=["bin_id", "bucket_start"],
+            increment_columns=["samples", "fill_sum"],
+            least_columns=["fill_min"],
+            greatest_columns=["fill_max"],
+        ))
+        if latest:
+            result = await db.execute(BIN_STATE_UPDATE, [
+                {
+                    "b_id": bin_id,
+                    "b_recorded_at": recorded_at,
+                    "b_capacity": round(fill_pct),
+                    "b_status": derive_status(fill_pct),
+                    "b_now": now,
+                }
+                for bin_id, (recorded_at, fill_pct) in latest.items()
+            ])
+            report["bins_updated"] = result.rowcount if result.rowcount >= 0 else len(latest)
+        await db.commit()
+
+        for bin_id, (recorded_at, fill_pct) in latest.items():
+            state = states[bin_id]
+            status = "maintenance" if state.status == "maintenance" else derive_status(fill_pct)
+            if round(fill_pct) != state.capacity or status != state.status:
+                changes.append(bin_event(
+                    bin_id, state.type, state.latitude, state.longitude, round(fill_pct), status, now,
+                    previous_status=state.status,
+                ))
+
+    report["accepted"] = len(accepted)
+    return report, changes
+
+async def prune_raw_readings(db: AsyncSession, retention_days: int = TELEMETRY_RAW_RETENTION_DAYS) -> int:
+    """Delete raw readings past the retention window; their hourly rollups remain"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = await db.execute(delete(BinTelemetry).where(BinTelemetry.recorded_at < cutoff))
+    await db.commit()
+    if result.rowcount:
+        logger.info(f"Pruned {result.rowcount} raw telemetry readings older than {retention_days} days")
+    return result.rowcount
+
+async def retention_loop(session_factory, interval_seconds: float = 3600):
+    """Prune raw readings periodically for the lifetime of the app"""
+    while True:
+        try:
+            async with session_factory() as db:
+                await prune_raw_readings(db)
+        except Exception as e:
+            logger.error(f"Telemetry retention failed: {e}")
+        await asyncio.sleep(interval_seconds)
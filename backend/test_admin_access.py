@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Admin access comes from the server-side users.is_admin flag, carried in the
+token as the admin claim, never from the email address a user registered with.
+
+Run with: python -m pytest test_admin_access.py
+"""
+import sys
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import Headers
+
+import database
+from database import build_engine
+from models import Base, User
+from routers import auth as auth_router, instrumentation
+from utils.auth import create_access_token, is_admin_token
+from utils.profiler import is_admin_request
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    sync_engine = build_engine(f"sqlite:///{tmp_path / 'admin.db'}", "test_admin_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": 1, "email": "admin@smartecobin.com", "hashed_password": "x", "full_name": "Squatter", "is_admin": False},
+            {"id": 2, "email": "ops@example.com", "hashed_password": "x", "full_name": "Ops", "is_admin": True},
+        ])
+    Session = sessionmaker(bind=sync_engine)
+
+    def get_test_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # Password hashing is not under test
+    monkeypatch.setattr(auth_router, "verify_password", lambda plain, hashed: True)
+
+    app = FastAPI()
+    app.include_router(auth_router.router, prefix="/auth")
+    app.include_router(instrumentation.router, prefix="/api/instrumentation")
+    app.dependency_overrides[database.get_db] = get_test_db
+    with TestClient(app) as test_client:
+        yield test_client
+    sync_engine.dispose()
+
+def login(client, email: str) -> str:
+    response = client.post("/auth/login", json={"email": email, "password": "whatever"})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+def test_default_admin_email_grants_nothing(client):
+    token = login(client, "admin@smartecobin.com")
+    assert not is_admin_token(token)
+    response = client.get("/api/instrumentation/db-pool", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+def test_is_admin_flag_is_issued_as_claim(client):
+    token = login(client, "ops@example.com")
+    assert is_admin_token(token)
+    response = client.get("/api/instrumentation/db-pool", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+def test_profiler_trigger_requires_admin_claim():
+    user = create_access_token({"sub": "1", "email": "admin@smartecobin.com"})
+    admin = create_access_token({"sub": "2", "email": "ops@example.com", "admin": True})
+    assert not is_admin_request(Headers({"authorization": f"Bearer {user}"}))
+    assert is_admin_request(Headers({"authorization": f"Bearer {admin}"}))
+    assert not is_admin_request(Headers({"authorization": "Bearer not-a-token"}))
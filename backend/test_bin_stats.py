@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Cached bin type x status counts: kept in step with bin change events (status
+changes, type changes, both, new bins) without drifting from a fresh GROUP BY.
+Uses a local SQLite file.
+
+Run with: python -m pytest test_bin_stats.py
+"""
+import sys
+from collections import Counter
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, Bin
+from routers import bins
+from services.bin_events import bin_event
+from services.bin_stats import BinStatsCache, bin_stats, count_by_type_status
+from services.bin_tiles import bin_tiles
+from utils.auth import create_access_token
+from utils.response_cache import response_cache
+
+ADMIN = {"Authorization": "Bearer " + create_access_token({"sub": "1", "admin": True})}
+
+@pytest.fixture()
+def engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'stats.db'}"
+    sync_engine = build_engine(url, "test_stats_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(Bin.__table__.insert(), [
+            {"id": 1, "name": "Bin 1", "type": "general", "status": "available", "latitude": 0.0, "longitude": 0.0},
+            {"id": 2, "name": "Bin 2", "type": "general", "status": "full", "latitude": 0.0, "longitude": 0.0},
+            {"id": 3, "name": "Bin 3", "type": "recycling", "status": "available", "latitude": 0.0, "longitude": 0.0},
+        ])
+    sync_engine.dispose()
+    return build_engine(to_async_url(url), "test_stats", is_async=True)
+
+@pytest.fixture()
+def client(engine):
+    async def get_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(bins.router, prefix="/api/bins")
+    app.dependency_overrides[database.get_async_db] = get_test_db
+    app.dependency_overrides[database.get_read_db] = get_test_db
+    bin_stats.invalidate()
+    response_cache.clear()
+    bin_tiles.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+    bin_stats.invalidate()
+    response_cache.clear()
+    bin_tiles.clear()
+
+def recounted(client, engine) -> Counter:
+    async def count():
+        async with AsyncSessionLocal(bind=engine) as db:
+            return await count_by_type_status(db)
+    return +client.portal.call(count)
+
+def test_updates_keep_the_cached_counts_exact(client, engine):
+    assert client.get("/api/bins/types/stats").json()["general"]["total"] == 2
+
+    assert client.put("/api/bins/1", json={"status": "full"}, headers=ADMIN).status_code == 200
+    client.put("/api/bins/1", json={"capacity": 40}, headers=ADMIN)
+    client.put("/api/bins/3", json={"status": "nearly_full"}, headers=ADMIN)
+    assert +bin_stats.counts == recounted(client, engine)
+
+    stats = client.get("/api/bins/types/stats").json()
+    assert (stats["general"]["full"], stats["recycling"]["nearly_full"]) == (2, 1)
+
+def test_type_change_moves_the_bin_between_types():
+    cache = BinStatsCache()
+    cache.counts = Counter({("general", "available"): 2, ("general", "full"): 1})
+
+    # Only the type changes: the status cell has the same name under both types
+    cache.apply([bin_event(1, "organic", 0, 0, 10, "available", None, previous_status="available", previous_type="general")])
+    assert +cache.counts == Counter({("general", "available"): 1, ("general", "full"): 1, ("organic", "available"): 1})
+
+    # Type and status together
+    cache.apply([bin_event(2, "recycling", 0, 0, 10, "available", None, previous_status="full", previous_type="general")])
+    assert +cache.counts == Counter({("general", "available"): 1, ("organic", "available"): 1, ("recycling", "available"): 1})
+
+def test_status_changes_and_new_bins():
+    cache = BinStatsCache()
+    cache.counts = Counter({("general", "available"): 2})
+
+    cache.apply([
+        bin_event(1, "general", 0, 0, 95, "full", None, previous_status="available"),
+        bin_event(2, "general", 0, 0, 10, "available", None, previous_status="available"),
+        bin_event(3, "hazardous", 0, 0, 0, "available", None),
+    ])
+    assert +cache.counts == Counter([("general", "available"), ("general", "full"), ("hazardous", "available")])
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Bulk bin import and export: CSV and NDJSON import with per-line errors
+(including bytes that are not UTF-8), upserts keyed on external_id, and
+streamed exports read page by page. Uses a local SQLite file.
+
+Run with: python -m pytest test_bin_transfer.py
+"""
+import asyncio
+import csv
+import io
+import json
+import sys
+from collections import Counter
+from functools import partial
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, Bin
+from routers import bins
+from services.bin_stats import bin_stats
+from services.bin_transfer import import_bins, parse_csv, export_csv
+from utils.auth import create_access_token
+
+ADMIN = {"Authorization": "Bearer " + create_access_token({"sub": "1", "admin": True})}
+HEADER = "external_id,name,type,latitude,longitude,capacity,status"
+
+@pytest.fixture()
+def engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'transfer.db'}"
+    sync_engine = build_engine(url, "test_transfer_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    return build_engine(to_async_url(url), "test_transfer", is_async=True)
+
+@pytest.fixture()
+def client(engine, monkeypatch):
+    async def get_async_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    async def pick():
+        return engine
+
+    # Exports open their own session on a read engine
+    monkeypatch.setattr(bins.read_router, "pick", pick)
+    app = FastAPI()
+    app.include_router(bins.router, prefix="/api/bins")
+    app.dependency_overrides[database.get_async_db] = get_async_test_db
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+
+def stored(client, engine) -> dict:
+    async def load():
+        async with AsyncSessionLocal(bind=engine) as db:
+            return {b.external_id: b for b in (await db.execute(select(Bin))).scalars().all()}
+    return client.portal.call(load)
+
+def test_invalid_utf8_fails_only_its_line(client, engine):
+    body = "\n".join([
+        "\ufeff" + HEADER,
+        "a1,Café Corner,recycling,1.0,2.0,10,available",
+    ]).encode() + b"\na2,Bad \xff\xfe name,general,1.0,2.0,,\n" + "a3,Third,organic,1.5,2.5,,\n".encode()
+
+    response = client.post("/api/bins/import?format=csv", content=body, headers=ADMIN)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["received"], report["upserted"], report["rejected"]) == (3, 2, 1)
+    assert report["errors"][0]["line"] == 3 and "UTF-8" in report["errors"][0]["error"]
+    assert stored(client, engine)["a1"].name == "Café Corner"
+
+def test_multibyte_characters_split_across_chunks():
+    data = (HEADER + "\nb1,Müllstation Ä,general,1,2,,\n").encode()
+
+    async def chunks():
+        for i in range(len(data)):
+            yield data[i:i + 1]
+
+    async def rows():
+        return [item async for item in parse_csv(chunks())]
+
+    [(line, row, error)] = asyncio.run(rows())
+    assert (line, row["name"], error) == (2, "Müllstation Ä", None)
+
+def test_import_upserts_on_external_id(client, engine):
+    first = "\n".join([HEADER, "x1,Old name,general,1,2,10,available", "x2,Second,general,3,4,,"])
+    assert client.post("/api/bins/import", content=first, headers={**ADMIN, "Content-Type": "text/csv"}).json()["upserted"] == 2
+    ids_before = {key: b.id for key, b in stored(client, engine).items()}
+
+    # NDJSON this time; a later line for the same external_id wins
+    second = "\n".join(json.dumps(row) for row in [
+        {"external_id": "x1", "name": "Interim", "type": "recycling", "latitude": 1, "longitude": 2},
+        {"external_id": "x1", "name": "New name", "type": "recycling", "latitude": 1, "longitude": 2, "status": "full"},
+        {"external_id": "x3", "name": "Third", "type": "organic", "latitude": 5, "longitude": 6},
+        {"external_id": "x4", "name": "Bad", "type": "spaceship", "latitude": 5, "longitude": 6},
+        [1, 2],
+    ])
+    report = client.post("/api/bins/import?format=ndjson", content=second, headers=ADMIN).json()
+    assert (report["received"], report["upserted"], report["rejected"]) == (5, 2, 2)
+    assert [error["line"] for error in report["errors"]] == [4, 5]
+
+    bins_by_key = stored(client, engine)
+    assert sorted(bins_by_key) == ["x1", "x2", "x3"]
+    assert bins_by_key["x1"].id == ids_before["x1"]
+    assert (bins_by_key["x1"].name, bins_by_key["x1"].type, bins_by_key["x1"].status) == ("New name", "recycling", "full")
+
+def test_failed_import_still_invalidates_the_caches(client, engine, monkeypatch):
+    async def failing_parse(stream):
+        async for parsed in parse_csv(stream):
+            yield parsed
+        raise ConnectionError("client went away")
+
+    monkeypatch.setattr(bins, "parse_csv", failing_parse)
+    monkeypatch.setattr(bins, "import_bins", partial(import_bins, chunk_rows=1))
+    bin_stats.counts = Counter()
+
+    body = "\n".join([HEADER, "f1,First,general,1,2,,", "f2,Second,general,3,4,,"])
+    with pytest.raises(ConnectionError):
+        client.post("/api/bins/import?format=csv", content=body, headers=ADMIN)
+    # Both chunks were committed before the failure, so the cached counts were dropped
+    assert sorted(stored(client, engine)) == ["f1", "f2"]
+    assert bin_stats.counts is None
+
+def test_import_and_export_need_admin(client):
+    user = {"Authorization": "Bearer " + create_access_token({"sub": "2"})}
+    assert client.post("/api/bins/import?format=csv", content=HEADER, headers=user).status_code == 403
+    assert client.get("/api/bins/export", headers=user).status_code == 403
+
+def test_export_streams_every_bin(client, engine):
+    rows = [f"e{i:04d},Bin {i},general,{i / 1000},0,{i % 100}," for i in range(1, 1202)]
+    client.post("/api/bins/import?format=csv", content="\n".join([HEADER, *rows]), headers=ADMIN)
+
+    with client.stream("GET", "/api/bins/export?format=csv", headers=ADMIN) as response:
+        assert response.headers["content-disposition"] == "attachment; filename=bins.csv"
+        chunks = list(response.iter_text())
+    exported = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(exported) == 1201
+    assert [row["external_id"] for row in exported[:2]] == ["e0001", "e0002"]
+    assert exported[-1]["capacity"] == "1"
+
+    lines = client.get("/api/bins/export?format=ndjson", headers=ADMIN).text.splitlines()
+    assert len(lines) == 1201 and json.loads(lines[0])["name"] == "Bin 1"
+
+def test_export_is_produced_in_pages(engine):
+    async def run():
+        async with AsyncSessionLocal(bind=engine) as db:
+            db.add_all(Bin(external_id=f"p{i}", name=f"P{i}", type="general", latitude=0, longitude=0) for i in range(1200))
+            await db.commit()
+        try:
+            async with AsyncSessionLocal(bind=engine) as db:
+                return [chunk async for chunk in export_csv(db)]
+        finally:
+            await engine.dispose()
+
+    chunks = asyncio.run(run())
+    # Header plus 500 rows per chunk, then the remainder
+    assert [chunk.count("\n") for chunk in chunks] == [501, 500, 200]
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+CompressionMiddleware: Accept-Encoding negotiation, the size threshold,
+event streams passing through, streamed chunks that decode on arrival,
+and weakened ETags.
+
+Run with: python -m pytest test_compression.py
+"""
+import asyncio
+import gzip
+import sys
+import zlib
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils.compression_middleware import COMPRESSION_MIN_SIZE, CompressionMiddleware, negotiate
+
+@pytest.mark.parametrize("accept_encoding, brotli_available, expected", [
+    ("", False, None),
+    ("gzip", False, "gzip"),
+    ("GZIP", False, "gzip"),
+    ("gzip;q=0", False, None),
+    ("gzip;q=abc", False, None),
+    ("identity", False, None),
+    ("*", False, "gzip"),
+    ("*;q=0", False, None),
+    ("gzip;q=0, *", False, None),
+    ("br", False, None),
+    ("br, gzip", False, "gzip"),
+    ("br", True, "br"),
+    ("*", True, "br"),
+    ("br;q=0.5, gzip", True, "gzip"),
+    ("br, gzip;q=0.5", True, "br"),
+    ("br;q=0, *", True, "gzip"),
+])
+def test_negotiate(accept_encoding, brotli_available, expected):
+    assert negotiate(accept_encoding, brotli_available) == expected
+
+@pytest.fixture()
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/text/{size}")
+    async def text(size: int):
+        return Response("x" * size, media_type="text/plain", headers={"ETag": '"v1"'})
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" * 500, media_type="image/png")
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            yield "data: " + "x" * 1000 + "\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/not-modified")
+    async def not_modified():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+def test_size_threshold(client):
+    small = client.get(f"/text/{COMPRESSION_MIN_SIZE - 1}", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["Vary"] == "Accept-Encoding"
+    assert small.headers["ETag"] == '"v1"'
+
+    large = client.get(f"/text/{COMPRESSION_MIN_SIZE}", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["Content-Encoding"] == "gzip"
+    assert int(large.headers["Content-Length"]) < COMPRESSION_MIN_SIZE
+    assert large.text == "x" * COMPRESSION_MIN_SIZE
+
+def test_weak_etag_on_compressed_responses(client):
+    assert client.get("/text/2000", headers={"Accept-Encoding": "gzip"}).headers["ETag"] == 'W/"v1"'
+    assert client.get("/text/2000", headers={"Accept-Encoding": "identity"}).headers["ETag"] == '"v1"'
+
+    not_modified = client.get("/not-modified", headers={"Accept-Encoding": "gzip"})
+    assert not_modified.status_code == 304
+    assert "Content-Encoding" not in not_modified.headers
+
+def test_passthrough(client):
+    gzip_only = {"Accept-Encoding": "gzip"}
+    assert "Content-Encoding" not in client.get("/image", headers=gzip_only).headers
+    # brotli is optional; without it br-only clients get identity
+    br_only = client.get("/text/2000", headers={"Accept-Encoding": "br"})
+    assert br_only.headers.get("Content-Encoding") in (None, "br")
+
+    with client.stream("GET", "/events", headers=gzip_only) as response:
+        assert "Content-Encoding" not in response.headers
+        assert b"".join(response.iter_raw()).startswith(b"data: xxx")
+
+def test_brotli_when_installed(client):
+    brotli = pytest.importorskip("brotli")
+    with client.stream("GET", "/text/2000", headers={"Accept-Encoding": "br"}) as response:
+        assert response.headers["Content-Encoding"] == "br"
+        # iter_raw gives the bytes as sent; response.content would already be decoded
+        assert brotli.decompress(b"".join(response.iter_raw())) == b"x" * 2000
+
+def test_streamed_chunks_decode_on_arrival():
+    chunks = [b'{"id": %d, "name": "Bin on a long street"}\n' % i * 20 for i in range(3)]
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson"), (b"content-length", b"999")]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    async def run():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/export", "headers": [(b"accept-encoding", b"gzip")]}
+        await CompressionMiddleware(streaming_app)(scope, None, send)
+        return sent
+
+    start, *bodies = asyncio.run(run())
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    assert [body["more_body"] for body in bodies] == [True, True, False]
+
+    # Each chunk is flushed, so a client decodes it before the next one is sent
+    decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert [decoder.decompress(body["body"]) for body in bodies] == chunks
+    assert gzip.decompress(b"".join(body["body"] for body in bodies)) == b"".join(chunks)
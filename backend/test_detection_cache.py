@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Detection cache: a parsed model reply is cached per image, an unparsable
+reply falls back to "Unknown Item" without being cached.
+
+Run with: python -m pytest test_detection_cache.py
+"""
+import asyncio
+import sys
+from types import SimpleNamespace
+sys.path.append('.')
+
+import pytest
+
+from routers import waste_detection
+from services.detection_cache import detection_cache
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = self.replies.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+@pytest.fixture()
+def completions(monkeypatch):
+    def use(*replies):
+        completions = FakeCompletions(replies)
+        monkeypatch.setattr(waste_detection, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return completions
+
+    detection_cache._entries.clear()
+    yield use
+    detection_cache._entries.clear()
+
+def test_parsed_items_are_cached(completions):
+    fake = completions('[{"item": "Plastic Bottle", "confidence": 0.9, "disposal_method": "Recycling", "bin_type": "recycling"}]')
+    first = asyncio.run(waste_detection.analyze_waste_image(b"bottle"))
+    second = asyncio.run(waste_detection.analyze_waste_image(b"bottle"))
+    assert [item.item for item in first] == [item.item for item in second] == ["Plastic Bottle"]
+    assert fake.calls == 1
+
+def test_unparsable_replies_are_not_cached(completions):
+    fake = completions(
+        "I can't tell what this is.",
+        '[{"item": "Banana Peel", "confidence": 0.8, "disposal_method": "Compost", "bin_type": "organic"}]',
+    )
+    assert [item.item for item in asyncio.run(waste_detection.analyze_waste_image(b"peel"))] == ["Unknown Item"]
+    assert detection_cache.get(waste_detection.image_key(b"peel")) is None
+
+    # The next upload of the same photo asks the model again
+    assert [item.item for item in asyncio.run(waste_detection.analyze_waste_image(b"peel"))] == ["Banana Peel"]
+    assert fake.calls == 2
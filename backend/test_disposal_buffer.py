@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Write-behind disposal buffer: spill replay after a crash, per-worker spill
+files taken over only once their worker is gone, idempotent duplicates, and
+rejected events being dead-lettered instead of wedging the queue. Also the validation /api/disposals/batch does before acknowledging.
+Uses local SQLite files.
+
+Run with: python -m pytest test_disposal_buffer.py
+"""
+import asyncio
+import json
+import sys
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, User, Bin, Disposal
+from routers import disposals
+from services.disposal_buffer import DisposalBuffer
+from utils.auth import create_access_token
+
+@pytest.fixture()
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'buffer.db'}"
+    sync_engine = build_engine(url, "test_buffer_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": 1, "email": "one@example.com", "hashed_password": "x"})
+        conn.execute(Bin.__table__.insert(), {"id": 1, "name": "Bin", "type": "general", "latitude": 0.0, "longitude": 0.0})
+    sync_engine.dispose()
+    return url
+
+def make_buffer(engine, tmp_path, worker_id: str = "1") -> DisposalBuffer:
+    return DisposalBuffer(
+        lambda: AsyncSessionLocal(bind=engine),
+        spill_path=str(tmp_path / "spill.ndjson"),
+        dead_letter_path=str(tmp_path / "dead.ndjson"),
+        flush_ms=60_000,
+        worker_id=worker_id,
+    )
+
+def spill_files(tmp_path) -> list:
+    return sorted(path.name for path in tmp_path.glob("spill*"))
+
+async def stored(engine) -> list:
+    async with AsyncSessionLocal(bind=engine) as db:
+        return (await db.execute(select(Disposal.idempotency_key, Disposal.waste_type).order_by(Disposal.id))).all()
+
+def crash(buffer: DisposalBuffer):
+    """Stop the buffer the way a killed process would: no final flush, its lock released"""
+    buffer._task.cancel()
+    buffer._spill.close()
+    buffer._lock_file.close()
+
+def test_spilled_events_are_replayed_after_restart(db_url, tmp_path):
+    async def run():
+        engine = build_engine(to_async_url(db_url), "test_buffer", is_async=True)
+        try:
+            buffer = make_buffer(engine, tmp_path)
+            await buffer.start()
+            for i in range(3):
+                buffer.enqueue(1, "plastic", points_earned=5, idempotency_key=f"k{i}")
+            crash(buffer)
+            assert await stored(engine) == []
+
+            restarted = make_buffer(engine, tmp_path)
+            await restarted.start()
+            assert len(restarted.pending) == 3
+            await restarted.stop()
+            return await stored(engine)
+        finally:
+            await engine.dispose()
+
+    assert [key for key, _ in asyncio.run(run())] == ["k0", "k1", "k2"]
+    # A clean stop with nothing pending leaves no spill files behind
+    assert spill_files(tmp_path) == []
+
+def test_workers_keep_separate_spill_files(db_url, tmp_path):
+    async def run():
+        engine = build_engine(to_async_url(db_url), "test_buffer", is_async=True)
+        try:
+            first, second = make_buffer(engine, tmp_path, "101"), make_buffer(engine, tmp_path, "102")
+            await first.start()
+            await second.start()
+            first.enqueue(1, "plastic", idempotency_key="a0")
+            second.enqueue(1, "glass", idempotency_key="b0")
+            second.enqueue(1, "glass", idempotency_key="b1")
+            # Compacting the first worker's spill file leaves the second one's events alone
+            await first.flush()
+            first.enqueue(1, "plastic", idempotency_key="a1")
+            crash(second)
+            files = spill_files(tmp_path)
+
+            # A new worker takes over the dead worker's file, not the running one's
+            third = make_buffer(engine, tmp_path, "103")
+            await third.start()
+            taken_over = sorted(event["idempotency_key"] for event in third.pending)
+            await third.stop()
+            await first.stop()
+            return files, taken_over, await stored(engine)
+        finally:
+            await engine.dispose()
+
+    files, taken_over, rows = asyncio.run(run())
+    assert files == ["spill.101.ndjson", "spill.101.ndjson.lock", "spill.102.ndjson", "spill.102.ndjson.lock"]
+    assert taken_over == ["b0", "b1"]
+    assert sorted(key for key, _ in rows) == ["a0", "a1", "b0", "b1"]
+    assert spill_files(tmp_path) == []
+
+def test_a_running_workers_spill_file_is_not_reused(db_url, tmp_path):
+    async def run():
+        engine = build_engine(to_async_url(db_url), "test_buffer", is_async=True)
+        try:
+            buffer = make_buffer(engine, tmp_path, "7")
+            await buffer.start()
+            with pytest.raises(RuntimeError):
+                await make_buffer(engine, tmp_path, "7").start()
+            await buffer.stop()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+def test_duplicate_keys_are_written_once(db_url, tmp_path):
+    async def run():
+        engine = build_engine(to_async_url(db_url), "test_buffer", is_async=True)
+        try:
+            async with AsyncSessionLocal(bind=engine) as db:
+                db.add(Disposal(user_id=1, waste_type="plastic", idempotency_key="k0"))
+                await db.commit()
+            buffer = make_buffer(engine, tmp_path)
+            await buffer.start()
+            for key in ["k0", "k1", "k1", "k2"]:
+                buffer.enqueue(1, "plastic", idempotency_key=key)
+            await buffer.stop()
+            return buffer, await stored(engine)
+        finally:
+            await engine.dispose()
+
+    buffer, rows = asyncio.run(run())
+    assert [key for key, _ in rows] == ["k0", "k1", "k2"]
+    assert buffer.flushed_rows_total == 2
+    assert buffer.duplicate_rows_total == 2
+
+def test_poison_events_are_dead_lettered_without_blocking(db_url, tmp_path):
+    # A shared spill file from an older version, before enqueue validated events,
+    # ending in a line cut short by a crash
+    good = {"user_id": 1, "bin_id": None, "waste_type": "plastic", "points_earned": 5, "weight": None,
+            "created_at": "2026-10-19T10:00:00", "enqueued_at": 0}
+    lines = [
+        json.dumps({**good, "idempotency_key": "k0"}),
+        json.dumps({**good, "idempotency_key": "bad", "waste_type": None}),
+        json.dumps({**good, "idempotency_key": "k1"}),
+        '{"user_id": 1, "waste_ty',
+    ]
+    (tmp_path / "spill.ndjson").write_text("\n".join(lines) + "\n")
+
+    async def run():
+        engine = build_engine(to_async_url(db_url), "test_buffer", is_async=True)
+        try:
+            buffer = make_buffer(engine, tmp_path)
+            await buffer.start()
+            await buffer.flush()
+            assert not buffer.pending
+            buffer.enqueue(1, "glass", idempotency_key="k2")
+            await buffer.stop()
+            return buffer, await stored(engine)
+        finally:
+            await engine.dispose()
+
+    buffer, rows = asyncio.run(run())
+    assert [key for key, _ in rows] == ["k0", "k1", "k2"]
+    assert buffer.dead_lettered_total == 2
+    dead = [json.loads(line) for line in (tmp_path / "dead.ndjson").read_text().splitlines()]
+    assert dead[0]["raw"].startswith('{"user_id": 1')
+    assert dead[1]["idempotency_key"] == "bad" and "error" in dead[1]
+    assert spill_files(tmp_path) == []
+
+def test_enqueue_rejects_events_the_database_would_refuse(db_url, tmp_path):
+    async def run():
+        engine = build_engine(to_async_url(db_url), "test_buffer", is_async=True)
+        try:
+            buffer = make_buffer(engine, tmp_path)
+            await buffer.start()
+            with pytest.raises(ValueError):
+                buffer.enqueue(1, "x" * 101)
+            with pytest.raises(ValueError):
+                buffer.enqueue_many(1, [{"waste_type": "plastic"}, {"waste_type": ""}])
+            assert not buffer.pending
+            await buffer.stop()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+@pytest.fixture()
+def client(db_url):
+    engine = build_engine(to_async_url(db_url), "test_disposals_api", is_async=True)
+
+    async def get_async_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(disposals.router, prefix="/api/disposals")
+    app.dependency_overrides[database.get_async_db] = get_async_test_db
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+
+AUTH = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+
+def test_batch_validation_and_conflicts(client):
+    def batch(*events):
+        return client.post("/api/disposals/batch", json={"events": list(events)}, headers=AUTH)
+
+    assert batch({"waste_type": "plastic", "bin_id": 99}).status_code == 400
+    assert batch({"waste_type": "x" * 101}).status_code == 422
+    assert batch({"waste_type": "plastic", "idempotency_key": "a"}, {"waste_type": "glass", "idempotency_key": "a"}).status_code == 400
+
+    assert batch({"waste_type": "plastic", "bin_id": 1, "idempotency_key": "a"}).status_code == 201
+    response = batch({"waste_type": "plastic", "idempotency_key": "b"}, {"waste_type": "glass", "idempotency_key": "a"})
+    assert response.status_code == 409
+    assert "'a'" in response.json()["detail"]
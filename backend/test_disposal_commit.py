@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Idempotent disposal commits: replaying an Idempotency-Key, concurrent
+duplicates with the same key, and the single transaction that covers the
+Disposal row, the Profile totals and UserAnalytics.
+
+Uses a local SQLite file by default; set TEST_DATABASE_URL to run against MySQL.
+Run with: python -m pytest test_disposal_commit.py
+"""
+import asyncio
+import os
+import sys
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, User, Profile, UserAnalytics, Disposal
+from routers import disposals
+from services import disposal_service
+from services.disposal_service import commit_disposal
+from utils.auth import create_access_token
+
+DUPLICATES = 20
+
+@pytest.fixture()
+def url(tmp_path):
+    # SQLite serialises writers, so give it a generous busy timeout
+    url = os.getenv("TEST_DATABASE_URL", f"sqlite:///{tmp_path / 'commit.db'}?timeout=60")
+    sync_engine = build_engine(url, "test_commit_sync")
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": 1, "email": "one@example.com", "hashed_password": "x"})
+    sync_engine.dispose()
+    return url
+
+async def totals(engine) -> tuple:
+    """(disposal rows, profile points, profile disposals, analytics points, analytics scans)"""
+    async with AsyncSessionLocal(bind=engine) as db:
+        rows = await db.scalar(select(func.count(Disposal.id)))
+        profile = await db.scalar(select(Profile).where(Profile.user_id == 1))
+        analytics = await db.scalar(select(UserAnalytics).where(UserAnalytics.user_id == 1))
+        return (
+            rows,
+            profile.points if profile else None,
+            profile.total_disposals if profile else None,
+            analytics.points_earned if analytics else None,
+            analytics.total_scans if analytics else None,
+        )
+
+def test_replayed_key_returns_the_original_disposal(url):
+    engine = build_engine(to_async_url(url), "test_commit_api", is_async=True)
+
+    async def get_async_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(disposals.router, prefix="/api/disposals")
+    app.dependency_overrides[database.get_async_db] = get_async_test_db
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "1"}), "Idempotency-Key": "scan-1"}
+
+    with TestClient(app) as client:
+        def commit(**overrides):
+            return client.post("/api/disposals/commit", json={"waste_type": "plastic", "points_earned": 10, **overrides}, headers=headers)
+
+        first = commit()
+        # A retry carries the same key, even if the client rebuilt the body differently
+        retry = commit(points_earned=99)
+        result = client.portal.call(totals, engine)
+        client.portal.call(engine.dispose)
+
+    assert first.status_code == 200 and first.json()["replayed"] is False
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.status_code == 200 and retry.json()["replayed"] is True
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["disposal"]["id"] == first.json()["disposal"]["id"]
+    assert retry.json()["profile"]["points"] == 10
+    assert result == (1, 10, 1, 10, 1)
+
+def test_concurrent_duplicates_are_credited_once(url):
+    engine = build_engine(to_async_url(url), "test_commit", is_async=True)
+
+    async def attempt():
+        async with AsyncSessionLocal(bind=engine) as db:
+            disposal, replayed = await commit_disposal(db, 1, "glass", points_earned=7, idempotency_key="same-key")
+            return disposal.id, replayed
+
+    async def run():
+        try:
+            results = await asyncio.gather(*[attempt() for _ in range(DUPLICATES)])
+            return results, await totals(engine)
+        finally:
+            await engine.dispose()
+
+    results, result = asyncio.run(run())
+    assert len({disposal_id for disposal_id, _ in results}) == 1
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert result == (1, 7, 1, 7, 1)
+
+def test_disposal_and_points_commit_or_roll_back_together(url, monkeypatch):
+    engine = build_engine(to_async_url(url), "test_commit", is_async=True)
+    real_add_points = disposal_service.add_points
+
+    async def add_points_then_fail(*args, **kwargs):
+        # Profile and UserAnalytics are already written in this transaction when it fails
+        await real_add_points(*args, **kwargs)
+        raise RuntimeError("connection lost before commit")
+
+    async def run():
+        try:
+            monkeypatch.setattr(disposal_service, "add_points", add_points_then_fail)
+            async with AsyncSessionLocal(bind=engine) as db:
+                with pytest.raises(RuntimeError):
+                    await commit_disposal(db, 1, "paper", points_earned=5, idempotency_key="k1")
+            after_failure = await totals(engine)
+
+            monkeypatch.setattr(disposal_service, "add_points", real_add_points)
+            async with AsyncSessionLocal(bind=engine) as db:
+                _, replayed = await commit_disposal(db, 1, "paper", points_earned=5, idempotency_key="k1")
+            return after_failure, replayed, await totals(engine)
+        finally:
+            await engine.dispose()
+
+    after_failure, replayed, result = asyncio.run(run())
+    assert after_failure == (0, None, None, None, None)
+    # The failed attempt left nothing behind, so the retry is a first write, not a replay
+    assert replayed is False
+    assert result == (1, 5, 1, 5, 1)
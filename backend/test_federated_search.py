@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Federated nearby-bin search: deduplication of external places against our
+bins, ranking by distance and availability, the provider deadline (partial
+results) and skipping the provider when local coverage is sufficient. Also the
+rate limit policy and token-only auth of GET /api/location/nearby-bins.
+Uses a local SQLite file; the place search is replaced by a fake.
+
+Run with: python -m pytest test_federated_search.py
+"""
+import asyncio
+import sys
+import time
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, Bin
+from routers import location
+from services import federated_search
+from services.bin_tiles import bin_tiles
+from services.federated_search import merge, rank_key, nearby_bins
+from services.location_service import location_service
+from utils.auth import create_access_token
+from utils.geohash import haversine_km
+from utils.rate_limit_middleware import RateLimitMiddleware
+
+# About 11 m of latitude
+DEGREES_PER_10_M = 0.0001
+
+def local(name: str, latitude: float, status: str = "available", distance: float = None) -> dict:
+    return {
+        "id": f"local:{name}", "source": "local", "name": name, "address": "", "latitude": latitude,
+        "longitude": 0.0, "distance": latitude * 111 if distance is None else distance, "type": "recycling",
+        "status": status, "capacity": 10, "rating": None, "phone": "", "hours": "", "website": "",
+    }
+
+def place(name: str, latitude: float, **fields) -> dict:
+    return {
+        "id": name, "name": name, "address": "1 Main Road", "latitude": latitude, "longitude": 0.0,
+        "rating": 4.5, "type": "recycling", "distance": haversine_km(0, 0, latitude, 0),
+        "phone": "555-0100", "hours": "9-5", "website": "", **fields,
+    }
+
+def test_duplicates_are_merged_by_proximity_and_name():
+    ours = [local("Green Street Recycling", 0.0)]
+    external = [
+        federated_search.external_result(place("Totally Different Name", DEGREES_PER_10_M)),     # ~11 m: same spot
+        federated_search.external_result(place("Green St. Recycling Centre", 5 * DEGREES_PER_10_M)),  # ~55 m, similar
+        federated_search.external_result(place("Corner Shop Bottle Bank", 5 * DEGREES_PER_10_M)),  # ~55 m, different
+        federated_search.external_result(place("Green Street Recycling", 20 * DEGREES_PER_10_M)),  # ~220 m: too far
+    ]
+    merged = merge(ours, external)
+
+    assert [item["name"] for item in merged] == [
+        "Green Street Recycling", "Corner Shop Bottle Bank", "Green Street Recycling",
+    ]
+    # Contact details of the dropped duplicates are copied onto our bin
+    assert merged[0]["address"] == "1 Main Road"
+    assert merged[0]["phone"] == "555-0100" and merged[0]["rating"] == 4.5
+
+def test_ranking_weighs_availability_against_distance():
+    items = [
+        local("full-near", 0.0, "full", distance=0.1),
+        local("available-far", 0.0, "available", distance=1.0),
+        local("nearly-full-near", 0.0, "nearly_full", distance=0.5),
+        {**federated_search.external_result(place("external", 0.0)), "distance": 0.6},
+        local("unknown-status", 0.0, "broken", distance=0.2),
+    ]
+    ranked = [item["name"] for item in sorted(items, key=rank_key)]
+    assert ranked == ["nearly-full-near", "external", "available-far", "full-near", "unknown-status"]
+
+@pytest.fixture()
+def engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'federated.db'}"
+    sync_engine = build_engine(url, "test_federated_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(Bin.__table__.insert(), [
+            {"id": i, "name": f"Bin {i}", "type": "recycling", "status": status,
+             "latitude": i * 0.001, "longitude": 0.0, "capacity": 20}
+            for i, status in [(1, "available"), (2, "full"), (3, "maintenance")]
+        ])
+    sync_engine.dispose()
+    bin_tiles.clear()
+    yield build_engine(to_async_url(url), "test_federated", is_async=True)
+    bin_tiles.clear()
+
+@pytest.fixture()
+def places(monkeypatch):
+    """Fake provider answering after delay seconds; records its calls"""
+    state = {"delay": 0.0, "calls": 0, "places": [place("Shop Bin", 0.003)]}
+
+    async def find_places(latitude, longitude, radius_km, bin_type):
+        state["calls"] += 1
+        await asyncio.sleep(state["delay"])
+        return state["places"]
+
+    monkeypatch.setattr(location_service, "serpapi_key", "test-key")
+    monkeypatch.setattr(location_service, "find_places", find_places)
+    return state
+
+def search(engine, **kwargs):
+    async def run():
+        try:
+            async with AsyncSessionLocal(bind=engine) as db:
+                start = time.perf_counter()
+                result = await nearby_bins(db, 0.0, 0.0, 5, **kwargs)
+                return result, time.perf_counter() - start
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+def test_local_and_external_results_are_combined(engine, places):
+    result, _ = search(engine)
+    assert result["external_status"] == "ok" and not result["partial"]
+    # Maintenance bins are left out; the full bin ranks after the external place
+    assert [item["id"] for item in result["bins"]] == ["local:1", "Shop Bin", "local:2"]
+    assert result["sources"] == {"local": 2, "external": 1}
+
+def test_slow_provider_returns_partial_local_results_by_deadline(engine, places):
+    places["delay"] = 2.0
+    result, elapsed = search(engine, deadline_ms=200)
+    assert elapsed < 1.0
+    assert result["external_status"] == "timeout" and result["partial"]
+    assert [item["id"] for item in result["bins"]] == ["local:1", "local:2"]
+
+def test_failing_provider_returns_partial_local_results(engine, places, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(location_service, "find_places", broken)
+    result, _ = search(engine)
+    assert result["external_status"] == "error" and result["partial"]
+    assert result["sources"] == {"local": 2, "external": 0}
+
+def test_provider_is_not_waited_for_when_local_coverage_is_sufficient(engine, places, monkeypatch):
+    monkeypatch.setattr(federated_search, "FEDERATED_LOCAL_SUFFICIENT", 1)
+    places["delay"] = 2.0
+    result, elapsed = search(engine)
+    assert elapsed < 1.0
+    assert result["external_status"] == "skipped" and not result["partial"]
+    assert result["sources"]["external"] == 0
+
+def test_nearby_bins_endpoint_is_limited_per_user_and_needs_only_a_token(engine, places):
+    policy = RateLimitMiddleware(None, enabled=True).match("GET", "/api/location/nearby-bins")
+    assert policy.name == "location" and policy.key == "user"
+
+    async def get_read_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(location.router, prefix="/api/location")
+    app.dependency_overrides[database.get_read_db] = get_read_test_db
+    # No user row exists: the token alone authenticates, without a sync session
+    token = create_access_token({"sub": "42"})
+    params = {"latitude": 0, "longitude": 0, "radius_km": 5}
+    with TestClient(app) as client:
+        assert client.get("/api/location/nearby-bins", params=params).status_code == 403
+        response = client.get("/api/location/nearby-bins", params=params, headers={"Authorization": f"Bearer {token}"})
+        client.portal.call(engine.dispose)
+    assert response.status_code == 200
+    assert response.json()["count"] == 3
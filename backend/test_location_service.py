@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Harness for the async SerpAPI client in LocationService and its geo cache.
+A local HTTP server stands in for SerpAPI and answers slowly, so the tests can
+check that searches overlap, respect the concurrency cap, leave the event loop
+free while they wait, and are not repeated once cached.
+
+Run with: python -m pytest test_location_service.py
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+sys.path.append('.')
+
+import pytest
+
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base
+from services.geo_cache import GeoCache, normalize_address
+from services.location_service import LocationService
+
+RESPONSE_DELAY = 0.3
+
+class FakeSerpApi(BaseHTTPRequestHandler):
+    in_flight = 0
+    max_in_flight = 0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            assert url.path == "/search.json" and params["api_key"] == "test-key"
+            time.sleep(RESPONSE_DELAY)
+            if "nowhere" in params["q"]:
+                body = {}
+            elif "bins near" in params["q"]:
+                body = {"local_results": [
+                    {"place_id": "far", "title": "Far Bin", "gps_coordinates": {"latitude": 1.0, "longitude": 1.0}},
+                    {"place_id": "near", "title": "Near Bin", "gps_coordinates": {"latitude": 0.001, "longitude": 0.0}},
+                ]}
+            else:
+                body = {"place_results": {"gps_coordinates": {"latitude": 19.07, "longitude": 72.87}}}
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def serpapi_url():
+    FakeSerpApi.in_flight = FakeSerpApi.max_in_flight = FakeSerpApi.requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSerpApi)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def make_service(base_url: str, cache: GeoCache = None, **kwargs) -> LocationService:
+    service = LocationService(base_url=base_url, cache=cache or GeoCache(), **kwargs)
+    service.serpapi_key = "test-key"
+    return service
+
+def test_search_and_geocode_parse_responses(serpapi_url):
+    async def run():
+        service = make_service(serpapi_url)
+        try:
+            bins = await service.search_nearby_bins(0.0, 0.0)
+            coordinates = await service.get_location_from_address("Gateway of India")
+            missing = await service.get_location_from_address("nowhere")
+        finally:
+            await service.close()
+        return bins, coordinates, missing
+
+    bins, coordinates, missing = asyncio.run(run())
+    assert [bin["id"] for bin in bins] == ["near", "far"]
+    assert coordinates == (19.07, 72.87)
+    assert missing is None
+
+def test_slow_searches_do_not_block_event_loop(serpapi_url):
+    async def run():
+        service = make_service(serpapi_url, max_concurrency=4)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(service.get_location_from_address(f"address {i}") for i in range(8)))
+        finally:
+            ticking.cancel()
+            await service.close()
+        return time.perf_counter() - started, ticks
+
+    elapsed, ticks = asyncio.run(run())
+    # 8 searches, 4 at a time: two rounds, not eight
+    assert elapsed < RESPONSE_DELAY * 4
+    assert FakeSerpApi.max_in_flight == 4
+    # The loop kept running other work while the searches waited
+    assert ticks >= elapsed / 0.01 / 2
+
+def test_timeout_falls_back(serpapi_url):
+    async def run():
+        service = make_service(serpapi_url, timeout=RESPONSE_DELAY / 3)
+        try:
+            return (
+                await service.search_nearby_bins(0.0, 0.0),
+                await service.get_location_from_address("Gateway of India"),
+            )
+        finally:
+            await service.close()
+
+    bins, coordinates = asyncio.run(run())
+    assert [bin["id"] for bin in bins] == ["mock_bin_1", "mock_bin_2", "mock_bin_3"]
+    assert coordinates is None
+
+def test_normalize_address():
+    assert normalize_address("  Gateway of India,Mumbai. ") == "gateway of india, mumbai"
+    assert normalize_address("GATEWAY   OF INDIA , MUMBAI") == "gateway of india, mumbai"
+
+def test_repeat_lookups_are_cached(serpapi_url):
+    async def run():
+        service = make_service(serpapi_url)
+        try:
+            first = await service.search_nearby_bins(0.00001, 0.0)
+            second = await service.search_nearby_bins(0.00004, 0.0)
+            coordinates = [
+                await service.get_location_from_address(address)
+                for address in ("Gateway of India, Mumbai", "gateway of india,  MUMBAI.")
+            ]
+            missing = [await service.get_location_from_address("nowhere") for _ in range(2)]
+        finally:
+            await service.close()
+        return first, second, coordinates, missing
+
+    first, second, coordinates, missing = asyncio.run(run())
+    # One search for both nearby points, one geocode per distinct normalized address
+    assert FakeSerpApi.requests == 3
+    assert [bin["id"] for bin in second] == ["near", "far"]
+    # Distances are measured from each caller, not from the cached search
+    assert first[0]["distance"] != second[0]["distance"]
+    assert coordinates == [(19.07, 72.87)] * 2
+    assert missing == [None, None]
+
+def test_persistent_tier_survives_restart_and_warms(serpapi_url, tmp_path):
+    url = f"sqlite:///{tmp_path / 'geo_cache'}.db"
+    sync_engine = build_engine(url, "test_geo_cache_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    engine = build_engine(to_async_url(url), "test_geo_cache", is_async=True)
+    session_factory = lambda: AsyncSessionLocal(bind=engine)
+
+    async def run():
+        service = make_service(serpapi_url, cache=GeoCache(session_factory))
+        try:
+            await service.get_location_from_address("Gateway of India")
+            await service.get_location_from_address("nowhere")
+        finally:
+            await service.close()
+
+        # A fresh worker: nothing local until warmed, then no SerpAPI calls
+        restarted = GeoCache(session_factory)
+        warmed = await restarted.warm()
+        service = make_service(serpapi_url, cache=restarted)
+        try:
+            results = [
+                await service.get_location_from_address("Gateway of India"),
+                await service.get_location_from_address("nowhere"),
+            ]
+        finally:
+            await service.close()
+
+        # Without warming, the first read falls through to the table
+        cold = GeoCache(session_factory)
+        try:
+            read_through = await cold.get("geocode", normalize_address("Gateway of India"))
+        finally:
+            await engine.dispose()
+        return warmed, results, restarted.stats(), read_through, cold.stats()
+
+    warmed, results, stats, read_through, cold_stats = asyncio.run(run())
+    assert warmed == 2
+    assert results == [(19.07, 72.87), None]
+    assert FakeSerpApi.requests == 2
+    assert stats["hits"] == 2 and stats["misses"] == 0
+    assert read_through == [19.07, 72.87]
+    assert cold_stats["persistent_hits"] == 1
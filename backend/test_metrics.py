@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+MetricsMiddleware (route-template labels, request ids in responses and log
+records), the text exposition format of the registry, and the METRICS_TOKEN
+check on GET /metrics.
+
+Run with: python -m pytest test_metrics.py
+"""
+import logging
+import sys
+from typing import Optional
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.testclient import TestClient
+from fastapi.responses import PlainTextResponse
+
+from utils.logging_config import RequestIdFilter
+from utils.metrics import (
+    Counter, Gauge, Histogram, Registry, current_request_id, registry, scrape_authorized,
+)
+from utils.metrics_middleware import MetricsMiddleware
+
+@pytest.fixture()
+def client():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        logging.getLogger("test_metrics").warning("serving %s", item_id)
+        return {"item_id": item_id, "request_id": current_request_id()}
+
+    @app.get("/metrics")
+    async def metrics(authorization: Optional[str] = Header(None)):
+        # Same check as the handler in main.py, which cannot be imported without a database
+        if not scrape_authorized(authorization):
+            return PlainTextResponse("", status_code=401)
+        return PlainTextResponse(registry.render())
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+def sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def test_requests_are_labelled_by_route_template(client):
+    count = 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"}'
+    before = sample(registry.render(), count)
+    for item_id in (1, 2, 3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    client.get("/missing")
+
+    text = registry.render()
+    assert sample(text, count) == before + 3
+    assert 'route="unmatched",status="404"' in text
+    assert "/items/1" not in text
+    assert sample(text, "http_requests_in_flight ") == 0
+
+def test_request_id_is_kept_or_generated(client, caplog):
+    caplog.handler.addFilter(RequestIdFilter())
+    with caplog.at_level(logging.WARNING, logger="test_metrics"):
+        response = client.get("/items/1", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert response.json()["request_id"] == "abc-123"
+    assert [record.request_id for record in caplog.records if record.name == "test_metrics"] == ["abc-123"]
+
+    # Ids that are not safe to log or echo are replaced
+    response = client.get("/items/1", headers={"X-Request-ID": "bad id\nwith newline"})
+    generated = response.headers["X-Request-ID"]
+    assert generated != "bad id\nwith newline" and len(generated) == 32
+    assert response.json()["request_id"] == generated
+
+def test_exposition_format():
+    local = Registry()
+    counter = local.register(Counter("jobs_total", "Jobs run", ("queue",)))
+    gauge = local.register(Gauge("workers", "Workers alive"))
+    histogram = local.register(Histogram("job_seconds", "Job duration", buckets=(0.1, 1)))
+    counter.inc(queue='say "hi"\n')
+    counter.inc(2, queue='say "hi"\n')
+    gauge.set(4)
+    gauge.dec()
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    assert local.render().splitlines() == [
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{queue="say \\"hi\\"\\n"} 3',
+        "# HELP workers Workers alive",
+        "# TYPE workers gauge",
+        "workers 3",
+        "# HELP job_seconds Job duration",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.1"} 1',
+        'job_seconds_bucket{le="1"} 2',
+        'job_seconds_bucket{le="+Inf"} 3',
+        "job_seconds_sum 5.55",
+        "job_seconds_count 3",
+    ]
+
+def test_metrics_token_is_read_per_scrape(client, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    assert client.get("/metrics").status_code == 200
+
+    # Set after import, as load_dotenv or a secret rotation would
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compact responses: ?fields= selection on bin lists and detection history,
+and the columnar ?layout=columns for bin lists. Uses a local SQLite file.
+
+Run with: python -m pytest test_payload.py
+"""
+import sys
+from datetime import datetime
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, Bin, WasteDetection
+from routers import bins, waste_detection
+from services.bin_tiles import bin_tiles
+from utils.auth import create_access_token
+from utils.response_cache import response_cache
+
+USER = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+
+@pytest.fixture()
+def client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'payload.db'}"
+    sync_engine = build_engine(url, "test_payload_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(Bin.__table__.insert(), [
+            {"id": 1, "name": "Bin 1", "type": "general", "status": "available", "latitude": 0.0, "longitude": 0.0, "capacity": 10},
+            {"id": 2, "name": "Bin 2", "type": "recycling", "status": "full", "latitude": 0.001, "longitude": 0.0, "capacity": 95},
+        ])
+        conn.execute(WasteDetection.__table__.insert(), [
+            {"id": 1, "user_id": 1, "image_path": "a.jpg", "detected_items": [{"name": "can"}],
+             "disposal_recommendations": ["Rinse it"], "created_at": datetime(2026, 1, 1)},
+            {"id": 2, "user_id": 2, "image_path": "b.jpg", "detected_items": [],
+             "disposal_recommendations": [], "created_at": datetime(2026, 1, 2)},
+        ])
+    engine = build_engine(to_async_url(url), "test_payload", is_async=True)
+    SyncSession = sessionmaker(bind=sync_engine)
+
+    async def get_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    def get_sync_test_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(bins.router, prefix="/api/bins")
+    app.include_router(waste_detection.router, prefix="/api/waste")
+    app.dependency_overrides[database.get_read_db] = get_test_db
+    app.dependency_overrides[database.get_db] = get_sync_test_db
+    response_cache.clear()
+    bin_tiles.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+    sync_engine.dispose()
+    response_cache.clear()
+    bin_tiles.clear()
+
+def test_bin_list_fields_and_columns(client):
+    assert client.get("/api/bins/", params={"fields": "id, status"}).json() == [
+        {"id": 1, "status": "available"}, {"id": 2, "status": "full"},
+    ]
+    assert client.get("/api/bins/", params={"fields": "id,capacity", "layout": "columns"}).json() == {
+        "count": 2, "columns": {"id": [1, 2], "capacity": [10, 95]},
+    }
+    # All fields, in schema order, when none are selected
+    columns = client.get("/api/bins/", params={"layout": "columns"}).json()["columns"]
+    assert list(columns) == list(bins.BinSchema.model_fields) and columns["name"] == ["Bin 1", "Bin 2"]
+
+def test_location_queries_use_the_same_shapes(client):
+    near = {"lat": 0.0, "lng": 0.0, "radius": 1}
+    assert client.get("/api/bins/", params={**near, "fields": "id"}).json() == [{"id": 1}, {"id": 2}]
+    nearby = client.get("/api/bins/nearby", params={**near, "fields": "id,type", "layout": "columns"}).json()
+    assert nearby == {"count": 2, "columns": {"id": [1, 2], "type": ["general", "recycling"]}}
+
+def test_unknown_fields_and_layouts_are_rejected(client):
+    response = client.get("/api/bins/", params={"fields": "id,password"})
+    assert response.status_code == 400 and "password" in response.json()["detail"]
+    assert client.get("/api/bins/", params={"layout": "tables"}).status_code == 422
+
+def test_detection_history_fields(client):
+    assert client.get("/api/waste/history", params={"fields": "id,detected_items"}, headers=USER).json() == [
+        {"id": 1, "detected_items": [{"name": "can"}]},
+    ]
+    full = client.get("/api/waste/history", headers=USER).json()
+    assert [entry["image_path"] for entry in full] == ["a.jpg"]
+    assert client.get("/api/waste/history", params={"fields": "id,secret"}, headers=USER).status_code == 400
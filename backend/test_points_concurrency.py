@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for the atomic points ledger.
+Fires thousands of parallel add_points calls, each in its own session and
+transaction, and checks that no increment was lost.
+
+Uses a local SQLite file by default; set TEST_DATABASE_URL to run against MySQL.
+Run with: python -m pytest test_points_concurrency.py
+"""
+import asyncio
+import os
+import sys
+sys.path.append('.')
+
+from sqlalchemy import select
+
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, User, Profile, UserAnalytics
+from services.profile_service import add_points
+
+INCREMENTS = 2000
+POINTS = 3
+
+def test_parallel_increments_are_not_lost(tmp_path):
+    # SQLite serialises writers, so give it a generous busy timeout
+    url = os.getenv("TEST_DATABASE_URL", f"sqlite:///{tmp_path / 'points.db'}?timeout=60")
+    sync_engine = build_engine(url, "test_points_sync")
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": 1, "email": "one@example.com", "hashed_password": "x", "full_name": "One"},
+            {"id": 2, "email": "two@example.com", "hashed_password": "x", "full_name": "Two"},
+        ])
+    sync_engine.dispose()
+
+    engine = build_engine(to_async_url(url), "test_points", is_async=True)
+
+    async def increment(user_id: int):
+        async with AsyncSessionLocal(bind=engine) as db:
+            await add_points(db, user_id, POINTS, increment_disposals=True)
+            await db.commit()
+
+    async def run():
+        try:
+            await asyncio.gather(*[increment(1 + i % 2) for i in range(INCREMENTS)])
+            async with AsyncSessionLocal(bind=engine) as db:
+                profiles = (await db.execute(select(Profile).order_by(Profile.user_id))).scalars().all()
+                analytics = (await db.execute(select(UserAnalytics).order_by(UserAnalytics.user_id))).scalars().all()
+                return profiles, analytics
+        finally:
+            await engine.dispose()
+
+    profiles, analytics = asyncio.run(run())
+
+    per_user = INCREMENTS // 2
+    assert [p.user_id for p in profiles] == [1, 2]
+    assert [p.points for p in profiles] == [per_user * POINTS] * 2
+    assert [p.total_disposals for p in profiles] == [per_user] * 2
+    assert [a.user_id for a in analytics] == [1, 2]
+    assert [a.points_earned for a in analytics] == [per_user * POINTS] * 2
+    assert [a.total_scans for a in analytics] == [per_user] * 2
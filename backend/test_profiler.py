@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Request profiler: server-chosen profile ids, streamed responses left
+unprofiled, the sampler letting go of a profile once it is full or too old,
+and running/awaiting detection without asyncio's private task map.
+
+Run with: python -m pytest test_profiler.py
+"""
+import asyncio
+import re
+import sys
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils import profiler
+from utils.metrics_middleware import MetricsMiddleware
+from utils.profiler import AWAITING, Profile, ProfilerMiddleware, Sampler, profile_store
+
+@pytest.fixture()
+def client():
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, enabled=True, sample_rate=1)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/api/bins/")
+    async def list_bins():
+        await asyncio.sleep(0.02)
+        return []
+
+    @app.get("/api/bins/events")
+    async def events():
+        async def stream():
+            yield "data: {}\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+def test_profile_id_is_generated_by_the_server(client):
+    first = client.get("/api/bins/", headers={"X-Request-ID": "client-chosen"})
+    second = client.get("/api/bins/", headers={"X-Request-ID": "client-chosen"})
+    assert first.headers["X-Request-ID"] == "client-chosen"
+
+    ids = [first.headers["X-Profile-Id"], second.headers["X-Profile-Id"]]
+    assert all(re.fullmatch(r"[0-9a-f]{32}", profile_id) for profile_id in ids)
+    assert ids[0] != ids[1]
+    profile = profile_store.get(ids[0])
+    assert (profile.route, profile.status) == ("/api/bins/", 200)
+
+def test_streamed_responses_are_not_profiled(client):
+    with client.stream("GET", "/api/bins/events") as response:
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+def profile_until_released(sampler: Sampler, **limits):
+    """Profile a request that keeps running; returns the profile and whether the sampler let go of it first"""
+    async def run():
+        profile = Profile("slow", "GET", "/slow", "sampled", **limits)
+        sampler.start(profile)
+        try:
+            for _ in range(300):
+                if not sampler.active:
+                    return profile, True
+                await asyncio.sleep(0.01)
+            return profile, False
+        finally:
+            sampler.stop(profile)
+
+    return asyncio.run(run())
+
+def test_sampler_releases_a_full_profile():
+    profile, released = profile_until_released(Sampler(interval_ms=1), max_samples=5)
+    assert released and profile.truncated and len(profile.samples) == 5
+
+def test_sampler_releases_a_profile_after_the_maximum_duration():
+    profile, released = profile_until_released(Sampler(interval_ms=1), max_samples=100000, max_duration_s=0.1)
+    assert released and profile.truncated and 0 < len(profile.samples) < 100000
+
+@pytest.mark.parametrize("task_map", ["asyncio", "fallback"])
+def test_running_and_awaiting_samples(task_map, monkeypatch):
+    if task_map == "fallback":
+        monkeypatch.setattr(profiler, "_current_tasks", None)
+
+    async def waiting(ready: asyncio.Event, done: asyncio.Event, profiles: list):
+        profiles.append(Profile("waiting", "GET", "/wait", "sampled"))
+        ready.set()
+        await done.wait()
+
+    async def busy_request():
+        ready, done, profiles = asyncio.Event(), asyncio.Event(), []
+        other = asyncio.create_task(waiting(ready, done, profiles))
+        await ready.wait()
+        own = Profile("busy", "GET", "/busy", "sampled")
+        # Sampled from the running task itself: its stack is on the loop thread
+        own.sample(sys._current_frames())
+        profiles[0].sample(sys._current_frames())
+        done.set()
+        await other
+        return own, profiles[0]
+
+    own, waited = asyncio.run(busy_request())
+    running = [own.frames[index][0] for index in own.samples[0][0]]
+    assert running[0] == "busy_request" and AWAITING[0] not in running
+    suspended = [waited.frames[index] for index in waited.samples[0][0]]
+    assert suspended[0][0] == "waiting" and suspended[-1] == AWAITING
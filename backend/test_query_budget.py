@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Query count regression tests for endpoints that used to query in loops
+(leaderboard, feedback stats, weekly stats, bin type stats), and for the
+development-mode QueryBudgetMiddleware.
+
+Counts must not grow with the number of users or rows, so the data set is
+larger than any of the budgets. Uses a local SQLite file.
+Run with: python -m pytest test_query_budget.py
+"""
+import sys
+from datetime import datetime, timedelta
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal, ReplicaRouter
+from models import Base, User, Profile, UserAnalytics, Disposal, Feedback, WasteDetection, Bin
+from routers import analytics, feedback, bins
+from utils.auth import create_access_token
+from utils.metrics_middleware import MetricsMiddleware
+from utils.query_budget import QueryBudgetMiddleware, QueryBudgetExceeded, fingerprint
+
+USERS = 40
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('budget') / 'budget.db'}"
+    sync_engine = build_engine(url, "test_budget_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    now = datetime.utcnow()
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "email": f"user{i}@example.com", "hashed_password": "x", "full_name": f"User {i}"}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(Profile.__table__.insert(), [
+            {"user_id": i, "full_name": f"Profile {i}", "points": i * 3} for i in range(1, USERS + 1, 2)
+        ])
+        conn.execute(UserAnalytics.__table__.insert(), [
+            {"user_id": i, "points_earned": i * 2, "total_scans": i} for i in range(1, USERS + 1)
+        ])
+        conn.execute(Disposal.__table__.insert(), [
+            {"user_id": i, "waste_type": "plastic", "points_earned": i, "created_at": now - timedelta(days=i % 10)}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(Feedback.__table__.insert(), [
+            {"user_id": 1, "type": feedback_type, "message": "m", "rating": rating}
+            for feedback_type, rating in [("general", 5), ("bug", None), ("feature", 3), ("appreciation", 4)] * 5
+        ])
+        conn.execute(WasteDetection.__table__.insert(), [
+            {"user_id": 1, "image_path": "x.jpg", "detected_items": [], "created_at": now - timedelta(hours=7 * i)}
+            for i in range(30)
+        ])
+        conn.execute(Bin.__table__.insert(), [
+            {"name": f"Bin {i}", "type": ["general", "recycling", "organic"][i % 3], "latitude": 19.0 + i * 0.001,
+             "longitude": 72.8, "capacity": 50, "status": ["available", "full"][i % 2]}
+            for i in range(30)
+        ])
+
+    engine = build_engine(to_async_url(url), "test_budget", is_async=True)
+    SyncSession = sessionmaker(bind=sync_engine)
+
+    async def get_async_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    def get_test_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(analytics.router, prefix="/api/analytics")
+    app.include_router(feedback.router, prefix="/api/feedback")
+    app.include_router(bins.router, prefix="/api/bins")
+
+    @app.get("/n-plus-one")
+    async def n_plus_one(db: AsyncSession = Depends(get_async_test_db)):
+        names = []
+        for user_id in range(1, 8):
+            names.append(await db.scalar(select(User.full_name).where(User.id == user_id)))
+        return names
+
+    app.dependency_overrides[database.get_db] = get_test_db
+    app.dependency_overrides[database.get_async_db] = get_async_test_db
+    app.dependency_overrides[database.get_read_db] = get_async_test_db
+    app.add_middleware(QueryBudgetMiddleware, mode="raise", default_budget=10, max_repeats=3)
+    app.add_middleware(MetricsMiddleware)
+
+    original_router = analytics.read_router
+    analytics.read_router = ReplicaRouter(engine, [])
+    try:
+        with TestClient(app) as test_client:
+            test_client.engine = engine
+            yield test_client
+            test_client.portal.call(engine.dispose)
+    finally:
+        analytics.read_router = original_router
+        sync_engine.dispose()
+
+def auth(user_id: int = 1) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": str(user_id)})}
+
+def test_fingerprint_ignores_parameters():
+    assert fingerprint("SELECT * FROM users WHERE id = 1") == fingerprint("SELECT *  FROM users\nWHERE id = 42")
+    assert fingerprint("SELECT * FROM users WHERE id IN (?, ?, ?)") == "SELECT * FROM users WHERE id IN (?)"
+    assert fingerprint("SELECT * FROM users WHERE email = 'a@b.com'") == fingerprint("SELECT * FROM users WHERE email = %s")
+    assert fingerprint("SELECT anon_1.id FROM anon_1") == "SELECT anon_1.id FROM anon_1"
+
+@pytest.mark.parametrize("period, budget", [("all", 3), ("week", 3), ("month", 3)])
+def test_leaderboard_queries_do_not_grow_with_users(client, assert_max_queries, period, budget):
+    with assert_max_queries(budget, max_repeats=1):
+        response = client.get(f"/api/analytics/leaderboard?period={period}", headers=auth())
+    assert response.status_code == 200
+    assert len(response.json()["leaderboard"]) == 10
+
+def test_feedback_stats_is_one_query(client, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.get("/api/feedback/stats", headers=auth())
+    assert response.json() == {
+        "total_feedback": 20,
+        "feedback_by_type": {"general": 5, "feature": 5, "bug": 5, "appreciation": 5},
+        "average_rating": 4.0,
+        "contribution_score": 200,
+    }
+
+def test_weekly_stats_is_one_query(client, assert_max_queries):
+    async def weekly():
+        async with AsyncSessionLocal(bind=client.engine) as db:
+            return await analytics.calculate_weekly_stats(1, db)
+
+    with assert_max_queries(1):
+        stats = client.portal.call(weekly)
+    assert stats["total_weekly_scans"] == 24
+    assert len(stats["daily_breakdown"]) == 7
+
+@pytest.mark.query_budget(1)
+def test_bin_type_stats_for_region_is_one_query(client):
+    response = client.get("/api/bins/types/stats?lat=19.01&lng=72.8&radius=50")
+    assert response.status_code == 200
+    assert response.json()["general"]["total"] == 10
+
+def test_middleware_reports_query_count(client):
+    response = client.get("/api/feedback/stats", headers=auth())
+    assert response.headers["x-query-count"] == "1"
+
+def test_middleware_fails_repeated_statements(client):
+    with pytest.raises(QueryBudgetExceeded, match="7x"):
+        client.get("/n-plus-one")
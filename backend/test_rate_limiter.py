@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+InMemoryRateLimiter: the sliding window, account lockout over lockout_minutes,
+the memory cap with least recently used eviction, and the expiry sweeper.
+
+Run with: python -m pytest test_rate_limiter.py
+"""
+import sys
+import time
+sys.path.append('.')
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import InMemoryRateLimiter
+
+class FakeClock:
+    """Stands in for the time module inside utils.rate_limiter; starts on a minute boundary"""
+    def __init__(self, now: float = 1_000_020.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+def test_sliding_window(clock):
+    limiter = InMemoryRateLimiter(sweep_interval=0)
+    results = [limiter.hit("ip:1", 3, 60) for _ in range(4)]
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results] == [2, 1, 0, 0]
+
+    # Halfway through the next window half of the previous one still counts
+    clock.now += 60 + 30
+    assert limiter.hit("ip:1", 3, 60).remaining == 0
+    assert not limiter.hit("ip:1", 3, 60).allowed
+
+def test_lockout_honours_lockout_minutes(clock):
+    limiter = InMemoryRateLimiter(sweep_interval=0)
+    assert not limiter.is_account_locked("a@example.com")
+    for _ in range(5):
+        limiter.add_failed_attempt("a@example.com")
+        clock.now += 1
+    assert limiter.is_account_locked("a@example.com")
+    assert not limiter.is_account_locked("a@example.com", max_attempts=6)
+
+    clock.now += 5 * 60
+    assert not limiter.is_account_locked("a@example.com", lockout_minutes=5)
+    assert limiter.is_account_locked("a@example.com", lockout_minutes=10)
+    assert limiter.is_account_locked("a@example.com")
+
+    # Attempts are kept for lockout_seconds, so longer lockouts are capped there
+    clock.now += limiter.lockout_seconds
+    assert not limiter.is_account_locked("a@example.com", lockout_minutes=60)
+    assert limiter.sweep() == 1 and len(limiter) == 0
+
+def test_lookups_do_not_create_keys(clock):
+    limiter = InMemoryRateLimiter(sweep_interval=0)
+    for i in range(100):
+        limiter.is_account_locked(f"user{i}@example.com")
+    assert len(limiter) == 0
+
+def test_many_distinct_keys_stay_under_the_cap(clock, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_MEMORY_MAX_KEYS", "128")
+    limiter = InMemoryRateLimiter(sweep_interval=0)
+    for i in range(20_000):
+        limiter.hit(f"ip:{i}", 10, 60)
+        if i % 7 == 0:
+            limiter.add_failed_attempt(f"user{i}@example.com")
+    assert 0 < len(limiter) <= 128
+
+def test_least_recently_used_key_is_evicted(clock):
+    limiter = InMemoryRateLimiter(max_keys=3, shards=1, sweep_interval=0)
+    for key in ("a", "b", "c", "a"):
+        assert limiter.hit(key, 2, 60).allowed
+    # "a" was used again, so "b" is the least recently used key
+    limiter.hit("d", 2, 60)
+
+    assert len(limiter) == 3
+    assert limiter.hit("b", 1, 60).allowed
+    assert not limiter.hit("a", 2, 60).allowed
+
+def test_sweeper_drops_expired_windows(clock):
+    limiter = InMemoryRateLimiter(sweep_interval=0.01)
+    try:
+        limiter.hit("short", 10, 60)
+        limiter.hit("long", 10, 3600)
+        limiter.add_failed_attempt("a@example.com")
+        assert limiter.sweep() == 0
+
+        clock.now += 2 * 60
+        deadline = time.monotonic() + 5
+        while len(limiter) == 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(limiter) == 2
+    finally:
+        limiter.close()
+        limiter._sweeper.join()
+
+    clock.now += limiter.lockout_seconds
+    assert limiter.sweep() == 1 and len(limiter) == 1
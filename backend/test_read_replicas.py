@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Harness for read/write session routing.
+Two local SQLite files stand in for the primary and a replica; each holds a
+single bin named after its role, so a read shows which database served it.
+
+Run with: python -m pytest test_read_replicas.py
+"""
+import asyncio
+import sys
+sys.path.append('.')
+
+from sqlalchemy import select
+
+import database
+from database import build_engine, to_async_url, ReplicaRouter, AsyncSessionLocal
+from models import Base, Bin
+
+def make_database(tmp_path, role: str):
+    url = f"sqlite:///{tmp_path / role}.db"
+    sync_engine = build_engine(url, f"test_{role}_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(Bin.__table__.insert(), {"name": role, "type": "general", "latitude": 0.0, "longitude": 0.0})
+    sync_engine.dispose()
+    return build_engine(to_async_url(url), f"test_{role}", is_async=True)
+
+def fake_lags(lags: dict):
+    async def probe(engine):
+        lag = lags[engine]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+    return probe
+
+async def served_by(router: ReplicaRouter) -> str:
+    async with AsyncSessionLocal(bind=await router.pick()) as db:
+        return await db.scalar(select(Bin.name))
+
+async def dispose(*engines):
+    for engine in engines:
+        await engine.dispose()
+
+def test_reads_use_healthy_replica(tmp_path):
+    primary, replica = make_database(tmp_path, "primary"), make_database(tmp_path, "replica")
+    router = ReplicaRouter(primary, [replica], max_lag=5, lag_probe=fake_lags({replica: 0.5}))
+
+    async def run():
+        try:
+            return await served_by(router)
+        finally:
+            await dispose(primary, replica)
+
+    assert asyncio.run(run()) == "replica"
+
+def test_lagging_or_broken_replica_falls_back_to_primary(tmp_path):
+    primary, replica = make_database(tmp_path, "primary"), make_database(tmp_path, "replica")
+    lags = {replica: 30.0}
+    router = ReplicaRouter(primary, [replica], max_lag=5, check_interval=0, lag_probe=fake_lags(lags))
+
+    async def run():
+        served = [await served_by(router)]
+        lags[replica] = None  # replication stopped
+        served.append(await served_by(router))
+        lags[replica] = ConnectionError("replica down")
+        served.append(await served_by(router))
+        lags[replica] = 1.0  # caught up again
+        served.append(await served_by(router))
+        await dispose(primary, replica)
+        return served
+
+    assert asyncio.run(run()) == ["primary", "primary", "primary", "replica"]
+
+def test_health_checks_are_cached_between_intervals(tmp_path):
+    primary, replica = make_database(tmp_path, "primary"), make_database(tmp_path, "replica")
+    calls = []
+
+    async def probe(engine):
+        calls.append(engine)
+        return 0.0
+
+    router = ReplicaRouter(primary, [replica], check_interval=60, lag_probe=probe)
+
+    async def run():
+        for _ in range(5):
+            await served_by(router)
+        await dispose(primary, replica)
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+def test_concurrent_requests_share_one_probe(tmp_path):
+    primary, replica = make_database(tmp_path, "primary"), make_database(tmp_path, "replica")
+    calls = []
+
+    async def slow_probe(engine):
+        calls.append(engine)
+        await asyncio.sleep(0.05)
+        return 0.0
+
+    router = ReplicaRouter(primary, [replica], check_interval=0, lag_probe=slow_probe)
+
+    async def run():
+        burst = await asyncio.gather(*(router.pick() for _ in range(20)))
+        # A picker that gives up does not cancel the probe the others are waiting on
+        waiter = asyncio.ensure_future(router.pick())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        after_cancel = await router.pick()
+        await dispose(primary, replica)
+        return burst, after_cancel
+
+    burst, after_cancel = asyncio.run(run())
+    assert burst == [replica] * 20 and after_cancel is replica
+    assert len(calls) == 2
+
+def test_replicas_are_used_round_robin(tmp_path):
+    primary = make_database(tmp_path, "primary")
+    replica_a, replica_b = make_database(tmp_path, "replica_a"), make_database(tmp_path, "replica_b")
+    router = ReplicaRouter(primary, [replica_a, replica_b], lag_probe=fake_lags({replica_a: 0.0, replica_b: 0.0}))
+
+    async def run():
+        served = [await served_by(router) for _ in range(4)]
+        await dispose(primary, replica_a, replica_b)
+        return served
+
+    assert asyncio.run(run()) == ["replica_a", "replica_b", "replica_a", "replica_b"]
+
+def test_get_read_db_dependency_routes_to_replica(tmp_path, monkeypatch):
+    primary, replica = make_database(tmp_path, "primary"), make_database(tmp_path, "replica")
+    monkeypatch.setattr(database, "read_router", ReplicaRouter(primary, [replica], lag_probe=fake_lags({replica: 0.0})))
+
+    async def run():
+        dependency = database.get_read_db()
+        db = await dependency.__anext__()
+        try:
+            return await db.scalar(select(Bin.name))
+        finally:
+            await dependency.aclose()
+            await dispose(primary, replica)
+
+    assert asyncio.run(run()) == "replica"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+AsyncRedisRateLimiter against fakeredis: the sliding log and GCRA scripts at
+the limit boundary, their retry-after values, atomicity under concurrent
+checks, and the in-memory fallback after a Redis error with recovery once
+the retry interval has passed. Needs fakeredis with Lua support, from
+requirements-dev.txt; skipped without it.
+
+Run with: python -m pytest test_redis_rate_limiter.py
+"""
+import asyncio
+import sys
+import time
+sys.path.append('.')
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from utils import rate_limiter
+from utils.rate_limiter import AsyncRedisRateLimiter
+
+def run_with_limiter(algorithm: str, scenario, server=None):
+    """Run `scenario(limiter, client)` against a fresh fake Redis server"""
+    async def run():
+        client = fakeredis.aioredis.FakeRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+        limiter = AsyncRedisRateLimiter(algorithm=algorithm, client=client)
+        try:
+            return await scenario(limiter, client)
+        finally:
+            limiter.fallback.close()
+            await client.aclose()
+
+    return asyncio.run(run())
+
+def test_sliding_log_limit_and_retry_after():
+    async def scenario(limiter, client):
+        results = [await limiter.hit("ip:1", 3, 10) for _ in range(4)]
+        weighted = [await limiter.hit("ip:2", 3, 10, cost=2) for _ in range(2)]
+        return results, weighted, await client.zcard("ip:1"), await client.pttl("ip:1")
+
+    results, weighted, members, ttl = run_with_limiter("sliding_log", scenario)
+    assert [(r.allowed, r.remaining) for r in results] == [(True, 2), (True, 1), (True, 0), (False, 0)]
+    # Retry once the oldest request leaves the 10 s window
+    assert all(9 < r.reset_after <= 10 for r in results)
+    assert [(r.allowed, r.remaining) for r in weighted] == [(True, 1), (False, 1)]
+    # The refused request was not logged
+    assert members == 3 and 0 < ttl <= 10_000
+
+def test_gcra_limit_and_retry_after():
+    async def scenario(limiter, client):
+        results = [await limiter.hit("ip:1", 4, 8) for _ in range(5)]
+        return results, await client.pttl("ip:1")
+
+    results, ttl = run_with_limiter("gcra", scenario)
+    assert [(r.allowed, r.remaining) for r in results] == [(True, 3), (True, 2), (True, 1), (True, 0), (False, 0)]
+    assert [r.reset_after for r in results[:4]] == [0, 0, 0, 0]
+    # One request is emitted every 8 s / 4 = 2 s
+    assert 1.9 < results[4].reset_after <= 2
+    assert 7_900 < ttl <= 8_000
+
+@pytest.mark.parametrize("algorithm", ["sliding_log", "gcra"])
+def test_concurrent_checks_never_exceed_the_limit(algorithm):
+    async def scenario(limiter, client):
+        return await asyncio.gather(*(limiter.hit("ip:1", 5, 60) for _ in range(30)))
+
+    results = run_with_limiter(algorithm, scenario)
+    assert sum(r.allowed for r in results) == 5
+
+class FakeMonotonic:
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+
+def test_falls_back_to_memory_and_recovers(monkeypatch):
+    clock = FakeMonotonic()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    server = fakeredis.FakeServer()
+
+    async def scenario(limiter, client):
+        server.connected = False
+        down = [await limiter.hit("ip:1", 2, 60) for _ in range(3)]
+        for _ in range(5):
+            await limiter.add_failed_attempt("a@example.com")
+        on_fallback = (limiter.available, len(limiter.fallback), await limiter.is_account_locked("a@example.com"))
+
+        # Redis is back, but the limiter waits out the retry interval first
+        server.connected = True
+        still_fallback = await limiter.hit("ip:1", 2, 60)
+        redis_keys_before = await client.dbsize()
+        clock.offset += limiter.retry_interval + 1
+        recovered = await limiter.hit("ip:1", 2, 60)
+        return down, on_fallback, still_fallback, redis_keys_before, recovered, await client.zcard("ip:1")
+
+    down, on_fallback, still_fallback, redis_keys_before, recovered, members = run_with_limiter(
+        "sliding_log", scenario, server,
+    )
+    # The in-memory limiter enforces the same limits while Redis is down
+    assert [r.allowed for r in down] == [True, True, False]
+    assert on_fallback == (False, 2, True)
+    assert not still_fallback.allowed and redis_keys_before == 0
+    # Redis has its own count, which starts afresh
+    assert (recovered.allowed, recovered.remaining, members) == (True, 1, 1)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Response cache and geohash bin tiles: invalidation when a bin is updated,
+tag invalidation, ETag/304 (also with the weak ETags of compressed responses),
+and loads that raced an invalidation, or may have read a lagging replica
+right after one, not being cached.
+Uses a local SQLite file.
+
+Run with: python -m pytest test_response_cache.py
+"""
+import asyncio
+import sys
+from types import SimpleNamespace
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, Bin
+from routers import bins
+from services.bin_events import Region
+from services.bin_tiles import BinTileCache, bin_tiles
+from utils.auth import create_access_token
+from utils import invalidation
+from utils.compression_middleware import CompressionMiddleware
+from utils.response_cache import ResponseCache, response_cache
+
+ADMIN = {"Authorization": "Bearer " + create_access_token({"sub": "1", "admin": True})}
+
+@pytest.fixture()
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'cache.db'}"
+    sync_engine = build_engine(url, "test_cache_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(Bin.__table__.insert(), [
+            {"id": i, "name": f"Bin {i} on a street with a long name", "type": "general", "status": "available",
+             "latitude": 0.001 * i, "longitude": 0.0, "capacity": 10, "address": f"{i} Long Example Avenue"}
+            for i in range(1, 6)
+        ])
+    sync_engine.dispose()
+    return url
+
+@pytest.fixture()
+def client(url):
+    engine = build_engine(to_async_url(url), "test_cache", is_async=True)
+
+    async def get_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    app.include_router(bins.router, prefix="/api/bins")
+    app.dependency_overrides[database.get_async_db] = get_test_db
+    app.dependency_overrides[database.get_read_db] = get_test_db
+    response_cache.clear()
+    bin_tiles.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+        test_client.portal.call(engine.dispose)
+    response_cache.clear()
+    bin_tiles.clear()
+
+def test_update_bin_invalidates_list_detail_and_tiles(client):
+    near = {"lat": 0.0, "lng": 0.0, "radius": 1}
+    assert client.get("/api/bins/").json()[0]["capacity"] == 10
+    assert client.get("/api/bins/1").json()["capacity"] == 10
+    assert client.get("/api/bins/", params=near).json()[0]["capacity"] == 10
+    hits = response_cache.hits
+    assert client.get("/api/bins/1").json()["capacity"] == 10
+    assert response_cache.hits == hits + 1
+
+    assert client.put("/api/bins/1", json={"capacity": 90}, headers=ADMIN).status_code == 200
+    assert client.get("/api/bins/").json()[0]["capacity"] == 90
+    assert client.get("/api/bins/1").json()["capacity"] == 90
+    assert client.get("/api/bins/", params=near).json()[0]["capacity"] == 90
+
+def test_etag_revalidation_with_strong_and_weak_tags(client):
+    plain = client.get("/api/bins/1", headers={"Accept-Encoding": "identity"})
+    etag = plain.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert client.get("/api/bins/1", headers={"If-None-Match": etag}).status_code == 304
+
+    # The list is large enough to be compressed, which weakens its ETag
+    compressed = client.get("/api/bins/", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    weak = compressed.headers["ETag"]
+    assert weak.startswith("W/")
+    assert client.get("/api/bins/", headers={"Accept-Encoding": "gzip", "If-None-Match": weak}).status_code == 304
+    assert client.get("/api/bins/", headers={"If-None-Match": 'W/"other", ' + weak}).status_code == 304
+
+    client.put("/api/bins/2", json={"status": "full"}, headers=ADMIN)
+    assert client.get("/api/bins/", headers={"If-None-Match": weak}).status_code == 200
+
+def test_tag_invalidation():
+    async def run():
+        cache = ResponseCache(backend="memory")
+        await cache.set("list", b"[]", 60, tags=["bins"])
+        await cache.set("detail:1", b"{}", 60, tags=["bin:1", "bin-details"])
+        await cache.set("detail:2", b"{}", 60, tags=["bin:2", "bin-details"])
+        cache.invalidate_local("bin:1")
+        first = [key for key in ("list", "detail:1", "detail:2") if await cache.get(key)]
+        await cache.invalidate("bins", "bin:2")
+        return first, [key for key in ("list", "detail:1", "detail:2") if await cache.get(key)]
+
+    assert asyncio.run(run()) == (["list", "detail:2"], [])
+
+def test_response_built_during_invalidation_is_not_cached():
+    async def run():
+        cache = ResponseCache(backend="memory")
+        started = cache.invalidations.now()
+        # A bin update lands while the (old) response is being built
+        cache.invalidate_local("bin:1")
+        await cache.set("detail:1", b"old", 60, tags=["bin:1"], started=started)
+        await cache.set("detail:2", b"fine", 60, tags=["bin:2"], started=started)
+        return await cache.get("detail:1"), await cache.get("detail:2"), cache.stale_loads
+
+    stale, fresh, stale_loads = asyncio.run(run())
+    assert stale is None and fresh.body == b"fine" and stale_loads == 1
+
+def test_loads_just_after_an_invalidation_are_not_cached(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(invalidation, "time", SimpleNamespace(monotonic=lambda: clock.now))
+
+    async def run():
+        cache = ResponseCache(backend="memory")
+        cache.invalidations.grace_seconds = 5
+        cache.invalidate_local("bin:1")
+        results = []
+        for delay in (1, 3, 2):
+            # A replica read starting this long after the update may still miss it
+            clock.now += delay
+            started = cache.invalidations.now()
+            await cache.set("detail:1", b"read", 60, tags=["bin:1"], started=started)
+            await cache.set("detail:2", b"read", 60, tags=["bin:2"], started=started)
+            results.append((await cache.get("detail:1") is not None, await cache.get("detail:2") is not None))
+        return results
+
+    assert asyncio.run(run()) == [(False, True), (False, True), (True, True)]
+
+def test_tile_load_racing_an_invalidation_is_not_cached(url):
+    tiles = BinTileCache()
+    region = Region.around(0.0, 0.0, 1)
+
+    class UpdatedDuringRead:
+        """Session whose query returns the old rows after the bin was updated and invalidated"""
+        def __init__(self, db):
+            self.db = db
+
+        async def execute(self, statement):
+            result = await self.db.execute(statement)
+            tiles.invalidate_points([(0.001, 0.0)])
+            return result
+
+    async def run():
+        engine = build_engine(to_async_url(url), "test_tiles", is_async=True)
+        try:
+            async with AsyncSessionLocal(bind=engine) as db:
+                first = await tiles.candidates(UpdatedDuringRead(db), region)
+                misses = tiles.cell_misses
+                second = await tiles.candidates(db, region)
+                return first, second, tiles.cell_misses - misses
+        finally:
+            await engine.dispose()
+
+    first, second, new_misses = asyncio.run(run())
+    # The racing load still answered its own request, but the invalidated cell was read again
+    assert len(first) == len(second) == 5
+    assert new_misses == 1
+    assert tiles.stale_loads == 1
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Bin telemetry ingestion: retransmitted readings stored and rolled up once
+(also when a concurrent batch stores them first), out-of-order readings,
+status thresholds, hourly rollup math, and who may post readings.
+Uses a local SQLite file.
+
+Run with: python -m pytest test_telemetry.py
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+sys.path.append('.')
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import database
+from database import build_engine, to_async_url, AsyncSessionLocal
+from models import Base, Bin, BinTelemetry, BinTelemetryRollup
+from routers import bins
+from schemas import TelemetryReading
+from services import telemetry_service
+from services.telemetry_service import ingest_readings, derive_status
+from utils.auth import create_access_token
+
+HOUR = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+@pytest.fixture()
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'telemetry.db'}"
+    sync_engine = build_engine(url, "test_telemetry_sync")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(Bin.__table__.insert(), [
+            {"id": 1, "name": "Bin 1", "type": "general", "latitude": 0.0, "longitude": 0.0, "capacity": 0, "status": "available"},
+            {"id": 2, "name": "Bin 2", "type": "general", "latitude": 0.0, "longitude": 0.0, "capacity": 0, "status": "maintenance"},
+        ])
+    sync_engine.dispose()
+    return url
+
+def readings(*values) -> list:
+    """(bin_id, minutes after HOUR, fill_pct) triples"""
+    return [TelemetryReading(bin_id=bin_id, fill_pct=fill, timestamp=HOUR + timedelta(minutes=minutes))
+            for bin_id, minutes, fill in values]
+
+def ingest_all(url, *batches):
+    """Ingest the batches in order; returns the reports, then raw rows, rollups and bins"""
+    engine = build_engine(to_async_url(url), "test_telemetry", is_async=True)
+
+    async def run():
+        try:
+            reports = []
+            for batch in batches:
+                async with AsyncSessionLocal(bind=engine) as db:
+                    reports.append(await ingest_readings(db, batch))
+            async with AsyncSessionLocal(bind=engine) as db:
+                raw = (await db.execute(select(BinTelemetry.bin_id, BinTelemetry.recorded_at, BinTelemetry.fill_pct)
+                                        .order_by(BinTelemetry.bin_id, BinTelemetry.recorded_at))).all()
+                rollups = (await db.execute(select(BinTelemetryRollup).order_by(BinTelemetryRollup.bin_id, BinTelemetryRollup.bucket_start))).scalars().all()
+                states = {b.id: b for b in (await db.execute(select(Bin))).scalars().all()}
+                return reports, raw, rollups, states
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+def test_status_thresholds():
+    assert derive_status(0) == "available"
+    assert derive_status(74.9) == "available"
+    assert derive_status(75) == "nearly_full"
+    assert derive_status(94.9) == "nearly_full"
+    assert derive_status(95) == "full"
+    assert derive_status(100) == "full"
+
+def test_rollups_and_bin_state(url):
+    reports, raw, rollups, states = ingest_all(url, readings(
+        (1, 5, 10), (1, 20, 30), (1, 40, 20), (1, 70, 80),
+        (2, 5, 99), (1, 10, 120), (99, 5, 50),
+    ))
+    report = reports[0]
+    assert report["accepted"] == 5 and report["rejected"] == 2 and report["bins_updated"] == 2
+
+    first, second, other = rollups
+    assert (first.bin_id, first.bucket_start, first.samples, first.fill_sum, first.fill_min, first.fill_max) == (1, HOUR, 3, 60, 10, 30)
+    assert (second.bucket_start, second.samples, second.fill_sum) == (HOUR + timedelta(hours=1), 1, 80)
+    assert (other.bin_id, other.samples) == (2, 1)
+
+    # The newest reading sets capacity and status; maintenance is kept
+    assert (states[1].capacity, states[1].status) == (80, "nearly_full")
+    assert (states[2].capacity, states[2].status) == (99, "maintenance")
+
+def test_retransmitted_readings_are_stored_once(url):
+    batch = readings((1, 5, 10), (1, 20, 30))
+    reports, raw, rollups, _ = ingest_all(url, batch + readings((1, 5, 10)), batch)
+    assert (reports[0]["accepted"], reports[0]["stale"]) == (2, 1)
+    assert (reports[1]["accepted"], reports[1]["stale"]) == (0, 2)
+    assert len(raw) == 2
+    assert [(r.samples, r.fill_sum) for r in rollups] == [(2, 40)]
+
+def test_out_of_order_readings_join_history_but_not_state(url):
+    reports, raw, rollups, states = ingest_all(url, readings((1, 30, 96)), readings((1, 10, 20), (1, 50, 50)))
+    assert reports[1]["accepted"] == 2 and reports[1]["late"] == 1
+    assert [fill for _, _, fill in raw] == [20, 96, 50]
+    assert [(r.samples, r.fill_sum, r.fill_min, r.fill_max) for r in rollups] == [(3, 166, 20, 96)]
+    assert (states[1].capacity, states[1].status) == (50, "available")
+
+    # Only late readings: stored, but the state stays with the newest one
+    reports, raw, _, states = ingest_all(url, readings((1, 0, 90)))
+    assert (reports[0]["accepted"], reports[0]["late"], reports[0]["bins_updated"]) == (1, 1, 0)
+    assert len(raw) == 4 and states[1].capacity == 50
+
+def test_batch_racing_a_concurrent_batch_is_retried(url, monkeypatch):
+    # The other batch commits the first reading after this one looked up what was stored
+    ingest_all(url, readings((1, 5, 10)))
+    real_stored_readings = telemetry_service.stored_readings
+    lookups = []
+
+    async def missed_the_other_batch(db, keys):
+        lookups.append(keys)
+        return set() if len(lookups) == 1 else await real_stored_readings(db, keys)
+
+    monkeypatch.setattr(telemetry_service, "stored_readings", missed_the_other_batch)
+    reports, raw, rollups, _ = ingest_all(url, readings((1, 5, 10), (1, 20, 30)))
+    assert len(lookups) == 2
+    assert (reports[0]["accepted"], reports[0]["stale"]) == (1, 1)
+    assert len(raw) == 2
+    assert [(r.samples, r.fill_sum) for r in rollups] == [(2, 40)]
+
+def test_only_devices_and_admins_may_post_readings(url, monkeypatch):
+    monkeypatch.setenv("TELEMETRY_DEVICE_TOKENS", "sensor-a, sensor-b")
+    engine = build_engine(to_async_url(url), "test_telemetry_api", is_async=True)
+
+    async def get_async_test_db():
+        async with AsyncSessionLocal(bind=engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(bins.router, prefix="/api/bins")
+    app.dependency_overrides[database.get_async_db] = get_async_test_db
+    body = {"readings": [{"bin_id": 1, "fill_pct": 50, "timestamp": HOUR.isoformat()}]}
+
+    def post(token: str):
+        return client.post("/api/bins/telemetry", json=body, headers={"Authorization": f"Bearer {token}"})
+
+    with TestClient(app) as client:
+        assert post(create_access_token({"sub": "1"})).status_code == 403
+        assert post("sensor-c").status_code == 401
+        assert post("sensor-b").status_code == 200
+        assert post(create_access_token({"sub": "2", "admin": True})).json()["stale"] == 1
+        client.portal.call(engine.dispose)
@@ -4,6 +4,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 import os
+import hmac
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -47,3 +48,31 @@ def verify_token(token: str):
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+def is_admin_token(token: str) -> bool:
+    """
+    Whether a valid token carries the admin claim. The claim is only issued at
+    login for users whose is_admin column is set, so it cannot be self-assigned.
+    """
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("admin") is True
+    except JWTError:
+        return False
+
+def verify_admin_token(token: str):
+    """Verify a token belongs to an admin using its claims only (no DB round trip)"""
+    user_id = verify_token(token)
+    if not is_admin_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user_id
+
+def is_device_token(token: str) -> bool:
+    """
+    Whether a bearer token is one of the sensor credentials in TELEMETRY_DEVICE_TOKENS
+    (comma-separated). Read per call so rotated credentials apply without a restart.
+    """
+    devices = [device.strip() for device in os.getenv("TELEMETRY_DEVICE_TOKENS", "").split(",") if device.strip()]
+    return any(hmac.compare_digest(token.encode(), device.encode()) for device in devices)
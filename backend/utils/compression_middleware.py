@@ -0,0 +1,150 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Bodies smaller than this are sent as-is; headers would eat most of the saving
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 500))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+# Server-Sent Events must reach the client one event at a time
+NEVER_COMPRESS_TYPES = ("text/event-stream",)
+
+def negotiate(accept_encoding: str, brotli_available: bool = BROTLI_AVAILABLE) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, or None for identity"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli_available else []) + ["gzip"]
+    best = max(candidates, key=lambda name: weights.get(name, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush, so a streamed chunk can be decoded on arrival"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing text and JSON responses with Brotli (when the
+    brotli package is installed) or gzip, as negotiated by Accept-Encoding.
+    Small bodies, already encoded responses and event streams pass through;
+    streamed bodies are compressed chunk by chunk instead of being buffered.
+    """
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+        enabled: bool = COMPRESSION_ENABLED,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        compressor: Optional[Compressor] = None
+        started = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, started
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compression pays off
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if not started:
+                started = True
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "").lower()
+                compressible = (
+                    content_type.startswith(COMPRESSIBLE_TYPES)
+                    and not content_type.startswith(NEVER_COMPRESS_TYPES)
+                    and "content-encoding" not in headers
+                    and start_message["status"] not in (204, 304)
+                )
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                if not compressible or encoding is None or (not more_body and len(body) < self.minimum_size):
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                # The compressed bytes differ, so a strong validator becomes weak
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if more_body:
+                    del headers["Content-Length"]
+                    data = compressor.chunk(body)
+                else:
+                    data = compressor.finish(body)
+                    headers["Content-Length"] = str(len(data))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            if compressor is None:
+                await send(message)
+                return
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
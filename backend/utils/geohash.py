@@ -0,0 +1,73 @@
+import math
+from typing import Set, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def encode(lat: float, lng: float, precision: int = 5) -> str:
+    """Standard geohash of a point"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        value, span = (lng, lng_range) if even else (lat, lat_range)
+        mid = (span[0] + span[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            span[0] = mid
+        else:
+            span[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            span = lng_range if even else lat_range
+            mid = (span[0] + span[1]) / 2
+            if value >> shift & 1:
+                span[0] = mid
+            else:
+                span[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of cells at this precision"""
+    lng_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+def covering(min_lat: float, max_lat: float, min_lng: float, max_lng: float, precision: int = 5) -> Set[str]:
+    """Geohash cells intersecting a bounding box"""
+    height, width = cell_size(precision)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+    cells = set()
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells.add(encode(lat, lng, precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + width, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return cells
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers"""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(a))
@@ -0,0 +1,59 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+# Loads starting this soon after an invalidation are not cached either: they may read a
+# replica that has not applied the change yet. Defaults to the replica lag bound when read
+# replicas are configured, and 0 when every read goes to the primary.
+INVALIDATION_GRACE_SECONDS = float(os.getenv(
+    "INVALIDATION_GRACE_SECONDS",
+    os.getenv("REPLICA_MAX_LAG_SECONDS", 5) if os.getenv("READ_DATABASE_URLS", "").strip() else 0,
+))
+
+class InvalidationClock:
+    """
+    Tells a cache whether a value it just loaded may still be stored. A load notes
+    `now()` before reading; `invalidated_since(keys, started)` is true if any of its
+    keys (cells, tags) was invalidated while the read was in flight, or less than
+    `grace_seconds` before it started. The value is then returned to its caller
+    without being cached. The first case covers slow reads; the grace covers reads
+    from a replica that may still lag behind the update, as long as the grace is
+    at least the replica lag bound.
+
+    The last `max_keys` invalidated keys are remembered; a load that started before a
+    forgotten invalidation (plus the grace) counts as invalidated.
+    """
+    def __init__(self, max_keys: int = 10000, grace_seconds: float = INVALIDATION_GRACE_SECONDS):
+        self.max_keys = max_keys
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        self._floor = float("-inf")
+        self._invalidated: "OrderedDict[str, float]" = OrderedDict()
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def invalidate(self, keys: Iterable[str]):
+        at = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._invalidated[key] = at
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.max_keys:
+                _, stamp = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, stamp)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._floor = time.monotonic()
+            self._invalidated.clear()
+
+    def invalidated_since(self, keys: Iterable[str], started: float) -> bool:
+        # Ties count as invalidated: the clock may not tick between an update and a load
+        since = started - self.grace_seconds
+        with self._lock:
+            if self._floor >= since:
+                return True
+            return any(self._invalidated.get(key, float("-inf")) >= since for key in keys)
@@ -0,0 +1,230 @@
+import os
+import hmac
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+QUERY_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+EXTERNAL_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A metric family in one worker; label values are given as keyword arguments"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += bucket_count
+                    le = _labels(self.labelnames, key, f'le="{_number(bound)}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+registry = Registry()
+
+def scrape_authorized(authorization: Optional[str]) -> bool:
+    """
+    Whether a GET /metrics request may read the registry. METRICS_TOKEN is read
+    per scrape, not at import, so a token from .env or a rotated secret applies;
+    unset leaves the endpoint open (e.g. behind a private network).
+    """
+    token = os.getenv("METRICS_TOKEN")
+    return not token or hmac.compare_digest((authorization or "").encode(), f"Bearer {token}".encode())
+
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served"
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template",
+    ("method", "route", "status")
+))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size as sent (after compression)",
+    ("method", "route"), SIZE_BUCKETS
+))
+db_queries_per_request = registry.register(Histogram(
+    "http_request_db_queries", "Database statements executed while serving a request",
+    ("method", "route"), QUERY_COUNT_BUCKETS
+))
+db_time_per_request = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in database statements while serving a request",
+    ("method", "route")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of single database statements",
+    ("operation",), QUERY_LATENCY_BUCKETS
+))
+external_call_duration = registry.register(Histogram(
+    "external_call_duration_seconds", "Duration of calls to external services (LLM, SerpAPI)",
+    ("service", "outcome"), EXTERNAL_LATENCY_BUCKETS
+))
+
+@dataclass
+class RequestStats:
+    """Work done on behalf of the current request, shared with its threads and tasks"""
+    request_id: str
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    external_calls: int = 0
+    external_seconds: float = 0.0
+    # Statement texts, collected only while a query budget is enforced
+    statements: Optional[List[str]] = None
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def current_request_id() -> Optional[str]:
+    stats = current_request.get()
+    return stats.request_id if stats is not None else None
+
+@contextmanager
+def track_external(service: str):
+    """Time an external call into external_call_duration_seconds and the current request"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        external_call_duration.observe(elapsed, service=service, outcome=outcome)
+        stats = current_request.get()
+        if stats is not None:
+            stats.external_calls += 1
+            stats.external_seconds += elapsed
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words and words[0].isalpha() else "OTHER"
+    db_query_duration.observe(elapsed, operation=operation)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append(statement)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+def track_queries():
+    """
+    Time every statement on every engine. The async engines run their statements
+    in greenlets and the sync routers in worker threads; both see the request's
+    context, so statements are attributed to the request that issued them.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
@@ -0,0 +1,84 @@
+import re
+import time
+import uuid
+import logging
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from utils.metrics import (
+    RequestStats, current_request, http_requests_in_flight, http_request_duration,
+    http_response_size, db_queries_per_request, db_time_per_request,
+)
+
+logger = logging.getLogger("smart_ecobin.access")
+
+# Client supplied ids are kept only if they look like ids, so they are safe to log and echo
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, response size, in-flight
+    requests and the database work of each request. Every request gets an id
+    (the client's X-Request-ID when valid) which is returned in X-Request-ID
+    and attached to every log record written while serving it.
+
+    Routes are labelled by their template (/api/bins/{bin_id}), never by the raw
+    path; requests that do not reach a route (404s, rate limited) are "unmatched".
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id", "")
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        stats = RequestStats(request_id)
+        token = current_request.set(stats)
+
+        status_code = 500
+        response_bytes = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            http_request_duration.observe(elapsed, method=method, route=route, status=status_code)
+            http_response_size.observe(response_bytes, method=method, route=route)
+            db_queries_per_request.observe(stats.db_queries, method=method, route=route)
+            db_time_per_request.observe(stats.db_seconds, method=method, route=route)
+            logger.info(
+                f"{method} {scope['path']} {status_code}",
+                extra={
+                    "method": method,
+                    "path": scope["path"],
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "response_bytes": response_bytes,
+                    "db_queries": stats.db_queries,
+                    "db_ms": round(stats.db_seconds * 1000, 2),
+                    "external_calls": stats.external_calls,
+                    "external_ms": round(stats.external_seconds * 1000, 2),
+                },
+            )
+            current_request.reset(token)
@@ -0,0 +1,39 @@
+from typing import Any, List, Optional, Sequence, Set, Type, Union
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Set[str]]:
+    """Field names from a comma-separated ?fields= value; None means all fields"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {sorted(unknown)}. Available: {list(model.model_fields)}"
+        )
+    return requested
+
+def shape(
+    items: Sequence[Any],
+    model: Type[BaseModel],
+    fields: Optional[Set[str]] = None,
+    layout: str = "rows",
+) -> Union[List[dict], dict]:
+    """
+    Serialize items (response models or ORM rows) as `model`, keeping only `fields`.
+    The "rows" layout is the usual list of objects; "columns" sends each field name
+    once with an array of values:
+    {"count": 2, "columns": {"id": [1, 2], "status": ["available", "full"]}}
+    """
+    names = [name for name in model.model_fields if fields is None or name in fields]
+    include = set(names)
+    rows = [
+        (item if isinstance(item, model) else model.model_validate(item)).model_dump(include=include)
+        for item in items
+    ]
+    if layout == "columns":
+        return {"count": len(rows), "columns": {name: [row[name] for row in rows] for name in names}}
+    return rows
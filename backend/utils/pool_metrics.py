@@ -0,0 +1,122 @@
+import time
+import logging
+import threading
+from typing import Dict, Any, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+class PoolMetrics:
+    """
+    Connection pool telemetry for one engine: checkout wait times, timeouts
+    and connection churn (connects, closes, invalidations).
+    """
+    def __init__(self, name: str, slow_checkout_ms: float = 100):
+        self.name = name
+        self.slow_checkout_ms = slow_checkout_ms
+        self._lock = threading.Lock()
+        self.engine: Engine = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, wait_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+            slow = wait_ms > self.slow_checkout_ms
+            if slow:
+                self.slow_checkouts += 1
+
+        if slow:
+            logger.warning(
+                f"Slow DB connection checkout on pool '{self.name}': {wait_ms:.1f}ms "
+                f"({self.pool.status() if self.pool else 'no pool'})"
+            )
+
+    @property
+    def pool(self) -> Pool:
+        return self.engine.pool if self.engine is not None else None
+
+    def _incr(self, attr: str):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def attach(self, engine: Engine):
+        """
+        Register pool event listeners for connection churn on the engine
+        """
+        self.engine = engine
+        event.listen(engine, "connect", lambda *_: self._incr("connects"))
+        event.listen(engine, "checkin", lambda *_: self._incr("checkins"))
+        event.listen(engine, "close", lambda *_: self._incr("closes"))
+        event.listen(engine, "invalidate", lambda *_: self._incr("invalidations"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self.pool
+        state: Dict[str, Any] = {"pool": self.name, "class": type(pool).__name__ if pool else None}
+        if isinstance(pool, QueuePool):
+            state.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout_seconds": pool.timeout(),
+            })
+
+        with self._lock:
+            state.update({
+                "checkouts_total": self.checkouts,
+                "checkins_total": self.checkins,
+                "connects_total": self.connects,
+                "closes_total": self.closes,
+                "invalidations_total": self.invalidations,
+                "timeouts_total": self.timeouts,
+                "slow_checkouts_total": self.slow_checkouts,
+                "slow_checkout_threshold_ms": self.slow_checkout_ms,
+                "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_histogram_ms": {
+                    **{f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                    "gt_max": self.wait_buckets[-1],
+                },
+            })
+        return state
+
+def instrumented_pool_class(base: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """
+    Subclass `base` so that every checkout is timed into `metrics`.
+    The metrics live on the class, so they survive pool.recreate() after engine.dispose().
+    """
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return base.connect(self)
+        except exc.TimeoutError:
+            metrics._incr("timeouts")
+            raise
+        finally:
+            metrics.record_wait((time.perf_counter() - start) * 1000)
+
+    return type(f"Instrumented{base.__name__}", (base,), {"connect": connect, "metrics": metrics})
@@ -0,0 +1,318 @@
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from utils.auth import is_admin_token
+
+logger = logging.getLogger(__name__)
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+# Fraction of requests profiled without being asked (0 = only on X-Profile from the admin)
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+# Requests profiled at once per worker; further requests run unprofiled
+PROFILER_MAX_CONCURRENT = int(os.getenv("PROFILER_MAX_CONCURRENT", 2))
+# Samples kept per request (about 10 s at the default interval)
+PROFILER_MAX_SAMPLES = int(os.getenv("PROFILER_MAX_SAMPLES", 2000))
+# Sampling of a request stops after this long even if it has fewer samples
+PROFILER_MAX_DURATION_S = float(os.getenv("PROFILER_MAX_DURATION_S", 30))
+# Finished profiles kept per worker, oldest dropped first
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", 50))
+MAX_STACK_DEPTH = 128
+
+# Streamed responses (SSE, bulk export) stay open for minutes and are never profiled
+EXCLUDED_PATHS = ("/api/instrumentation/profiles", "/api/bins/events", "/api/bins/export")
+
+AWAITING = ("[awaiting]", "", 0)
+
+# The loop -> running task map behind asyncio.current_task(); private, so it may be missing
+_current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+
+Frame = Tuple[str, str, int]
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+def await_chain(coro) -> list:
+    """Frames of a suspended coroutine and everything it awaits, outermost first"""
+    frames = []
+    while coro is not None and len(frames) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames
+
+def is_running(task, loop) -> bool:
+    """Whether `task` is the one executing on `loop` right now; safe to call from another thread"""
+    if isinstance(_current_tasks, dict):
+        return _current_tasks.get(loop) is task
+    # A task's outermost coroutine is running for the whole of each step of the task
+    root = task.get_coro()
+    return bool(getattr(root, "cr_running", None) or getattr(root, "gi_running", None))
+
+class Profile:
+    """
+    Stack samples of one request. While the request's task runs on the event loop
+    the loop thread's stack is sampled; while it is suspended, the chain of
+    coroutines it is awaiting is recorded instead, ending in an "[awaiting]" frame,
+    so the profile covers wall-clock time including I/O waits.
+    """
+    def __init__(
+        self,
+        profile_id: str,
+        method: str,
+        path: str,
+        trigger: str,
+        max_samples: int = PROFILER_MAX_SAMPLES,
+        max_duration_s: float = PROFILER_MAX_DURATION_S,
+    ):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.max_samples = max_samples
+        self.max_duration_s = max_duration_s
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = datetime.utcnow()
+        self.duration_ms: Optional[float] = None
+        self.truncated = False
+        self.frames: List[Frame] = []
+        self._frame_index: Dict[Frame, int] = {}
+        # (stack of frame indices, root first; milliseconds since the previous sample)
+        self.samples: List[Tuple[Tuple[int, ...], float]] = []
+        self._task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._start = self._last = time.perf_counter()
+
+    def _index(self, key: Frame) -> int:
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append(key)
+        return index
+
+    def sample(self, thread_frames: Dict[int, object]):
+        """Record one sample; called from the sampler thread. Sets `truncated` once full."""
+        now = time.perf_counter()
+        weight, self._last = (now - self._last) * 1000, now
+        if len(self.samples) >= self.max_samples or now - self._start > self.max_duration_s:
+            self.truncated = True
+            return
+        task = self._task
+        if task is None or task.done():
+            return
+
+        root = task.get_coro()
+        if is_running(task, self._loop):
+            # Running: walk the loop thread's stack up to the task's outermost coroutine
+            keys = []
+            frame = thread_frames.get(self._thread_id)
+            root_frame = getattr(root, "cr_frame", None)
+            while frame is not None and len(keys) < MAX_STACK_DEPTH:
+                keys.append(_frame_key(frame))
+                if frame is root_frame:
+                    break
+                frame = frame.f_back
+            else:
+                # The loop switched tasks between reading its stack and its current task
+                return
+            keys.reverse()
+        else:
+            keys = [_frame_key(frame) for frame in await_chain(root)]
+            keys.append(AWAITING)
+        if keys:
+            self.samples.append((tuple(self._index(key) for key in keys), weight))
+
+    def finish(self, route: Optional[str], status: Optional[int]):
+        self.route = route
+        self.status = status
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+        self._task = None
+
+    def _label(self, index: int) -> str:
+        name, filename, line = self.frames[index]
+        if not filename:
+            return name
+        return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+    def collapsed(self) -> str:
+        """Folded stacks ("root;child;leaf count" per line) for flamegraph.pl and similar tools"""
+        counts = Counter(stack for stack, _ in self.samples)
+        return "".join(
+            ";".join(self._label(index) for index in stack) + f" {count}\n"
+            for stack, count in counts.most_common()
+        )
+
+    def speedscope(self) -> dict:
+        """The profile in speedscope's file format (https://www.speedscope.app)"""
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.route or self.path}",
+            "exporter": "smart-ecobin",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [
+                {"name": name, "file": filename, "line": line} if filename else {"name": name}
+                for name, filename, line in self.frames
+            ]},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{self.method} {self.path} ({self.id})",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": self.duration_ms or 0,
+                "samples": [list(stack) for stack, _ in self.samples],
+                "weights": [round(weight, 3) for _, weight in self.samples],
+            }],
+        }
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "samples": len(self.samples),
+            "truncated": self.truncated,
+        }
+
+class Sampler:
+    """
+    One daemon thread per worker that samples every active profile each interval.
+    It only runs while at least one request is being profiled.
+    """
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._active: Dict[str, Profile] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def start(self, profile: Profile):
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile):
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                profiles = list(self._active.values())
+            thread_frames = sys._current_frames()
+            for profile in profiles:
+                try:
+                    profile.sample(thread_frames)
+                except Exception as e:
+                    # Stacks are read while the loop mutates them; skip an inconsistent sample
+                    logger.debug(f"Profiler sample skipped: {e!r}")
+                if profile.truncated:
+                    # Full: stop sampling it and free its slot while the request carries on
+                    self.stop(profile)
+            del thread_frames
+            time.sleep(self.interval)
+
+class ProfileStore:
+    def __init__(self, max_profiles: int = PROFILER_MAX_PROFILES):
+        self._profiles: Deque[Profile] = deque(maxlen=max_profiles)
+
+    def add(self, profile: Profile):
+        self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def list(self) -> List[dict]:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+sampler = Sampler()
+profile_store = ProfileStore()
+
+def is_admin_request(headers: Headers) -> bool:
+    auth = headers.get("authorization", "")
+    return auth.lower().startswith("bearer ") and is_admin_token(auth[7:])
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling selected requests with the stack sampler.
+    A request is profiled when the admin sends `X-Profile: 1`, or at random for
+    PROFILER_SAMPLE_RATE of requests, as long as fewer than PROFILER_MAX_CONCURRENT
+    are being profiled; streamed responses (EXCLUDED_PATHS) never are. Profiled
+    responses carry X-Profile-Id, a random id chosen here rather than the
+    client-supplied request id; the profiles are served under
+    /api/instrumentation/profiles. Disabled unless PROFILER_ENABLED.
+    """
+    def __init__(
+        self,
+        app,
+        enabled: bool = PROFILER_ENABLED,
+        sample_rate: float = PROFILER_SAMPLE_RATE,
+        max_concurrent: int = PROFILER_MAX_CONCURRENT,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_concurrent = max_concurrent
+
+    def trigger(self, scope) -> Optional[str]:
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") == "1" and is_admin_request(headers):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        trigger = self.trigger(scope)
+        if trigger is None or sampler.active >= self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(uuid.uuid4().hex, scope["method"], scope["path"], trigger)
+        status_code = None
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile.id
+            await send(message)
+
+        sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop(profile)
+            profile.finish(getattr(scope.get("route"), "path", None), status_code)
+            profile_store.add(profile)
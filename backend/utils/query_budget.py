@@ -0,0 +1,147 @@
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from utils.metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
+# "off", "warn" (log over-budget routes) or "raise" (fail the request; for test runs)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE") or ("warn" if ENVIRONMENT == "development" else "off")
+# Statements a route may run per request unless listed in ROUTE_QUERY_BUDGETS
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", 20))
+# The same statement shape run more often than this in one request is an N+1 pattern
+QUERY_BUDGET_MAX_REPEATS = int(os.getenv("QUERY_BUDGET_MAX_REPEATS", 5))
+
+# Per-route budgets keyed by "METHOD /route/template"; None exempts the route
+ROUTE_QUERY_BUDGETS: Dict[str, Optional[int]] = {
+    # Bulk ingestion writes in batches, so its statement count grows with the upload
+    "POST /api/bins/import": None,
+    "POST /api/bins/telemetry": None,
+    "POST /api/disposals/batch": None,
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def fingerprint(statement: str) -> str:
+    """
+    The shape of a statement: literals and placeholders become ?, IN lists of any
+    length collapse to (?), and whitespace is normalised. Statements that differ only
+    in their parameters share a fingerprint.
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+def check(statements: List[str], max_queries: Optional[int], max_repeats: Optional[int]) -> List[str]:
+    """Reasons the statements break the budget; empty when they are within it"""
+    problems = []
+    if max_queries is not None and len(statements) > max_queries:
+        problems.append(f"{len(statements)} statements (budget {max_queries})")
+    if max_repeats is not None:
+        for shape, count in Counter(fingerprint(statement) for statement in statements).most_common():
+            if count <= max_repeats:
+                break
+            problems.append(f"{count}x (limit {max_repeats}): {shape}")
+    return problems
+
+class QueryLog:
+    """
+    Records the statements run on any engine, from any thread, while active.
+    For tests and benchmarks; in the app, requests are accounted per request instead.
+    """
+    def __init__(self):
+        self.statements: List[str] = []
+        self._listener = lambda conn, cursor, statement, *args: self.statements.append(statement)
+
+    def __enter__(self) -> "QueryLog":
+        event.listen(Engine, "after_cursor_execute", self._listener)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(Engine, "after_cursor_execute", self._listener)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def fingerprints(self) -> Counter:
+        return Counter(fingerprint(statement) for statement in self.statements)
+
+    def check(self, max_queries: Optional[int] = None, max_repeats: Optional[int] = None) -> List[str]:
+        return check(self.statements, max_queries, max_repeats)
+
+    def report(self) -> str:
+        return "\n".join(f"  {count}x {shape}" for shape, count in self.fingerprints().most_common())
+
+class QueryBudgetMiddleware:
+    """
+    Development/test ASGI middleware enforcing per-route statement budgets.
+    Relies on MetricsMiddleware (which must wrap it) for per-request statement
+    accounting. Responses carry X-Query-Count. Over-budget requests are logged
+    with their repeated statement shapes, or raise QueryBudgetExceeded in
+    "raise" mode, which fails the request in test clients.
+    """
+    def __init__(
+        self,
+        app,
+        mode: str = QUERY_BUDGET_MODE,
+        default_budget: Optional[int] = QUERY_BUDGET_DEFAULT,
+        max_repeats: Optional[int] = QUERY_BUDGET_MAX_REPEATS,
+        route_budgets: Optional[Dict[str, Optional[int]]] = None,
+    ):
+        self.app = app
+        self.mode = mode
+        self.default_budget = default_budget
+        self.max_repeats = max_repeats
+        self.route_budgets = ROUTE_QUERY_BUDGETS if route_budgets is None else route_budgets
+
+    async def __call__(self, scope, receive, send):
+        stats = current_request.get()
+        if self.mode == "off" or scope["type"] != "http" or stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        stats.statements = []
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Query-Count"] = str(len(stats.statements))
+            await send(message)
+
+        await self.app(scope, receive, send_with_count)
+
+        route = getattr(scope.get("route"), "path", None)
+        if route is None:
+            return
+        key = f"{scope['method']} {route}"
+        if key in self.route_budgets:
+            budget = self.route_budgets[key]
+            if budget is None:
+                return
+        else:
+            budget = self.default_budget
+
+        problems = check(stats.statements, budget, self.max_repeats)
+        if not problems:
+            return
+        message = f"Query budget exceeded on {key}: " + "; ".join(problems)
+        if self.mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={"route": route, "db_queries": len(stats.statements)})
@@ -0,0 +1,127 @@
+import os
+import re
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from fastapi import Request
+from jose import JWTError, jwt
+
+from utils.auth import SECRET_KEY, ALGORITHM
+from utils.rate_limiter import rate_limiter, get_client_ip, RateLimitResult
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """
+    A rate limit bucket. Every matching request consumes `cost` units out of
+    `limit` units per `window_seconds`, keyed per user ("user") or per client IP ("ip").
+    Requests without a valid bearer token fall back to the IP key.
+    """
+    name: str
+    limit: int
+    window_seconds: int
+    cost: int = 1
+    key: str = "ip"
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    method: str  # HTTP method or "*"
+    path: str  # regular expression matched against the request path
+    policy: Optional[RatePolicy]  # None exempts the route
+
+# First match wins
+ROUTE_POLICIES: List[RoutePolicy] = [
+    RoutePolicy("*", r"^/(api/)?health$", None),
+    RoutePolicy("*", r"^/(docs|redoc|openapi\.json)", None),
+    RoutePolicy("GET", r"^/metrics$", None),
+    RoutePolicy("POST", r"^/auth/(login|register)$", RatePolicy("auth", limit=20, window_seconds=60)),
+    RoutePolicy("POST", r"^/api/waste/detect$", RatePolicy("detect", limit=60, window_seconds=60, cost=6, key="user")),
+    RoutePolicy("GET", r"^/api/analytics/leaderboard$", RatePolicy("leaderboard", limit=30, window_seconds=60, key="user")),
+    RoutePolicy("POST", r"^/api/location/geocode$", RatePolicy("location", limit=30, window_seconds=60, cost=2, key="user")),
+    RoutePolicy("*", r"^/api/location/search", RatePolicy("location", limit=30, window_seconds=60, key="user")),
+    RoutePolicy("GET", r"^/api/location/nearby-bins$", RatePolicy("location", limit=30, window_seconds=60, key="user")),
+    RoutePolicy("*", r"^/", RatePolicy("default", limit=300, window_seconds=60)),
+]
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware applying ROUTE_POLICIES before the request body is read.
+    Rejected requests get a 429 without touching routing, auth or the database.
+    Every limited response carries RateLimit-* headers.
+    """
+    def __init__(self, app, policies: Optional[List[RoutePolicy]] = None, limiter=None, enabled: Optional[bool] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.policies: List[Tuple[str, re.Pattern, Optional[RatePolicy]]] = [
+            (p.method, re.compile(p.path), p.policy) for p in (policies or ROUTE_POLICIES)
+        ]
+        if enabled is None:
+            enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+
+    def match(self, method: str, path: str) -> Optional[RatePolicy]:
+        for policy_method, pattern, policy in self.policies:
+            if policy_method in ("*", method) and pattern.match(path):
+                return policy
+        return None
+
+    def client_key(self, request: Request, policy: RatePolicy) -> str:
+        if policy.key == "user":
+            auth = request.headers.get("Authorization", "")
+            if auth.lower().startswith("bearer "):
+                try:
+                    payload = jwt.decode(auth[7:], SECRET_KEY, algorithms=[ALGORITHM])
+                    if payload.get("sub"):
+                        return f"user:{payload['sub']}"
+                except JWTError:
+                    pass
+        return f"ip:{get_client_ip(request)}"
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.match(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        key = f"rl:{policy.name}:{self.client_key(request, policy)}"
+        result = await self.limiter.hit(key, policy.limit, policy.window_seconds, policy.cost)
+        headers = rate_limit_headers(policy, result)
+
+        if not result.allowed:
+            retry_after = str(max(int(result.reset_after + 0.999), 1))
+            body = json.dumps({"detail": "Too many requests. Please try again later."}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", retry_after.encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+def rate_limit_headers(policy: RatePolicy, result: RateLimitResult) -> List[Tuple[bytes, bytes]]:
+    """
+    Build the IETF draft RateLimit-* response headers
+    """
+    return [
+        (b"ratelimit-limit", str(result.limit).encode()),
+        (b"ratelimit-remaining", str(result.remaining).encode()),
+        (b"ratelimit-reset", str(int(result.reset_after + 0.999)).encode()),
+        (b"ratelimit-policy", f"{policy.limit};w={policy.window_seconds}".encode()),
+    ]
@@ -1,69 +1,216 @@
 import time
-from typing import Dict, Optional
-from collections import defaultdict, deque
-import asyncio
+import uuid
+import logging
+import threading
+from typing import Optional, NamedTuple
+from collections import OrderedDict, deque
 from fastapi import HTTPException, Request
 import redis
+import redis.asyncio as aioredis
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-class InMemoryRateLimiter:
+logger = logging.getLogger(__name__)
+
+class RateLimitResult(NamedTuple):
     """
-    In-memory rate limiter for development/small scale production
+    Outcome of a single rate limit check
+    """
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the next request would be allowed
+
+class _WindowCounter:
     """
+    Sliding-window counter: the current and previous fixed windows are kept as
+    two integers, and the sliding count is estimated by weighting the previous
+    window by how much of it still overlaps. Constant memory per key.
+    """
+    __slots__ = ("window", "window_start", "current", "previous")
+    
+    def __init__(self, window: float, now: float):
+        self.window = window
+        self.window_start = now - (now % window)
+        self.current = 0
+        self.previous = 0
+    
+    def roll(self, now: float):
+        elapsed = now - self.window_start
+        if elapsed < self.window:
+            return
+        periods = int(elapsed // self.window)
+        self.previous = self.current if periods == 1 else 0
+        self.current = 0
+        self.window_start += periods * self.window
+    
+    def estimate(self, now: float) -> float:
+        overlap = 1 - (now - self.window_start) / self.window
+        return self.previous * overlap + self.current
+    
+    def expired(self, now: float) -> bool:
+        return now >= self.window_start + 2 * self.window
+
+class _AttemptLog:
+    """
+    Times of the latest failed login attempts for one key, oldest first. At most
+    `max_entries` are kept, so a brute-force run cannot grow it.
+    """
+    __slots__ = ("retention", "times")
+    
+    def __init__(self, retention: float, max_entries: int = 100):
+        self.retention = retention
+        self.times: deque = deque(maxlen=max_entries)
+    
+    def count_since(self, start: float) -> int:
+        return sum(1 for t in self.times if t > start)
+    
+    def expired(self, now: float) -> bool:
+        return not self.times or now >= self.times[-1] + self.retention
+
+class _Shard:
+    __slots__ = ("lock", "entries")
+    
     def __init__(self):
-        self.requests: Dict[str, deque] = defaultdict(deque)
-        self.failed_attempts: Dict[str, deque] = defaultdict(deque)
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, _WindowCounter]" = OrderedDict()
+
+class InMemoryRateLimiter:
+    """
+    In-memory rate limiter for development/small scale production.
+    Keys live in lock-striped shards of bounded size: least recently used keys
+    are evicted when a shard is full and a background sweeper drops expired
+    windows, so memory stays flat no matter how many clients are seen.
+    """
+    lockout_seconds = 15 * 60
     
-    def is_rate_limited(self, key: str, max_requests: int, window_seconds: int) -> bool:
+    def __init__(self, max_keys: Optional[int] = None, shards: int = 64, sweep_interval: float = 60):
+        max_keys = max_keys or int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", 100_000))
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self.sweep_interval = sweep_interval
+        self._shards = [_Shard() for _ in range(shards)]
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+    
+    def _ensure_sweeper(self):
+        if self._sweeper is None and self.sweep_interval:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="rate-limit-sweeper", daemon=True)
+            self._sweeper.start()
+    
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+    
+    def sweep(self, now: Optional[float] = None) -> int:
         """
-        Check if a key is rate limited
+        Remove expired windows from every shard, returns the number removed
+        """
+        now = now or time.time()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired = [key for key, entry in shard.entries.items() if entry.expired(now)]
+                for key in expired:
+                    del shard.entries[key]
+                removed += len(expired)
+        return removed
+    
+    def close(self):
+        """
+        Stop the background sweeper
+        """
+        self._stop.set()
+    
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+    
+    def _store(self, shard: _Shard, key: str, entry):
         """
+        Save an entry as the most recently used, evicting the least recently used
+        one when the shard is full; the caller holds the shard lock
+        """
+        shard.entries[key] = entry
+        shard.entries.move_to_end(key)
+        if len(shard.entries) > self.max_keys_per_shard:
+            shard.entries.popitem(last=False)
+    
+    def hit(self, key: str, max_requests: int, window_seconds: int, cost: int = 1) -> RateLimitResult:
+        """
+        Record a weighted request and report the remaining budget
+        """
+        self._ensure_sweeper()
         now = time.time()
-        window_start = now - window_seconds
-        
-        # Clean old requests
-        while self.requests[key] and self.requests[key][0] < window_start:
-            self.requests[key].popleft()
+        shard = self._shard(key)
         
-        # Check if limit exceeded
-        if len(self.requests[key]) >= max_requests:
-            return True
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None or entry.window != window_seconds:
+                entry = _WindowCounter(window_seconds, now)
+            else:
+                entry.roll(now)
+            
+            used = entry.estimate(now)
+            allowed = used + cost <= max_requests
+            if allowed:
+                entry.current += cost
+                used += cost
+                self._store(shard, key, entry)
+            
+            reset_after = entry.window_start + window_seconds - now
         
-        # Add current request
-        self.requests[key].append(now)
-        return False
+        return RateLimitResult(allowed, max_requests, max(int(max_requests - used), 0), max(reset_after, 0.0))
+    
+    def is_rate_limited(self, key: str, max_requests: int, window_seconds: int) -> bool:
+        """
+        Check if a key is rate limited
+        """
+        return not self.hit(key, max_requests, window_seconds).allowed
     
     def add_failed_attempt(self, key: str):
         """
-        Add a failed login attempt
+        Add a failed login attempt, remembered for lockout_seconds
         """
+        self._ensure_sweeper()
         now = time.time()
-        self.failed_attempts[key].append(now)
+        failed_key = f"failed:{key}"
+        shard = self._shard(failed_key)
+        
+        with shard.lock:
+            entry = shard.entries.get(failed_key)
+            if not isinstance(entry, _AttemptLog):
+                entry = _AttemptLog(self.lockout_seconds)
+            entry.times.append(now)
+            self._store(shard, failed_key, entry)
     
     def is_account_locked(self, key: str, max_attempts: int = 5, lockout_minutes: int = 15) -> bool:
         """
-        Check if account is locked due to failed attempts
+        Check if account is locked due to failed attempts in the last lockout_minutes
+        (at most lockout_seconds, how long attempts are kept, as in Redis)
         """
-        now = time.time()
-        window_start = now - (lockout_minutes * 60)
-        
-        # Clean old attempts
-        while self.failed_attempts[key] and self.failed_attempts[key][0] < window_start:
-            self.failed_attempts[key].popleft()
+        start = time.time() - min(lockout_minutes * 60, self.lockout_seconds)
+        failed_key = f"failed:{key}"
+        shard = self._shard(failed_key)
         
-        return len(self.failed_attempts[key]) >= max_attempts
+        # Lookups never create entries
+        with shard.lock:
+            entry = shard.entries.get(failed_key)
+            if not isinstance(entry, _AttemptLog):
+                return False
+            return entry.count_since(start) >= max_attempts
 
 class RedisRateLimiter:
     """
     Redis-based rate limiter for production
     """
-    def __init__(self):
+    def __init__(self, client=None):
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
         try:
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            self.redis_client = client or redis.from_url(redis_url, decode_responses=True)
             self.redis_client.ping()
             self.available = True
         except:
@@ -119,8 +266,165 @@ class RedisRateLimiter:
         except:
             return self.fallback.is_account_locked(key, max_attempts, lockout_minutes)
 
+# Sliding log: one sorted-set member per request, scored by Redis server time.
+# Trimming, counting and inserting happen in a single atomic script call, so
+# concurrent workers can never both take the last slot in the window.
+SLIDING_LOG_SCRIPT = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local token = ARGV[4]
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+local allowed = 0
+if count + cost <= limit then
+    for i = 1, cost do
+        redis.call('ZADD', key, now, token .. ':' .. i)
+    end
+    count = count + cost
+    allowed = 1
+end
+redis.call('PEXPIRE', key, window)
+
+local reset = 0
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, limit - count, reset}
+"""
+
+# GCRA (generic cell rate algorithm): token-bucket semantics stored as a single
+# "theoretical arrival time" per key, so each check is O(1) in time and memory.
+GCRA_SCRIPT = """
+local key = KEYS[1]
+local period = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local interval = period / limit
+local tat = tonumber(redis.call('GET', key) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval * cost
+local allow_at = new_tat - period
+if allow_at > now then
+    local remaining = math.floor((now + period - tat) / interval)
+    if remaining < 0 then
+        remaining = 0
+    end
+    return {0, remaining, math.ceil(allow_at - now)}
+end
+
+redis.call('SET', key, math.ceil(new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now + period - new_tat) / interval), 0}
+"""
+
+class AsyncRedisRateLimiter:
+    """
+    Atomic, non-blocking Redis rate limiter.
+    Each check is a single EVALSHA round trip on an asyncio client.
+    Supported algorithms: "sliding_log" (exact) and "gcra" (token bucket).
+    """
+    def __init__(self, redis_url: Optional[str] = None, algorithm: Optional[str] = None, client=None):
+        redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.algorithm = algorithm or os.getenv("RATE_LIMIT_ALGORITHM", "sliding_log")
+        if self.algorithm not in ("sliding_log", "gcra"):
+            raise ValueError(f"Unknown rate limit algorithm: {self.algorithm}")
+        
+        self.redis_client = client or aioredis.from_url(redis_url, decode_responses=True)
+        self.fallback = InMemoryRateLimiter()
+        self.retry_interval = 30  # seconds to stay on the fallback after a Redis error
+        self._unavailable_until = 0.0
+        
+        script = SLIDING_LOG_SCRIPT if self.algorithm == "sliding_log" else GCRA_SCRIPT
+        self._script = self.redis_client.register_script(script)
+    
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._unavailable_until
+    
+    def _mark_unavailable(self, error: Exception):
+        logger.warning(f"Redis rate limiter unavailable, using in-memory fallback: {error}")
+        self._unavailable_until = time.monotonic() + self.retry_interval
+    
+    async def hit(self, key: str, max_requests: int, window_seconds: int, cost: int = 1) -> RateLimitResult:
+        """
+        Atomically record a (weighted) request and return the remaining budget
+        """
+        if not self.available:
+            return self.fallback.hit(key, max_requests, window_seconds, cost)
+        
+        window_ms = int(window_seconds * 1000)
+        if self.algorithm == "sliding_log":
+            args = [window_ms, max_requests, cost, uuid.uuid4().hex]
+        else:
+            args = [window_ms, max_requests, cost]
+        
+        try:
+            allowed, remaining, reset_ms = await self._script(keys=[key], args=args)
+        except Exception as e:
+            self._mark_unavailable(e)
+            return self.fallback.hit(key, max_requests, window_seconds, cost)
+        
+        return RateLimitResult(bool(allowed), max_requests, max(int(remaining), 0), max(int(reset_ms), 0) / 1000)
+    
+    async def is_rate_limited(self, key: str, max_requests: int, window_seconds: int) -> bool:
+        """
+        Check if a key is rate limited using Redis
+        """
+        result = await self.hit(key, max_requests, window_seconds)
+        return not result.allowed
+    
+    async def add_failed_attempt(self, key: str):
+        """
+        Add a failed login attempt
+        """
+        if not self.available:
+            return self.fallback.add_failed_attempt(key)
+        
+        try:
+            now = time.time()
+            failed_key = f"failed:{key}"
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.zadd(failed_key, {f"{now}:{uuid.uuid4().hex}": now})
+                pipe.expire(failed_key, 900)  # 15 minutes
+                await pipe.execute()
+        except Exception as e:
+            self._mark_unavailable(e)
+            self.fallback.add_failed_attempt(key)
+    
+    async def is_account_locked(self, key: str, max_attempts: int = 5, lockout_minutes: int = 15) -> bool:
+        """
+        Check if account is locked due to failed attempts
+        """
+        if not self.available:
+            return self.fallback.is_account_locked(key, max_attempts, lockout_minutes)
+        
+        try:
+            failed_key = f"failed:{key}"
+            window_start = time.time() - (lockout_minutes * 60)
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.zremrangebyscore(failed_key, 0, window_start)
+                pipe.zcard(failed_key)
+                _, count = await pipe.execute()
+            return count >= max_attempts
+        except Exception as e:
+            self._mark_unavailable(e)
+            return self.fallback.is_account_locked(key, max_attempts, lockout_minutes)
+
 # Global rate limiter instance
-rate_limiter = RedisRateLimiter()
+rate_limiter = AsyncRedisRateLimiter()
 
 def get_client_ip(request: Request) -> str:
     """
@@ -143,7 +447,7 @@ async def check_rate_limit(request: Request, max_requests: int = 60, window_seco
     client_ip = get_client_ip(request)
     key = f"rate_limit:{client_ip}"
     
-    if rate_limiter.is_rate_limited(key, max_requests, window_seconds):
+    if await rate_limiter.is_rate_limited(key, max_requests, window_seconds):
         raise HTTPException(
             status_code=429,
             detail="Too many requests. Please try again later.",
@@ -158,21 +462,21 @@ async def check_auth_rate_limit(request: Request, email: str):
     
     # Check IP-based rate limiting (stricter for auth)
     ip_key = f"auth_rate_limit:{client_ip}"
-    if rate_limiter.is_rate_limited(ip_key, 10, 300):  # 10 attempts per 5 minutes per IP
+    if await rate_limiter.is_rate_limited(ip_key, 10, 300):  # 10 attempts per 5 minutes per IP
         raise HTTPException(
             status_code=429,
             detail="Too many authentication attempts from this IP. Please try again later."
         )
     
     # Check account lockout
-    if rate_limiter.is_account_locked(email):
+    if await rate_limiter.is_account_locked(email):
         raise HTTPException(
             status_code=423,
             detail="Account temporarily locked due to multiple failed login attempts. Please try again in 15 minutes."
         )
 
-def record_failed_login(email: str):
+async def record_failed_login(email: str):
     """
     Record a failed login attempt
     """
-    rate_limiter.add_failed_attempt(email)
+    await rate_limiter.add_failed_attempt(email)
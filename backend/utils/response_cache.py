@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+
+import orjson
+import redis.asyncio as aioredis
+from fastapi import Request, Response
+from pydantic_core import to_jsonable_python
+
+from utils.invalidation import InvalidationClock
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+# "memory" keeps entries per worker; "redis" adds a shared tier behind the local LRU
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2048))
+REDIS_KEY_PREFIX = "smart-ecobin:response-cache:"
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "expires_at", "tags")
+
+    def __init__(self, body: bytes, etag: str, expires_at: float, tags: Tuple[str, ...]):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+        self.tags = tags
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag: identical bytes, identical tag"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires; compressed responses carry W/ tags"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+
+class ResponseCache:
+    """
+    Serialized JSON responses keyed by route and query string, with per-route TTLs
+    and tag-based invalidation. An in-process LRU sits in front of an optional Redis tier.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, backend: str = RESPONSE_CACHE_BACKEND,
+                 redis_url: Optional[str] = None, enabled: bool = RESPONSE_CACHE_ENABLED):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown response cache backend: {backend}")
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.invalidations = InvalidationClock()
+        self.redis_client = None
+        if backend == "redis":
+            self.redis_client = aioredis.from_url(
+                redis_url or os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True
+            )
+        self.retry_interval = 30  # seconds to skip Redis after an error
+        self._redis_unavailable_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stale_loads = 0
+
+    @property
+    def redis_available(self) -> bool:
+        return self.redis_client is not None and time.monotonic() >= self._redis_unavailable_until
+
+    def _redis_failed(self, error: Exception):
+        logger.warning(f"Redis response cache unavailable, using local cache only: {error}")
+        self._redis_unavailable_until = time.monotonic() + self.retry_interval
+
+    def _get_local(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._get_local(key)
+        if entry is not None or not self.redis_available:
+            return entry
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(REDIS_KEY_PREFIX + key)
+                pipe.pttl(REDIS_KEY_PREFIX + key)
+                raw, ttl_ms = await pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        if raw is None or ttl_ms <= 0:
+            return None
+        data = json.loads(raw)
+        entry = CachedResponse(data["body"].encode(), data["etag"], time.monotonic() + ttl_ms / 1000, tuple(data["tags"]))
+        self._set_local(key, entry)
+        return entry
+
+    async def set(self, key: str, body: bytes, ttl: float, tags: Iterable[str] = (),
+                  started: Optional[float] = None) -> CachedResponse:
+        """
+        Store a response. Pass `started` (invalidations.now() taken before building
+        it) to skip storing when one of its tags was invalidated in the meantime, or
+        just before (see InvalidationClock).
+        """
+        entry = CachedResponse(body, make_etag(body), time.monotonic() + ttl, tuple(tags))
+        if started is not None and self.invalidations.invalidated_since(entry.tags, started):
+            self.stale_loads += 1
+            return entry
+        self._set_local(key, entry)
+        if self.redis_available:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.set(REDIS_KEY_PREFIX + key, json.dumps({
+                        "body": body.decode(), "etag": entry.etag, "tags": list(entry.tags),
+                    }), px=int(ttl * 1000))
+                    for tag in entry.tags:
+                        pipe.sadd(f"{REDIS_KEY_PREFIX}tag:{tag}", key)
+                        pipe.expire(f"{REDIS_KEY_PREFIX}tag:{tag}", 86400)
+                    await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+        return entry
+
+    def invalidate_local(self, *tags: str):
+        self.invalidations.invalidate(tags)
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if set(entry.tags) & set(tags)]:
+                del self._entries[key]
+
+    async def invalidate(self, *tags: str):
+        """Drop every entry carrying any of the tags, here and in Redis"""
+        self.invalidate_local(*tags)
+        if self.redis_available:
+            try:
+                for tag in tags:
+                    tag_key = f"{REDIS_KEY_PREFIX}tag:{tag}"
+                    keys = await self.redis_client.smembers(tag_key)
+                    await self.redis_client.delete(tag_key, *[REDIS_KEY_PREFIX + key for key in keys])
+            except Exception as e:
+                self._redis_failed(e)
+
+    def clear(self):
+        self.invalidations.invalidate_all()
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "stale_loads": self.stale_loads,
+            "redis": self.redis_client is not None,
+        }
+
+response_cache = ResponseCache()
+
+def cache_key(request: Request, route: str) -> str:
+    """Route name plus the sorted query string, so parameter order does not matter"""
+    return f"{route}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+async def cached_json(
+    request: Request,
+    route: str,
+    producer: Callable[[], Awaitable[Any]],
+    ttl: float,
+    tags: Iterable[str] = (),
+    max_age: int = 0,
+    private: bool = False,
+) -> Response:
+    """
+    Serve a JSON response from the cache, building it with `producer` on a miss.
+    Call this inside the endpoint (after any auth) so dependencies still run.
+    Sends a strong ETag and answers a matching If-None-Match with 304.
+    A response whose tags are invalidated while it is being built is served but not cached.
+    """
+    headers = {"Cache-Control": f"{'private' if private else 'public'}, max-age={max_age}, must-revalidate"}
+    key = cache_key(request, route)
+    entry = await response_cache.get(key) if response_cache.enabled else None
+
+    if entry is None:
+        response_cache.misses += 1
+        started = response_cache.invalidations.now()
+        # orjson handles dicts, lists and datetimes natively; pydantic models go through pydantic-core
+        body = orjson.dumps(await producer(), default=to_jsonable_python)
+        if response_cache.enabled:
+            entry = await response_cache.set(key, body, ttl, tags, started=started)
+        else:
+            entry = CachedResponse(body, make_etag(body), 0, tuple(tags))
+    else:
+        response_cache.hits += 1
+
+    headers["ETag"] = entry.etag
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls with the same key share one in-flight
+    computation instead of each running it.
+
+    The computation runs as its own task, so a caller that is cancelled (for
+    example a client disconnecting) does not cancel it for the others. Results
+    are not kept once the call finishes; put a cache in front for that. The
+    function should open its own database session rather than borrow the
+    caller's, since the caller may go away before it finishes.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+        groups.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the error as retrieved if every caller was cancelled before it arrived
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": self.in_flight}
+
+groups: List[SingleFlight] = []
+
+def stats() -> Dict[str, dict]:
+    return {group.name: group.stats() for group in groups}
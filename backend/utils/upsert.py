@@ -0,0 +1,66 @@
+from typing import Iterable, List, Union
+
+from sqlalchemy import Table, func, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+def upsert(
+    dialect_name: str,
+    table: Table,
+    rows: Union[dict, List[dict]],
+    index_elements: Iterable[str],
+    set_columns: Iterable[str] = (),
+    increment_columns: Iterable[str] = (),
+    least_columns: Iterable[str] = (),
+    greatest_columns: Iterable[str] = (),
+):
+    """
+    Build a single-statement INSERT ... ON DUPLICATE KEY / ON CONFLICT upsert.
+    On conflict with `index_elements` (a unique key), `set_columns` take the new
+    value, `increment_columns` are atomically added to the stored value and
+    `least_columns` / `greatest_columns` keep the smaller / larger of the two.
+    """
+    if dialect_name == "mysql":
+        stmt = mysql_insert(table).values(rows)
+        new = stmt.inserted
+    elif dialect_name in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+        stmt = insert(table).values(rows)
+        new = stmt.excluded
+    else:
+        raise NotImplementedError(f"Upsert is not supported for dialect '{dialect_name}'")
+
+    updates = {column: new[column] for column in set_columns}
+    updates.update({
+        column: func.coalesce(table.c[column], 0) + new[column]
+        for column in increment_columns
+    })
+    # SQLite spells LEAST/GREATEST as the multi-argument min()/max()
+    least = func.min if dialect_name == "sqlite" else func.least
+    greatest = func.max if dialect_name == "sqlite" else func.greatest
+    updates.update({
+        column: least(func.coalesce(table.c[column], new[column]), new[column])
+        for column in least_columns
+    })
+    updates.update({
+        column: greatest(func.coalesce(table.c[column], new[column]), new[column])
+        for column in greatest_columns
+    })
+
+    if dialect_name == "mysql":
+        return stmt.on_duplicate_key_update(updates)
+    return stmt.on_conflict_do_update(index_elements=list(index_elements), set_=updates)
+
+def insert_ignore(dialect_name: str, table: Table, rows: List[dict], index_elements: Iterable[str]):
+    """
+    Build a single-statement multi-row INSERT that skips rows conflicting with
+    `index_elements` (a unique key): INSERT IGNORE on MySQL, ON CONFLICT DO
+    NOTHING elsewhere. Its rowcount is the number of rows actually inserted.
+    """
+    if dialect_name == "mysql":
+        return insert(table).values(rows).prefix_with("IGNORE")
+    if dialect_name in ("sqlite", "postgresql"):
+        insert_ = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+        return insert_(table).values(rows).on_conflict_do_nothing(index_elements=list(index_elements))
+    raise NotImplementedError(f"Insert ignore is not supported for dialect '{dialect_name}'")
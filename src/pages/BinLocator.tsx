@@ -6,10 +6,12 @@ import { Badge } from '@/components/ui/badge';
 import { Button } from '@/components/ui/button';
 import { Progress } from '@/components/ui/progress';
 import { locationApiService } from '@/services/locationApi';
+import { apiService } from '@/services/api';
 import { useAuth } from '@/contexts/AuthContext';
 
 interface Bin {
-  id: number;
+  id: number | string; // number for our bins, provider place id for external ones
+  source?: 'local' | 'external';
   name: string;
   type: 'general' | 'recycling' | 'organic' | 'hazardous' | string;
   latitude: number;
@@ -43,7 +45,7 @@ const BinLocator = () => {
   const [detectedLocation, setDetectedLocation] = useState<{ latitude: number; longitude: number; address?: string } | null>(null);
   const [showMap, setShowMap] = useState(false);
   const watchIdRef = useRef<number | null>(null);
-  const refreshTimerRef = useRef<number | null>(null);
+  const binEventsRef = useRef<(() => void) | null>(null);
   const ranOnceRef = useRef(false);
   const [webhookStatus, setWebhookStatus] = useState<'idle' | 'sending' | 'success' | 'error'>('idle');
   const [webhookBins, setWebhookBins] = useState<any[]>([]);
@@ -107,28 +109,22 @@ const BinLocator = () => {
     setError(null);
     try {
       const effectiveRadius = radiusOverride ?? radiusKm;
-      const data = await locationApiService.searchNearbyBins({
-        latitude: lat,
-        longitude: lng,
-        radius_km: effectiveRadius,
-        bin_type: binType
-      });
-
-      // Compute distance client-side and sort
-      const withDistance = data.map((bin, i) => ({
-        id: Number((bin as any).id) || i,
-        name: (bin as any).name,
-        type: (bin as any).type || 'recycling',
-        latitude: (bin as any).latitude,
-        longitude: (bin as any).longitude,
-        address: (bin as any).address,
-        capacity: (bin as any).capacity ?? 0,
-        status: (bin as any).status || 'available',
-        last_updated: (bin as any).last_updated,
-        distance: haversineKm(lat, lng, (bin as any).latitude, (bin as any).longitude),
-      }));
-      withDistance.sort((a, b) => (a.distance ?? 0) - (b.distance ?? 0));
-      setBins(withDistance);
+      const data = await locationApiService.getNearbyBins(lat, lng, effectiveRadius, binType);
+
+      // Already deduplicated and ranked by distance and availability; local bins keep
+      // their numeric id so live updates from subscribeBinEvents still match them
+      setBins(data.bins.map((bin) => ({
+        id: bin.source === 'local' ? Number(bin.id.slice('local:'.length)) : bin.id,
+        source: bin.source,
+        name: bin.name,
+        type: bin.type || 'recycling',
+        latitude: bin.latitude,
+        longitude: bin.longitude,
+        address: bin.address,
+        capacity: bin.capacity ?? 0,
+        status: bin.status ?? 'unknown',
+        distance: bin.distance,
+      })));
     } catch (e: unknown) {
       const message = e instanceof Error ? e.message : 'Network error while fetching bins';
       setError(message);
@@ -161,15 +157,14 @@ const BinLocator = () => {
     // Only show bins not in maintenance
     result = result.filter(bin => bin.status !== 'maintenance');
 
-    // If location confirmed, restrict to selected radius and sort by distance
+    // If location confirmed, restrict to selected radius; the order stays the server's ranking
     if (locationConfirmed && userLocation) {
       result = result
         .map(bin => ({
           ...bin,
           distance: haversineKm(userLocation.latitude, userLocation.longitude, bin.latitude, bin.longitude),
         }))
-        .filter((bin: any) => bin.distance <= radiusKm)
-        .sort((a: any, b: any) => a.distance - b.distance) as any;
+        .filter((bin: any) => bin.distance <= radiusKm) as any;
     }
 
     // If location not confirmed, do not show any default list below (map prompt handles UX)
@@ -256,12 +251,21 @@ const BinLocator = () => {
         { enableHighAccuracy: true, maximumAge: 5000, timeout: 20000 }
       ) as unknown as number;
     }
-    // Periodic bins refresh
-    if (refreshTimerRef.current === null) {
-      refreshTimerRef.current = window.setInterval(() => {
-        const loc = initial || userLocation;
-        if (loc) fetchNearbyBins(loc.latitude, loc.longitude, radiusKm);
-      }, 30000);
+    // Live bin updates pushed by the server instead of periodic refetching
+    const loc = initial || userLocation;
+    if (loc) {
+      binEventsRef.current?.();
+      binEventsRef.current = apiService.subscribeBinEvents(
+        loc.latitude,
+        loc.longitude,
+        radiusKm,
+        (change) => setBins((prev) => prev.map((bin) => (
+          bin.id === change.id
+            ? { ...bin, capacity: change.capacity, status: change.status, last_updated: change.last_updated ?? bin.last_updated }
+            : bin
+        ))),
+        () => fetchNearbyBins(loc.latitude, loc.longitude, radiusKm)
+      );
     }
   };
 
@@ -270,9 +274,7 @@ const BinLocator = () => {
       if (watchIdRef.current !== null && navigator.geolocation) {
         navigator.geolocation.clearWatch(watchIdRef.current);
       }
-      if (refreshTimerRef.current !== null) {
-        window.clearInterval(refreshTimerRef.current);
-      }
+      binEventsRef.current?.();
     };
   }, []);
 
@@ -3,6 +3,7 @@ import { Camera } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { CameraCapture } from '@/components/CameraCapture';
+import { ToastAction } from '@/components/ui/toast';
 import { useToast } from '@/hooks/use-toast';
 import { useAuth } from '@/contexts/AuthContext';
 import { apiService } from '@/services/api';
@@ -22,20 +23,28 @@ const ScanDisposal = () => {
 
   // For now, no bin linking is required from frontend for AI-only detections.
 
-  const persistReward = async (wasteType: string, points: number) => {
+  // idempotencyKey identifies this scan's disposal; retries must reuse it
+  const persistReward = async (wasteType: string, points: number, idempotencyKey: string) => {
     if (!user?.id) {
       toast({ title: 'Not signed in', description: 'Please log in to earn points.', variant: 'destructive' });
       return;
     }
 
     try {
-      await apiService.ensureProfile();
-      await apiService.createDisposal({ waste_type: wasteType, points_earned: points, bin_id: null });
-      await apiService.addPoints(points, true);
+      await apiService.commitDisposal({ waste_type: wasteType, points_earned: points, bin_id: null }, idempotencyKey);
       toast({ title: 'Points awarded!', description: `You earned +${points} eco points.` });
     } catch (e: any) {
       console.error('Failed to persist reward', e);
-      toast({ title: 'Error', description: e?.message || 'Could not save your points.', variant: 'destructive' });
+      toast({
+        title: 'Error',
+        description: e?.message || 'Could not save your points.',
+        variant: 'destructive',
+        action: (
+          <ToastAction altText="Retry saving points" onClick={() => persistReward(wasteType, points, idempotencyKey)}>
+            Retry
+          </ToastAction>
+        ),
+      });
     }
   };
 
@@ -54,8 +63,9 @@ const ScanDisposal = () => {
     setShowCamera(false);
 
     if (result.isGarbage && result.pointsEarned > 0) {
-      // Save the detected item name in disposal.waste_type so Recent Activity shows the item
-      await persistReward(result.itemName || result.wasteType || 'recyclable', result.pointsEarned);
+      // Save the detected item name in disposal.waste_type so Recent Activity shows the item.
+      // One key per scan result: retries of this disposal are recognised, a new scan is a new disposal.
+      await persistReward(result.itemName || result.wasteType || 'recyclable', result.pointsEarned, crypto.randomUUID());
       // No auto-reload; let the user stay on the page. The dashboard will reflect updates on next visit.
     }
   };
@@ -51,10 +51,10 @@ class ApiService {
     return response.json();
   }
 
-  async post(url: string, body: any): Promise<any> {
+  async post(url: string, body: any, headers: Record<string, string> = {}): Promise<any> {
     const response = await fetch(url, {
       method: 'POST',
-      headers: this.getAuthHeaders(),
+      headers: { ...this.getAuthHeaders(), ...headers },
       body: JSON.stringify(body),
     });
     if (!response.ok) {
@@ -166,6 +166,48 @@ class ApiService {
     return this.post(`${API_BASE_URL}/api/disposals/`, payload);
   }
 
+  // Records the disposal and awards its points in one request. The caller creates the
+  // idempotency key once per disposal (e.g. per scan result) and passes the same key on
+  // every attempt, so a retried request never counts the points twice.
+  async commitDisposal(
+    payload: { waste_type: string; points_earned: number; bin_id?: number | null; weight?: number | null; },
+    idempotencyKey: string,
+    attempts = 3
+  ): Promise<any> {
+    for (let attempt = 1; ; attempt++) {
+      try {
+        return await this.post(`${API_BASE_URL}/api/disposals/commit`, payload, { 'Idempotency-Key': idempotencyKey });
+      } catch (e) {
+        // fetch throws TypeError when the request or its response was lost; anything else is the server's answer
+        if (!(e instanceof TypeError) || attempt >= attempts) throw e;
+        await new Promise((resolve) => setTimeout(resolve, 500 * attempt));
+      }
+    }
+  }
+
+  // Live bin status/capacity changes around a point (Server-Sent Events).
+  // Returns a function that closes the stream.
+  subscribeBinEvents(
+    lat: number,
+    lng: number,
+    radiusKm: number,
+    onChange: (bin: { id: number; capacity: number; status: string; last_updated?: string }) => void,
+    onResync: () => void
+  ): () => void {
+    const params = new URLSearchParams({ lat: String(lat), lng: String(lng), radius: String(radiusKm) });
+    const source = new EventSource(`${API_BASE_URL}/api/bins/events?${params}`);
+    let dropped = false;
+    source.addEventListener('bin', (e) => onChange(JSON.parse((e as MessageEvent).data)));
+    source.addEventListener('resync', () => onResync());
+    // Changes made while disconnected are missed, so refetch once the browser reconnects
+    source.onerror = () => { dropped = true; };
+    source.onopen = () => {
+      if (dropped) onResync();
+      dropped = false;
+    };
+    return () => source.close();
+  }
+
   async getRecentDisposals(limit = 5): Promise<any[]> {
     return this.get(`${API_BASE_URL}/api/disposals/recent?limit=${limit}`);
   }
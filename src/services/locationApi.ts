@@ -21,6 +21,31 @@ export interface LocationRequest {
   bin_type?: string;
 }
 
+export interface NearbyBin {
+  id: string;
+  source: 'local' | 'external';
+  name: string;
+  address: string;
+  latitude: number;
+  longitude: number;
+  distance: number;
+  type: string;
+  status: string | null;
+  capacity: number | null;
+  rating: number | null;
+  phone: string;
+  hours: string;
+  website: string;
+}
+
+export interface NearbyBinsResponse {
+  bins: NearbyBin[];
+  count: number;
+  sources: { local: number; external: number };
+  external_status: 'ok' | 'skipped' | 'timeout' | 'error' | 'unavailable';
+  partial: boolean;
+}
+
 export interface AddressRequest {
   address: string;
 }
@@ -41,6 +66,28 @@ export interface BinTypesResponse {
 class LocationApiService {
   private baseUrl = 'http://localhost:8000/api/location';
 
+  // Our bins and external places in one ranked, deduplicated list
+  async getNearbyBins(
+    latitude: number,
+    longitude: number,
+    radius_km: number = 5,
+    bin_type?: string,
+    limit: number = 20
+  ): Promise<NearbyBinsResponse> {
+    const params = new URLSearchParams({
+      latitude: latitude.toString(),
+      longitude: longitude.toString(),
+      radius_km: radius_km.toString(),
+      limit: limit.toString()
+    });
+    if (bin_type) {
+      params.set('bin_type', bin_type);
+    }
+
+    const response = await apiService.get(`${this.baseUrl}/nearby-bins?${params}`);
+    return response;
+  }
+
   async searchNearbyBins(request: LocationRequest): Promise<BinLocation[]> {
     const response = await apiService.post(`${this.baseUrl}/search-nearby-bins`, request);
     return response;